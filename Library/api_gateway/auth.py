@@ -1,17 +1,138 @@
 # api_gateway/auth.py
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
 from jose import JWTError, jwt
 
-SECRET_KEY = "your_secret_key"
-ALGORITHM = "HS256"
+from common.auth import JWT_ALGORITHM, JWT_SECRET_KEY
+from . import config
 
-def verify_jwt_token(token: str):
+
+class TokenCache:
+    """
+    Кеш перевірених JWT: ключ — SHA-256 токена (сам токен не зберігається),
+    значення — claims. Запис діє до exp токена, кількість записів обмежена (LRU).
+    Відкликані токени пам'ятаються до свого exp, щоб не пройти перевірку повторно;
+    токен без exp відкликається назавжди.
+
+    Кеш і список відкликаних — у пам'яті процесу: revoke/revoke_user діють лише на
+    той воркер gateway, де їх викликали. Інші репліки приймають токен, доки він
+    не спливе (exp) — для миттєвого відкликання всюди потрібне спільне сховище.
+    """
+
+    def __init__(self, max_entries: int, default_ttl: float):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: OrderedDict = OrderedDict()  # digest -> (expires_at, claims)
+        self._revoked: dict[bytes, float] = {}  # digest -> expires_at
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revocations = 0
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, digest: bytes):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return entry[1]
+
+    def put(self, digest: bytes, claims: dict, exp=None):
+        expires_at = float(exp) if exp is not None else time.time() + self.default_ttl
+        with self._lock:
+            self._entries[digest] = (expires_at, claims)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def is_revoked(self, digest: bytes) -> bool:
+        with self._lock:
+            expires_at = self._revoked.get(digest)
+            if expires_at is None:
+                return False
+            if expires_at <= time.time():
+                del self._revoked[digest]
+                return False
+            return True
+
+    def revoke(self, token: str, exp):
+        """Хук відкликання: токен перестає прийматися до exp з його claims (лише в цьому процесі)."""
+        digest = self.digest(token)
+        now = time.time()
+        with self._lock:
+            self._entries.pop(digest, None)
+            self._revoked[digest] = float(exp) if exp is not None else float("inf")
+            # Прибираємо прострочені записи, щоб множина не росла безмежно
+            for key in [k for k, v in self._revoked.items() if v <= now]:
+                del self._revoked[key]
+            self.revocations += 1
+
+    def revoke_user(self, user_id: str):
+        """
+        Відкликає всі закешовані токени користувача (наприклад, після зміни ролі).
+        Лише в цьому процесі і лише ті токени, що вже потрапили в його кеш.
+        """
+        with self._lock:
+            for digest, (expires_at, claims) in list(self._entries.items()):
+                if claims["id"] == user_id:
+                    del self._entries[digest]
+                    self._revoked[digest] = expires_at
+                    self.revocations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "revoked": len(self._revoked),
+                "hits": self.hits,
+                "misses": self.misses,
+                "revocations": self.revocations,
+            }
+
+
+token_cache = TokenCache(config.TOKEN_CACHE_MAX_ENTRIES, config.TOKEN_CACHE_DEFAULT_TTL)
+
+
+def decode_jwt_token(token: str, verify_exp: bool = True) -> dict:
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        role: str = payload.get("role")
-        user_id: str = payload.get("id")
-        if email is None or role is None or user_id is None:
-            raise ValueError("Invalid token payload")
-        return {"email": email, "role": role, "id": user_id}
+        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM], options={"verify_exp": verify_exp})
     except JWTError:
         raise ValueError("Could not validate token")
+    email: str = payload.get("sub")
+    role: str = payload.get("role")
+    user_id: str = payload.get("id")
+    if email is None or role is None or user_id is None:
+        raise ValueError("Invalid token payload")
+    return {"email": email, "role": role, "id": user_id, "exp": payload.get("exp")}
+
+
+def verify_jwt_token(token: str):
+    digest = token_cache.digest(token)
+    if token_cache.is_revoked(digest):
+        raise ValueError("Token has been revoked")
+    claims = token_cache.get(digest)
+    if claims is not None:
+        token_cache.hits += 1
+        return claims
+    token_cache.misses += 1
+    payload = decode_jwt_token(token)
+    claims = {"email": payload["email"], "role": payload["role"], "id": payload["id"]}
+    token_cache.put(digest, claims, payload["exp"])
+    return claims
+
+
+def revoke_jwt_token(token: str):
+    """Logout: підпис перевіряється (прострочений токен теж можна відкликати), відкликання діє до exp токена."""
+    payload = decode_jwt_token(token, verify_exp=False)
+    token_cache.revoke(token, payload["exp"])
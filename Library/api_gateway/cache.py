@@ -0,0 +1,172 @@
+# api_gateway/cache.py
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable, Iterable
+
+from . import config
+
+
+class CachedResponse:
+    __slots__ = ("status_code", "content", "headers")
+
+    def __init__(self, status_code: int, content: bytes, headers: dict | None = None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    @property
+    def size(self) -> int:
+        return len(self.content)
+
+    @property
+    def cacheable(self) -> bool:
+        # Без ETag або з no-store (book_service так позначає текст, що ще витягується)
+        # відповідь може бути неповною — її не зберігаємо
+        return (
+            self.status_code == 200
+            and "ETag" in self.headers
+            and "no-store" not in self.headers.get("Cache-Control", "")
+        )
+
+
+def _retrieve_exception(task: asyncio.Task):
+    # Не даємо asyncio скаржитися на невитягнутий виняток, якщо чекачів уже немає
+    if not task.cancelled():
+        task.exception()
+
+
+class ResponseCache:
+    """
+    In-process кеш відповідей upstream-сервісів: TTL + LRU-витіснення за кількістю
+    записів і сумарним розміром. Однакові запити, що виконуються одночасно,
+    об'єднуються в один upstream-виклик (single-flight). Записи мають теги
+    (наприклад "book:5", "books"), за якими їх можна інвалідовувати.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires_at, value, tags)
+        self._tags: dict[str, set] = {}
+        self._in_flight: dict[Hashable, tuple[asyncio.Task, frozenset]] = {}  # key -> (fetch, теги)
+        self._bytes = 0
+        # Інвалідація під час upstream-запиту: результат такого запиту не кешуємо
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _remove(self, key):
+        expires_at, value, tags = self._entries.pop(key)
+        self._bytes -= value.size
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def _store(self, key, value: CachedResponse, tags: Iterable[str]):
+        if self.ttl <= 0 or value.size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        tags = frozenset(tags)
+        self._entries[key] = (time.monotonic() + self.ttl, value, tags)
+        self._bytes += value.size
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def get_or_fetch(
+        self,
+        key: Hashable,
+        fetch: Callable[[], Awaitable[CachedResponse]],
+        tags: Iterable[str] = (),
+    ) -> CachedResponse:
+        """Повертає відповідь з кешу або виконує fetch; кешуються лише cacheable-відповіді (200 з ETag, без no-store)."""
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(in_flight[0])
+
+        self.misses += 1
+        # fetch іде окремою задачею: якщо клієнт першого запиту відключиться, його
+        # скасування не зачепить інших, хто чекає на той самий результат
+        task = asyncio.ensure_future(self._fetch(key, fetch, tags, self._generation))
+        task.add_done_callback(_retrieve_exception)
+        self._in_flight[key] = (task, frozenset(tags))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key, fetch, tags, generation: int) -> CachedResponse:
+        task = asyncio.current_task()
+        try:
+            value = await fetch()
+            if value.cacheable and generation == self._generation:
+                self._store(key, value, tags)
+            return value
+        finally:
+            # Після інвалідації тут уже може бути новий запит — його не чіпаємо
+            if self._in_flight.get(key, (None,))[0] is task:
+                del self._in_flight[key]
+
+    def invalidate(self, *tags: str):
+        self._generation += 1
+        # Запит, що почався до інвалідації, віддасть результат лише тим, хто вже чекає
+        for key, (_, key_tags) in list(self._in_flight.items()):
+            if key_tags.intersection(tags):
+                del self._in_flight[key]
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self):
+        self._generation += 1
+        self._in_flight.clear()
+        self._entries.clear()
+        self._tags.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.ttl > 0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+response_cache = ResponseCache(
+    ttl=config.CACHE_TTL,
+    max_entries=config.CACHE_MAX_ENTRIES,
+    max_bytes=config.CACHE_MAX_BYTES,
+)
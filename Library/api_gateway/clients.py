@@ -0,0 +1,75 @@
+# api_gateway/clients.py
+import logging
+
+import httpx
+
+from . import config, metrics, resilience, tracing
+
+logger = logging.getLogger(__name__)
+
+SERVICE_URLS = {
+    "user": config.USER_SERVICE_URL,
+    "book": config.BOOK_SERVICE_URL,
+    "reading": config.READING_SERVICE_URL,
+}
+
+# Один AsyncClient на upstream-сервіс на весь час життя застосунку
+_clients: dict[str, httpx.AsyncClient] = {}
+
+
+def _http2_enabled() -> bool:
+    if not config.HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("GATEWAY_HTTP2 увімкнено, але пакет h2 не встановлено — використовуємо HTTP/1.1")
+        return False
+    return True
+
+
+def _build_client(service: str, base_url: str, transport: httpx.AsyncBaseTransport | None = None) -> httpx.AsyncClient:
+    # Пул з'єднань і HTTP/2 задаються на транспорті. Обгортки: метрики логічного виклику,
+    # політика upstream (breaker, повтори, hedging), трасування кожної спроби
+    if transport is None:
+        transport = httpx.AsyncHTTPTransport(
+            http2=_http2_enabled(),
+            limits=httpx.Limits(
+                max_connections=config.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+    policy = config.UPSTREAM_POLICIES[service]
+    return httpx.AsyncClient(
+        base_url=base_url,
+        transport=metrics.InstrumentedTransport(
+            service, resilience.ResilientTransport(service, tracing.TracingTransport(service, transport), policy)
+        ),
+        follow_redirects=True,
+        timeout=httpx.Timeout(
+            connect=policy["connect_timeout"],
+            read=policy["read_timeout"],
+            write=config.HTTP_WRITE_TIMEOUT,
+            pool=config.HTTP_POOL_TIMEOUT,
+        ),
+    )
+
+
+def get_client(service: str) -> httpx.AsyncClient:
+    client = _clients.get(service)
+    if client is None or client.is_closed:
+        client = _build_client(service, SERVICE_URLS[service])
+        _clients[service] = client
+    return client
+
+
+async def startup():
+    for service in SERVICE_URLS:
+        get_client(service)
+
+
+async def shutdown():
+    for client in _clients.values():
+        await client.aclose()
+    _clients.clear()
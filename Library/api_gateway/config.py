@@ -0,0 +1,82 @@
+# api_gateway/config.py
+import os
+
+USER_SERVICE_URL = os.getenv("USER_SERVICE_URL", "http://localhost:8001")
+BOOK_SERVICE_URL = os.getenv("BOOK_SERVICE_URL", "http://localhost:8002")
+READING_SERVICE_URL = os.getenv("READING_SERVICE_URL", "http://localhost:8003")
+
+# Пул з'єднань до кожного upstream-сервісу
+HTTP_MAX_CONNECTIONS = int(os.getenv("GATEWAY_HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GATEWAY_HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("GATEWAY_HTTP_KEEPALIVE_EXPIRY", "30"))
+
+# Таймаути (секунди); connect/read можна задати окремо для кожного upstream (див. нижче)
+HTTP_CONNECT_TIMEOUT = float(os.getenv("GATEWAY_HTTP_CONNECT_TIMEOUT", "2"))
+HTTP_READ_TIMEOUT = float(os.getenv("GATEWAY_HTTP_READ_TIMEOUT", "10"))
+HTTP_WRITE_TIMEOUT = float(os.getenv("GATEWAY_HTTP_WRITE_TIMEOUT", "30"))
+HTTP_POOL_TIMEOUT = float(os.getenv("GATEWAY_HTTP_POOL_TIMEOUT", "5"))
+UPLOAD_TIMEOUT = float(os.getenv("GATEWAY_UPLOAD_TIMEOUT", "60"))
+
+
+def _upstream_setting(service: str, name: str, default: float) -> float:
+    return float(os.getenv(f"GATEWAY_{service.upper()}_{name}", default))
+
+
+def _upstream_policy(service: str, retries: int, hedge_after: float) -> dict:
+    """
+    Політика викликів одного upstream; кожне значення перевизначається змінною
+    GATEWAY_<SERVICE>_<NAME>, наприклад GATEWAY_BOOK_READ_TIMEOUT=3 чи GATEWAY_READING_RETRIES=0.
+    """
+    return {
+        "connect_timeout": _upstream_setting(service, "CONNECT_TIMEOUT", HTTP_CONNECT_TIMEOUT),
+        "read_timeout": _upstream_setting(service, "READ_TIMEOUT", HTTP_READ_TIMEOUT),
+        # Повтори лише для ідемпотентних запитів (GET/HEAD), пауза — випадкова в [0, backoff * 2^спроба]
+        "retries": int(_upstream_setting(service, "RETRIES", retries)),
+        "retry_backoff": _upstream_setting(service, "RETRY_BACKOFF", 0.05),
+        # Дублюючий запит, якщо відповіді немає за hedge_after секунд (0 — вимкнено);
+        # діє лише для маршрутів, що його явно просять (книга, контент, сторінки)
+        "hedge_after": _upstream_setting(service, "HEDGE_AFTER", hedge_after),
+        # Circuit breaker: відкривається після breaker_failures помилок поспіль (0 — вимкнено)
+        # і відхиляє запити breaker_reset секунд
+        "breaker_failures": int(_upstream_setting(service, "BREAKER_FAILURES", 5)),
+        "breaker_reset": _upstream_setting(service, "BREAKER_RESET", 10),
+    }
+
+
+UPSTREAM_POLICIES = {
+    "user": _upstream_policy("user", retries=0, hedge_after=0),
+    "book": _upstream_policy("book", retries=2, hedge_after=0.25),
+    "reading": _upstream_policy("reading", retries=1, hedge_after=0),
+}
+
+# HTTP/2 потребує пакета h2 (pip install "httpx[http2]")
+HTTP2 = os.getenv("GATEWAY_HTTP2", "0").lower() in ("1", "true", "yes")
+
+# Кеш відповідей book_service (каталог, книга, контент). TTL = 0 вимикає кеш
+CACHE_TTL = float(os.getenv("GATEWAY_CACHE_TTL", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("GATEWAY_CACHE_MAX_ENTRIES", "1024"))
+CACHE_MAX_BYTES = int(os.getenv("GATEWAY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Після завантаження книги gateway опитує її ingest job і скидає кеш книги, коли job завершиться
+INGEST_POLL_INTERVAL = float(os.getenv("GATEWAY_INGEST_POLL_INTERVAL", "2"))
+INGEST_WATCH_TIMEOUT = float(os.getenv("GATEWAY_INGEST_WATCH_TIMEOUT", "3600"))
+
+# Кеш перевірених токенів: запис живе до exp токена
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("GATEWAY_TOKEN_CACHE_MAX_ENTRIES", "10000"))
+TOKEN_CACHE_DEFAULT_TTL = float(os.getenv("GATEWAY_TOKEN_CACHE_DEFAULT_TTL", "300"))  # для токенів без exp
+
+# Структуровані логи запитів: частка, що пишеться (0 — вимкнено; помилки пишуться завжди, якщо > 0)
+LOG_SAMPLE_RATE = float(os.getenv("GATEWAY_LOG_SAMPLE_RATE", "0.01"))
+
+# Скільки книг запитувати в book_service одним GET /books?ids=... для /me/library
+# (не більше BOOKS_PAGE_LIMIT_MAX book_service); кілька пакетів ідуть паралельно
+LIBRARY_BATCH_SIZE = int(os.getenv("GATEWAY_LIBRARY_BATCH_SIZE", "200"))
+
+# Prefetch сторінок за прогресом читання: скільки сторінок після поточної гріти (0 — вимкнено)
+PREFETCH_PAGES = int(os.getenv("GATEWAY_PREFETCH_PAGES", "3"))
+PREFETCH_CONCURRENCY = int(os.getenv("GATEWAY_PREFETCH_CONCURRENCY", "8"))
+PREFETCH_MAX_PENDING = int(os.getenv("GATEWAY_PREFETCH_MAX_PENDING", "256"))
+# Кеш сторінок: витісняються цілі книги, які найдовше не читали. TTL = 0 вимикає кеш і prefetch
+PAGE_CACHE_TTL = float(os.getenv("GATEWAY_PAGE_CACHE_TTL", "300"))
+PAGE_CACHE_MAX_BOOKS = int(os.getenv("GATEWAY_PAGE_CACHE_MAX_BOOKS", "512"))
+PAGE_CACHE_MAX_BYTES = int(os.getenv("GATEWAY_PAGE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+PAGE_CACHE_MAX_PAGES_PER_BOOK = int(os.getenv("GATEWAY_PAGE_CACHE_MAX_PAGES_PER_BOOK", "64"))
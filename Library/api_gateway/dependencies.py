@@ -1,8 +1,8 @@
 # api_gateway/dependencies.py
-from fastapi import Request, HTTPException, Depends
+from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
-from user_service.models import User
+from . import tracing
 from .auth import verify_jwt_token
 
 security = HTTPBearer()
@@ -11,11 +11,10 @@ security = HTTPBearer()
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
     try:
-        payload = verify_jwt_token(token)
-        print("USER:", User)
-        return payload
+        with tracing.start_span("jwt.verify"):
+            return verify_jwt_token(token)
     except ValueError:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
 async def get_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    return credentials.credentials 
\ No newline at end of file
+    return credentials.credentials
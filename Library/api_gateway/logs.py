@@ -0,0 +1,36 @@
+# api_gateway/logs.py
+import json
+import logging
+import random
+import sys
+
+from . import config, tracing
+
+logger = logging.getLogger("api_gateway")
+if not logger.handlers:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def log_event(event: str, status: int | None = None, **fields):
+    """
+    Один рядок JSON на подію. Тіла відповідей не логуються. Успішні події
+    пишуться з імовірністю LOG_SAMPLE_RATE, помилки (status >= 400) — завжди;
+    GATEWAY_LOG_SAMPLE_RATE=0 вимикає логування повністю.
+    """
+    rate = config.LOG_SAMPLE_RATE
+    if rate <= 0:
+        return
+    is_error = status is not None and status >= 400
+    if not is_error and random.random() >= rate:
+        return
+    record = {"event": event, "status": status, **fields}
+    span = tracing.current_span()
+    if span is not None:
+        record["trace_id"] = span.trace_id
+    if not is_error:
+        record["sample_rate"] = rate
+    logger.log(logging.WARNING if is_error else logging.INFO, json.dumps(record, ensure_ascii=False, default=str))
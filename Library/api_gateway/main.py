@@ -1,15 +1,43 @@
-from fastapi import FastAPI, APIRouter, Request
-from fastapi.responses import JSONResponse
-import httpx # type: ignore
+from contextlib import asynccontextmanager
+
+import httpx
+
+from fastapi import FastAPI, APIRouter, Depends, Request
+from fastapi.responses import JSONResponse, Response
 from fastapi import HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from .dependencies import get_token
-import requests
 from .dependencies import get_current_user
+from .clients import get_client
+from .cache import response_cache
+from .auth import revoke_jwt_token, token_cache
+from . import clients, metrics, resilience, tracing
+from .prefetch import prefetcher
+from .logs import log_event
 from api_gateway.routes import book_routes
 from api_gateway.routes import reading_routes
+from api_gateway.routes import library_routes
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await clients.startup()
+    app.state.ready = True
+    yield
+    # Під час зупинки readiness віддає 503, щоб балансувальник перестав слати трафік
+    app.state.ready = False
+    await prefetcher.shutdown()
+    await book_routes.shutdown()
+    await clients.shutdown()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+metrics.instrument_app(app)
+tracing.instrument_app(app)
+metrics.register_stats("cache", response_cache)
+metrics.register_stats("token_cache", token_cache)
+metrics.register_stats("tracing", tracing.processor)
+metrics.register_stats("prefetch", prefetcher)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,39 +45,83 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Range-заголовки потрібні PDF-переглядачам з іншого origin для часткових завантажень
+    expose_headers=["X-Next-Cursor", "ETag", "Accept-Ranges", "Content-Range", "Content-Disposition"],
 )
 
+@app.exception_handler(httpx.TransportError)
+async def upstream_error_handler(request: Request, exc: httpx.TransportError):
+    # Недоступний або повільний upstream не повинен перетворюватись на 500 з traceback
+    if isinstance(exc, resilience.CircuitOpenError):
+        return JSONResponse(
+            status_code=503,
+            content={"detail": f"{exc.upstream} service is unavailable"},
+            headers={"Retry-After": str(exc.retry_after)},
+        )
+    if isinstance(exc, httpx.TimeoutException):
+        return JSONResponse(status_code=504, content={"detail": "Upstream service timed out"})
+    return JSONResponse(status_code=502, content={"detail": "Upstream service error"})
+
 router = APIRouter()
 
-USER_SERVICE_URL = "http://localhost:8001"
+def upstream_response(res: httpx.Response) -> Response:
+    # Статус і тіло user_service передаються як є: 400/401/409 не повинні ставати 200
+    return Response(content=res.content, status_code=res.status_code, media_type=res.headers.get("content-type"))
 
 @app.post("/users/register")
 async def register(request: Request):
     data = await request.json()
-    res = requests.post(f"{USER_SERVICE_URL}/users/register", json=data)
-    print(res.text)
-    return res.json()
+    res = await get_client("user").post("/users/register", json=data)
+    log_event("register", res.status_code)
+    return upstream_response(res)
 
 @app.post("/users/login")
-def login(user: dict):
-    res = requests.post("http://localhost:8001/users/login", json=user)
-    print("Status code:", res.status_code)
-    print("Response text:", res.text)
-    try:
-        return res.json()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Invalid JSON: {str(e)}; Body: {res.text}")
-    
+async def login(user: dict):
+    res = await get_client("user").post("/users/login", json=user)
+    log_event("login", res.status_code)
+    return upstream_response(res)
+
 @router.get("/users/me")
-async def get_current_user(request: Request):
-    token = request.headers.get("authorization")
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{USER_SERVICE_URL}/users/me",
-            headers={"Authorization": token} if token else {}
-        )
-    return JSONResponse(content=response.json(), status_code=response.status_code)
+async def read_users_me(user=Depends(get_current_user)):
+    # Відповідаємо з перевірених claims токена, без запиту до user_service
+    return {"email": user["email"], "role": user["role"], "id": user["id"]}
+
+@router.post("/users/logout", status_code=204)
+async def logout(token: str = Depends(get_token)):
+    try:
+        revoke_jwt_token(token)
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+@router.get("/cache/stats")
+async def cache_stats():
+    return response_cache.stats()
+
+@router.get("/cache/pages")
+async def page_cache_stats():
+    """Кеш сторінок і prefetch: hit_rate — частка гортань, відданих з кешу; prefetch_accuracy — частка використаних."""
+    return prefetcher.stats()
+
+@router.get("/health/live")
+async def liveness():
+    return {"status": "ok"}
+
+@router.get("/health/ready")
+async def readiness(request: Request):
+    """Готовність gateway не залежить від upstream: їхні збої обробляють breaker-и (див. /health/upstreams)."""
+    if not getattr(request.app.state, "ready", False):
+        raise HTTPException(status_code=503, detail="Gateway is not ready")
+    return {"status": "ok"}
+
+@router.get("/health/upstreams")
+async def upstream_health():
+    """Стан circuit breaker кожного upstream-сервісу; degraded, якщо хоч один не closed."""
+    upstreams = {name: breaker.stats() for name, breaker in resilience.breakers.items()}
+    degraded = any(s["state"] != resilience.CircuitBreaker.CLOSED for s in upstreams.values())
+    return {"status": "degraded" if degraded else "ok", "upstreams": upstreams}
 
 app.include_router(router)
+# /books/popular має зіставлятися раніше за /books/{book_id}
+app.include_router(library_routes.router)
 app.include_router(book_routes.router, prefix="/books", tags=["Books"])
-app.include_router(reading_routes.router)
\ No newline at end of file
+app.include_router(reading_routes.router)
@@ -0,0 +1,86 @@
+# api_gateway/metrics.py
+"""Метрики gateway: upstream-виклики і stats() кешів; спільна частина — common.metrics."""
+import time
+
+import httpx
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from common.metrics import ServiceMetrics
+
+SERVICE = "api_gateway"
+service_metrics = ServiceMetrics(SERVICE)
+REGISTRY = service_metrics.registry
+instrument_app = service_metrics.instrument_app
+
+UPSTREAM_LATENCY = Histogram(
+    "gateway_upstream_request_duration_seconds",
+    "Time until response headers from an upstream service",
+    ["upstream", "method", "status"],
+    registry=REGISTRY,
+)
+UPSTREAM_IN_FLIGHT = Gauge("gateway_upstream_in_flight", "Upstream requests in progress", ["upstream"], registry=REGISTRY)
+UPSTREAM_RETRIES = Counter("gateway_upstream_retries_total", "Upstream request retries", ["upstream", "reason"], registry=REGISTRY)
+UPSTREAM_HEDGES = Counter(
+    "gateway_upstream_hedges_total", "Hedged upstream requests sent and won", ["upstream", "outcome"], registry=REGISTRY
+)
+UPSTREAM_CIRCUIT_STATE = Gauge(
+    "gateway_upstream_circuit_state", "Circuit breaker state: 0 closed, 1 half-open, 2 open", ["upstream"], registry=REGISTRY
+)
+UPSTREAM_CIRCUIT_REJECTED = Counter(
+    "gateway_upstream_circuit_rejected_total", "Requests rejected by an open circuit", ["upstream"], registry=REGISTRY
+)
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Обгортка транспорту httpx: час до заголовків відповіді і статус кожного upstream-виклику."""
+
+    def __init__(self, upstream: str, transport: httpx.AsyncBaseTransport):
+        self.upstream = upstream
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        status = "error"
+        started = time.perf_counter()
+        in_flight = UPSTREAM_IN_FLIGHT.labels(self.upstream)
+        in_flight.inc()
+        try:
+            response = await self.transport.handle_async_request(request)
+            status = str(response.status_code)
+            return response
+        finally:
+            in_flight.dec()
+            UPSTREAM_LATENCY.labels(self.upstream, request.method, status).observe(time.perf_counter() - started)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+# Ключі stats(), що є поточними значеннями (решта — лічильники, що лише зростають)
+GAUGE_STATS = {
+    "entries", "bytes", "revoked", "queued", "sample_rate", "books", "pending",
+    "hit_rate", "prefetch_accuracy", "pages_ahead",
+}
+
+
+class StatsCollector:
+    """Віддає лічильники з stats() кешів gateway (відповіді, токени) як метрики Prometheus."""
+
+    def __init__(self, name: str, source):
+        self.name = name
+        self.source = source
+
+    def collect(self):
+        for key, value in self.source.stats().items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            if key in GAUGE_STATS:
+                metric = GaugeMetricFamily(f"gateway_{self.name}_{key}", f"{self.name} {key}")
+            else:
+                metric = CounterMetricFamily(f"gateway_{self.name}_{key}", f"{self.name} {key}")
+            metric.add_metric([], value)
+            yield metric
+
+
+def register_stats(name: str, source):
+    REGISTRY.register(StatsCollector(name, source))
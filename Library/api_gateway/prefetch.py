@@ -0,0 +1,229 @@
+# api_gateway/prefetch.py
+"""
+Попереднє завантаження сторінок за прогресом читання. Коли читач повідомляє,
+що він на сторінці N (POST /reading/start), наступні PREFETCH_PAGES сторінок
+цієї книги завантажуються у фоні в кеш сторінок, і наступне гортання
+віддається з пам'яті gateway.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+import httpx
+
+from . import config
+from .cache import CachedResponse
+from .clients import get_client
+
+logger = logging.getLogger(__name__)
+
+# Заголовки відповіді сторінки, які зберігаються разом із тілом
+PAGE_HEADERS = ("ETag", "Content-Encoding", "Vary", "Cache-Control")
+
+
+class _BookPages:
+    __slots__ = ("entries", "bytes")
+
+    def __init__(self):
+        # (page, encoding) -> [expires_at, CachedResponse, prefetched, used]
+        self.entries: dict = {}
+        self.bytes = 0
+
+
+class PageCache:
+    """
+    Кеш сторінок, згрупованих за книгою. Витісняється весь робочий набір книги,
+    яку найдовше не читали (LRU за книгами), тож популярні книги лишаються
+    в пам'яті й спільні для всіх читачів.
+    """
+
+    def __init__(self, ttl: float, max_books: int, max_bytes: int, max_pages_per_book: int):
+        self.ttl = ttl
+        self.max_books = max_books
+        self.max_bytes = max_bytes
+        self.max_pages_per_book = max_pages_per_book
+        self._books: OrderedDict[int, _BookPages] = OrderedDict()
+        self._bytes = 0
+        self.lookups = 0
+        self.hits = 0
+        self.prefetched = 0
+        self.prefetch_used = 0
+        self.wasted = 0
+        self.evicted_books = 0
+
+    def _drop_entry(self, book: _BookPages, key):
+        entry = book.entries.pop(key)
+        book.bytes -= entry[1].size
+        self._bytes -= entry[1].size
+        if entry[2] and not entry[3]:
+            self.wasted += 1
+
+    def _drop_book(self, book_id: int):
+        book = self._books[book_id]
+        for key in list(book.entries):
+            self._drop_entry(book, key)
+        del self._books[book_id]
+
+    def touch(self, book_id: int):
+        if book_id in self._books:
+            self._books.move_to_end(book_id)
+
+    def contains(self, book_id: int, page: int, encoding: str) -> bool:
+        book = self._books.get(book_id)
+        entry = book.entries.get((page, encoding)) if book else None
+        return entry is not None and entry[0] > time.monotonic()
+
+    def get(self, book_id: int, page: int, encoding: str) -> CachedResponse | None:
+        self.lookups += 1
+        book = self._books.get(book_id)
+        if book is None:
+            return None
+        key = (page, encoding)
+        entry = book.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            self._drop_entry(book, key)
+            return None
+        self._books.move_to_end(book_id)
+        self.hits += 1
+        if entry[2] and not entry[3]:
+            self.prefetch_used += 1
+        entry[3] = True
+        return entry[1]
+
+    def put(self, book_id: int, page: int, encoding: str, value: CachedResponse, prefetched: bool = False):
+        if self.ttl <= 0 or value.size > self.max_bytes:
+            return
+        book = self._books.get(book_id)
+        if book is None:
+            book = self._books[book_id] = _BookPages()
+        key = (page, encoding)
+        if key in book.entries:
+            self._drop_entry(book, key)
+        book.entries[key] = [time.monotonic() + self.ttl, value, prefetched, False]
+        book.bytes += value.size
+        self._bytes += value.size
+        if prefetched:
+            self.prefetched += 1
+        self._books.move_to_end(book_id)
+        # У межах книги першими йдуть найстаріші записи (сторінки, які читач уже пройшов)
+        while len(book.entries) > self.max_pages_per_book:
+            self._drop_entry(book, next(iter(book.entries)))
+        while len(self._books) > self.max_books or self._bytes > self.max_bytes:
+            self._drop_book(next(iter(self._books)))
+            self.evicted_books += 1
+
+    def invalidate(self, book_id: int):
+        if book_id in self._books:
+            self._drop_book(book_id)
+
+    def clear(self):
+        for book_id in list(self._books):
+            self._drop_book(book_id)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.ttl > 0,
+            "books": len(self._books),
+            "entries": sum(len(book.entries) for book in self._books.values()),
+            "bytes": self._bytes,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "prefetched": self.prefetched,
+            "prefetch_used": self.prefetch_used,
+            "prefetch_accuracy": round(self.prefetch_used / self.prefetched, 4) if self.prefetched else 0.0,
+            "wasted": self.wasted,
+            "evicted_books": self.evicted_books,
+        }
+
+
+async def fetch_page(book_id: int, page: int, encoding: str) -> CachedResponse:
+    path = f"/books/{book_id}/pages/{page}"
+    async with get_client("book").stream("GET", path, headers={"Accept-Encoding": encoding}) as response:
+        content = b"".join([chunk async for chunk in response.aiter_raw()])
+    headers = {h: response.headers[h] for h in PAGE_HEADERS if h in response.headers}
+    return CachedResponse(response.status_code, content, headers)
+
+
+class Prefetcher:
+    """
+    Фонові завдання, що гріють кеш сторінками N+1..N+k. Кількість одночасних
+    запитів до book_service обмежена; якщо черга переповнена, сигнал відкидається —
+    prefetch ніколи не конкурує з запитами читачів.
+    """
+
+    def __init__(self, cache: PageCache, pages: int, concurrency: int, max_pending: int):
+        self.cache = cache
+        self.pages = pages
+        self.max_pending = max_pending
+        self._slots = asyncio.Semaphore(concurrency)
+        self._in_flight: set = set()
+        self._tasks: set = set()
+        self.signals = 0
+        self.scheduled = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def signal(self, book_id: int, page: int, encoding: str):
+        if self.pages <= 0 or self.cache.ttl <= 0:
+            return
+        self.signals += 1
+        self.cache.touch(book_id)
+        for number in range(page + 1, page + self.pages + 1):
+            key = (book_id, number, encoding)
+            if key in self._in_flight or self.cache.contains(book_id, number, encoding):
+                continue
+            if len(self._tasks) >= self.max_pending:
+                self.dropped += 1
+                continue
+            self._in_flight.add(key)
+            task = asyncio.create_task(self._prefetch(key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            self.scheduled += 1
+
+    async def _prefetch(self, key):
+        book_id, page, encoding = key
+        try:
+            async with self._slots:
+                value = await fetch_page(book_id, page, encoding)
+            if value.cacheable:
+                self.cache.put(book_id, page, encoding, value, prefetched=True)
+        except httpx.HTTPError as e:
+            self.errors += 1
+            logger.debug("Prefetch of book %s page %s failed: %s", book_id, page, e)
+        finally:
+            self._in_flight.discard(key)
+
+    async def shutdown(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "pages_ahead": self.pages,
+            "signals": self.signals,
+            "scheduled": self.scheduled,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "pending": len(self._tasks),
+            **self.cache.stats(),
+        }
+
+
+page_cache = PageCache(
+    ttl=config.PAGE_CACHE_TTL,
+    max_books=config.PAGE_CACHE_MAX_BOOKS,
+    max_bytes=config.PAGE_CACHE_MAX_BYTES,
+    max_pages_per_book=config.PAGE_CACHE_MAX_PAGES_PER_BOOK,
+)
+prefetcher = Prefetcher(
+    page_cache,
+    pages=config.PREFETCH_PAGES,
+    concurrency=config.PREFETCH_CONCURRENCY,
+    max_pending=config.PREFETCH_MAX_PENDING,
+)
@@ -0,0 +1,232 @@
+# api_gateway/resilience.py
+"""
+Захист gateway від повільних або недоступних upstream-сервісів: повтори з jitter
+для ідемпотентних запитів, hedging для чутливих до p99 читань і circuit breaker
+на кожен сервіс. Усе це — обгортка транспорту httpx, тож маршрути не змінюються;
+маршрут просить hedging через extensions={"hedge": True}.
+"""
+import asyncio
+import math
+import random
+import time
+
+import httpx
+
+from . import metrics
+
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS")
+# Відповіді, після яких має сенс повторити запит
+RETRY_STATUSES = (502, 503, 504)
+# Відповіді, що рахуються помилкою сервісу для circuit breaker
+FAILURE_STATUSES = (500, 502, 503, 504)
+
+
+class CircuitOpenError(httpx.TransportError):
+    """Запит відхилено без звернення до сервісу: його circuit breaker відкритий."""
+
+    def __init__(self, upstream: str, retry_after: int, request: httpx.Request):
+        super().__init__(f"{upstream} service circuit is open", request=request)
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    closed -> open після failure_threshold помилок поспіль; у стані open запити
+    одразу відхиляються reset_timeout секунд, потім half_open пропускає один
+    пробний запит: успіх закриває ланцюг, помилка знову відкриває.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+    _STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, upstream: str, failure_threshold: int, reset_timeout: float):
+        self.upstream = upstream
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opened = 0
+        self.rejected = 0
+        self.last_error = None
+        self._probing = False
+        metrics.UPSTREAM_CIRCUIT_STATE.labels(upstream).set(0)
+
+    def _set_state(self, state: str):
+        self.state = state
+        metrics.UPSTREAM_CIRCUIT_STATE.labels(self.upstream).set(self._STATE_CODES[state])
+
+    def allow(self) -> bool:
+        if self.failure_threshold <= 0:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._set_state(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        if self.state == self.CLOSED:
+            return True
+        self.rejected += 1
+        metrics.UPSTREAM_CIRCUIT_REJECTED.labels(self.upstream).inc()
+        return False
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.reset_timeout - (time.monotonic() - self.opened_at)))
+
+    def record_success(self):
+        self.failures = 0
+        self._probing = False
+        if self.state != self.CLOSED:
+            self._set_state(self.CLOSED)
+
+    def record_failure(self, error: str):
+        self.failures += 1
+        self.last_error = error
+        self._probing = False
+        if self.failure_threshold <= 0:
+            return
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            if self.state != self.OPEN:
+                self.opened += 1
+                self._set_state(self.OPEN)
+
+    def release(self):
+        # Спробу скасовано (програвший hedge, клієнт пішов) — це не успіх і не помилка
+        self._probing = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "last_error": self.last_error,
+            "retry_after": self.retry_after() if self.state == self.OPEN else 0,
+        }
+
+
+# Один breaker на сервіс на весь час життя процесу (клієнти можуть перестворюватись)
+breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(upstream: str, policy: dict) -> CircuitBreaker:
+    breaker = breakers.get(upstream)
+    if breaker is None:
+        breaker = CircuitBreaker(upstream, policy["breaker_failures"], policy["breaker_reset"])
+        breakers[upstream] = breaker
+    return breaker
+
+
+def _copy_request(request: httpx.Request) -> httpx.Request:
+    # Повтор/hedge лише для запитів без тіла, тож достатньо скопіювати заголовки
+    return httpx.Request(request.method, request.url, headers=request.headers, extensions=request.extensions)
+
+
+def _close_later(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is None:
+        asyncio.ensure_future(task.result().aclose())
+
+
+def _discard(task: asyncio.Task):
+    if task.done():
+        _close_later(task)
+    else:
+        task.cancel()
+        task.add_done_callback(_close_later)
+
+
+def _succeeded(task: asyncio.Task) -> bool:
+    return task.exception() is None and task.result().status_code not in FAILURE_STATUSES
+
+
+class ResilientTransport(httpx.AsyncBaseTransport):
+    """Обгортка транспорту httpx: breaker, повтори і hedging для одного upstream-сервісу."""
+
+    def __init__(self, upstream: str, transport: httpx.AsyncBaseTransport, policy: dict):
+        self.upstream = upstream
+        self.transport = transport
+        self.policy = policy
+        self.breaker = get_breaker(upstream, policy)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        idempotent = request.method in IDEMPOTENT_METHODS
+        retries = self.policy["retries"] if idempotent else 0
+        hedge_after = self.policy["hedge_after"] if idempotent and request.extensions.get("hedge") else 0
+        attempt = 0
+        while True:
+            try:
+                if hedge_after > 0:
+                    response = await self._hedged(request, hedge_after)
+                else:
+                    response = await self._attempt(request)
+            except CircuitOpenError:
+                raise
+            except httpx.TransportError as e:
+                if attempt >= retries:
+                    raise
+                reason = type(e).__name__
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                    return response
+                await response.aclose()
+                reason = str(response.status_code)
+            metrics.UPSTREAM_RETRIES.labels(self.upstream, reason).inc()
+            await asyncio.sleep(random.uniform(0, self.policy["retry_backoff"] * 2 ** attempt))
+            attempt += 1
+            request = _copy_request(request)
+
+    async def _attempt(self, request: httpx.Request) -> httpx.Response:
+        if not self.breaker.allow():
+            raise CircuitOpenError(self.upstream, self.breaker.retry_after(), request)
+        try:
+            response = await self.transport.handle_async_request(request)
+        except httpx.TransportError as e:
+            self.breaker.record_failure(type(e).__name__)
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        if response.status_code in FAILURE_STATUSES:
+            self.breaker.record_failure(f"HTTP {response.status_code}")
+        else:
+            self.breaker.record_success()
+        return response
+
+    async def _hedged(self, request: httpx.Request, delay: float) -> httpx.Response:
+        """
+        Якщо основний запит не відповів за delay секунд, паралельно йде копія.
+        Повертається перша вдала відповідь (без помилки і не 5xx з FAILURE_STATUSES):
+        невдала спроба не перемагає, поки інша ще виконується. Решта скасовується.
+        """
+        primary = asyncio.ensure_future(self._attempt(request))
+        tasks = [primary]
+        winner = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                winner = primary
+                return primary.result()
+            hedge = asyncio.ensure_future(self._attempt(_copy_request(request)))
+            tasks.append(hedge)
+            metrics.UPSTREAM_HEDGES.labels(self.upstream, "sent").inc()
+            pending = set(tasks)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in tasks if task in done and _succeeded(task)), None)
+            if winner is None:
+                # Обидві спроби невдалі — віддаємо відповідь (спершу основної), а якщо
+                # відповідей немає — помилку основної; повтори вирішує handle_async_request
+                winner = next((task for task in tasks if task.exception() is None), primary)
+                return winner.result()
+            if winner is hedge:
+                metrics.UPSTREAM_HEDGES.labels(self.upstream, "won").inc()
+            return winner.result()
+        finally:
+            for task in tasks:
+                if task is not winner:
+                    _discard(task)
+
+    async def aclose(self):
+        await self.transport.aclose()
@@ -1,96 +1,303 @@
-from fastapi import APIRouter, Request, HTTPException, Depends, UploadFile, File, Form
-from api_gateway.dependencies import get_current_user
+import asyncio
+import logging
+import time
+
 import httpx
+from fastapi import APIRouter, Request, HTTPException, Depends
+from fastapi.responses import Response, StreamingResponse
+from common.encoding import etag_matches, preferred_encoding
+from api_gateway.dependencies import get_current_user
+from api_gateway.clients import get_client
+from api_gateway.cache import CachedResponse, response_cache
+from api_gateway import config
+from api_gateway.logs import log_event
+from api_gateway.prefetch import page_cache
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+BOOK_SERVICE_URL = "/books"
+
+# Теги кешу: "books" — сторінки каталогу, "book:{id}" — усе, що стосується однієї книги
+CATALOG_TAG = "books"
+
+def book_tag(book_id: int) -> str:
+    return f"book:{book_id}"
+
+# Заголовки відповіді book_service, які зберігаються в кеші і віддаються клієнту;
+# Cache-Control: no-store має книга, текст якої ще витягується, — такі відповіді не кешуються
+PASS_HEADERS = ("ETag", "Content-Encoding", "Vary", "X-Next-Cursor", "Cache-Control")
+
+INGEST_FINISHED = ("done", "failed")
+# Фонові задачі, що чекають на завершення ingest job (посилання, щоб їх не зібрав GC)
+_ingest_watchers: set = set()
+
+def ingest_finished(book_id: int):
+    """Текст книги дописано (або витягання не вдалося): pages, контент і сторінки змінилися."""
+    response_cache.invalidate(CATALOG_TAG, book_tag(book_id))
+    page_cache.invalidate(book_id)
+
+async def _watch_ingest(book_id: int, job_id: str):
+    deadline = time.monotonic() + config.INGEST_WATCH_TIMEOUT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(config.INGEST_POLL_INTERVAL)
+        try:
+            response = await get_client("book").get(f"{BOOK_SERVICE_URL}/jobs/{job_id}")
+        except httpx.HTTPError as e:
+            logger.debug("Polling ingest job %s failed: %s", job_id, e)
+            continue
+        if response.status_code == 404:
+            return
+        if response.status_code == 200 and response.json()["status"] in INGEST_FINISHED:
+            ingest_finished(book_id)
+            return
+
+def watch_ingest(book_id: int, job_id: str):
+    task = asyncio.create_task(_watch_ingest(book_id, job_id))
+    _ingest_watchers.add(task)
+    task.add_done_callback(_ingest_watchers.discard)
 
-BOOK_SERVICE_URL = "http://localhost:8002/books"
+async def shutdown():
+    for task in list(_ingest_watchers):
+        task.cancel()
+    await asyncio.gather(*_ingest_watchers, return_exceptions=True)
+
+async def cached_get(request: Request, path: str, tags, params: dict | None = None, hedge: bool = False) -> CachedResponse:
+    """
+    GET до book_service через кеш; однакові одночасні запити йдуть в upstream один раз.
+    Тіло зберігається у тому вигляді, як його стиснув book_service, окремо для кожного кодування.
+    hedge — дозволити дублюючий запит, якщо book_service відповідає повільно (GATEWAY_BOOK_HEDGE_AFTER).
+    """
+    # Без кешу перевірку валідатора робить сам book_service
+    if_none_match = request.headers.get("if-none-match") if response_cache.ttl <= 0 else None
+    return await fetch_cached(
+        path, tags, params, preferred_encoding(request.headers.get("accept-encoding")), hedge, if_none_match
+    )
+
+async def fetch_cached(
+    path: str,
+    tags,
+    params: dict | None = None,
+    encoding: str = "identity",
+    hedge: bool = False,
+    if_none_match: str | None = None,
+) -> CachedResponse:
+    """cached_get без запиту клієнта — для даних book_service, потрібних самому gateway."""
+    params = params or {}
+    key = ("GET", path, tuple(sorted(params.items())), encoding)
+    upstream_headers = {"Accept-Encoding": encoding}
+    if if_none_match:
+        upstream_headers["If-None-Match"] = if_none_match
+
+    async def fetch():
+        async with get_client("book").stream(
+            "GET", path, params=params, headers=upstream_headers, extensions={"hedge": hedge}
+        ) as response:
+            # aiter_raw — без розпакування, щоб не стискати повторно
+            content = b"".join([chunk async for chunk in response.aiter_raw()])
+        headers = {h: response.headers[h] for h in PASS_HEADERS if h in response.headers}
+        return CachedResponse(response.status_code, content, headers)
+
+    return await response_cache.get_or_fetch(key, fetch, tags)
+
+def cached_response(request: Request, cached: CachedResponse) -> Response:
+    etag = cached.headers.get("ETag")
+    if cached.status_code == 304 or (
+        etag and cached.status_code == 200 and etag_matches(request.headers.get("if-none-match"), etag)
+    ):
+        return Response(status_code=304, headers={h: v for h, v in cached.headers.items() if h in ("ETag", "Vary")})
+    if cached.status_code != 200:
+        raise HTTPException(cached.status_code, cached.content.decode("utf-8", "replace"))
+    return Response(content=cached.content, media_type="application/json", headers=cached.headers)
 
 @router.get("/")
-async def get_books():
-    async with httpx.AsyncClient() as client:
-        response = await client.get(BOOK_SERVICE_URL)
-        print("STATUS:", response.status_code)
-        print("TEXT:", response.text)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
+async def get_books(request: Request):
+    # Параметри пагінації/фільтрів і курсор X-Next-Cursor передаються без змін
+    cached = await cached_get(request, BOOK_SERVICE_URL, [CATALOG_TAG], dict(request.query_params))
+    return cached_response(request, cached)
 
 @router.post("/")
 async def create_book(request: Request):
     book_data = await request.json()
-    async with httpx.AsyncClient(follow_redirects=True) as client:
-        response = await client.post(BOOK_SERVICE_URL, json=book_data)
-        print("STATUS:", response.status_code)
-        print("TEXT:", response.text)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            raise HTTPException(response.status_code, response.text)
+    response = await get_client("book").post(BOOK_SERVICE_URL, json=book_data)
+    log_event("book_create", response.status_code)
+    if response.status_code == 200:
+        response_cache.invalidate(CATALOG_TAG)
+        return response.json()
+    else:
+        raise HTTPException(response.status_code, response.text)
+
+@router.get("/search")
+async def search_books(request: Request):
+    response = await get_client("book").get(f"{BOOK_SERVICE_URL}/search", params=dict(request.query_params))
+    if response.status_code == 200:
+        return response.json()
+    else:
+        raise HTTPException(response.status_code, response.text)
 
 @router.get("/{book_id}")
-async def get_book(book_id: int):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{BOOK_SERVICE_URL}/{book_id}")
-        print("STATUS:", response.status_code)
-        print("TEXT:", response.text)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            raise HTTPException(response.status_code, response.text)
+async def get_book(book_id: int, request: Request):
+    cached = await cached_get(request, f"{BOOK_SERVICE_URL}/{book_id}", [book_tag(book_id)], hedge=True)
+    return cached_response(request, cached)
 
 @router.delete("/{book_id}")
 async def delete_book(book_id: int):
-    async with httpx.AsyncClient() as client:
-        response = await client.delete(f"{BOOK_SERVICE_URL}/{book_id}")
-        print("STATUS:", response.status_code)
-        print("TEXT:", response.text)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            raise HTTPException(response.status_code, response.text)
+    response = await get_client("book").delete(f"{BOOK_SERVICE_URL}/{book_id}")
+    log_event("book_delete", response.status_code, book_id=book_id)
+    if response.status_code == 200:
+        response_cache.invalidate(CATALOG_TAG, book_tag(book_id))
+        page_cache.invalidate(book_id)
+        return response.json()
+    else:
+        raise HTTPException(response.status_code, response.text)
 
 @router.post("/admin/add")
-async def admin_add_book(
-    title: str = Form(...),
-    author: str = Form(...),
-    genre: str = Form(...),
-    description: str = Form(''),
-    year: int = Form(...),
-    cover_url: str = Form(''),
-    file: UploadFile = File(...),
-    user=Depends(get_current_user)
-):
+async def admin_add_book(request: Request, user=Depends(get_current_user)):
+    """
+    Поля форми: title, author, genre, description, year, cover_url, file.
+    Тіло multipart/form-data не розбирається і не буферизується — воно потоком
+    передається у book_service разом з оригінальним Content-Type (boundary).
+    """
     if user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Тільки для адмінов")
-    # Відправляємо multipart/form-data на book_service
-    data = {
-        "title": title,
-        "author": author,
-        "genre": genre,
-        "description": description,
-        "year": str(year),
-        "cover_url": cover_url,
-    }
-    file_bytes = await file.read()
-    files = {
-        "file": (file.filename, file_bytes, file.content_type)
-    }
-    async with httpx.AsyncClient(timeout=60) as client:
-        response = await client.post(f"{BOOK_SERVICE_URL}/upload", data=data, files=files)
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("multipart/form-data"):
+        raise HTTPException(status_code=400, detail="Очікується multipart/form-data")
+    headers = {"Content-Type": content_type}
+    if "content-length" in request.headers:
+        headers["Content-Length"] = request.headers["content-length"]
+    response = await get_client("book").post(
+        f"{BOOK_SERVICE_URL}/upload",
+        content=request.stream(),
+        headers=headers,
+        timeout=config.UPLOAD_TIMEOUT,
+    )
     if response.status_code == 200:
+        book = response.json()
+        response_cache.invalidate(CATALOG_TAG, book_tag(book["id"]))
+        page_cache.invalidate(book["id"])
+        if book.get("job_id"):
+            watch_ingest(book["id"], book["job_id"])
+        return book
+    else:
+        raise HTTPException(status_code=response.status_code, detail=response.text)
+
+@router.post("/admin/bulk")
+async def admin_bulk_import(request: Request, format: str | None = None, user=Depends(get_current_user)):
+    """NDJSON або CSV каталог потоком передається у book_service /books/bulk."""
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Тільки для адмінов")
+    headers = {"Content-Type": request.headers.get("content-type", "application/x-ndjson")}
+    if "content-length" in request.headers:
+        headers["Content-Length"] = request.headers["content-length"]
+    response = await get_client("book").post(
+        f"{BOOK_SERVICE_URL}/bulk",
+        params={"format": format} if format else None,
+        content=request.stream(),
+        headers=headers,
+        timeout=config.UPLOAD_TIMEOUT,
+    )
+    if response.status_code == 200:
+        # Імпорт може змінити будь-яку книгу — скидаємо кеш цілком
+        response_cache.clear()
+        page_cache.clear()
         return response.json()
     else:
         raise HTTPException(status_code=response.status_code, detail=response.text)
 
+@router.get("/jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    response = await get_client("book").get(f"{BOOK_SERVICE_URL}/jobs/{job_id}")
+    if response.status_code == 200:
+        job = response.json()
+        if job["status"] in INGEST_FINISHED:
+            # Job могла поставити інша репліка gateway — скидаємо кеш і тут
+            ingest_finished(job["book_id"])
+        return job
+    else:
+        raise HTTPException(response.status_code, response.text)
+
 @router.get("/{book_id}/content")
-async def get_book_content(book_id: int):
-    import httpx
-    BOOK_SERVICE_URL = "http://localhost:8002/books"
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{BOOK_SERVICE_URL}/{book_id}/content")
-        if response.status_code == 200:
-            return response.json()
-        else:
-            raise HTTPException(response.status_code, response.text)
+async def get_book_content(book_id: int, request: Request):
+    # start/count передаються як є; без них book_service віддає весь контент
+    cached = await cached_get(
+        request, f"{BOOK_SERVICE_URL}/{book_id}/content", [book_tag(book_id)], dict(request.query_params), hedge=True
+    )
+    return cached_response(request, cached)
+
+@router.get("/{book_id}/pages/{page}")
+async def get_book_page(book_id: int, page: int, request: Request):
+    # Спершу кеш сторінок, який гріє prefetch за прогресом читання (POST /reading/start)
+    cached = page_cache.get(book_id, page, preferred_encoding(request.headers.get("accept-encoding")))
+    if cached is not None:
+        return cached_response(request, cached)
+    cached = await cached_get(request, f"{BOOK_SERVICE_URL}/{book_id}/pages/{page}", [book_tag(book_id)], hedge=True)
+    return cached_response(request, cached)
+
+# Заголовки обкладинки, що зберігаються в кеші gateway разом із зображенням
+COVER_HEADERS = ("ETag", "Cache-Control", "Content-Type", "X-Cover-Version")
+
+@router.get("/{book_id}/cover")
+async def get_book_cover(book_id: int, request: Request, size: str = "m", v: str | None = None):
+    """Зменшена обкладинка з book_service (size=s|m|l); зображення вже стиснуте, тож кешується одним варіантом."""
+    async def fetch():
+        response = await get_client("book").get(
+            f"{BOOK_SERVICE_URL}/{book_id}/cover", params=params, extensions={"hedge": True}
+        )
+        headers = {h: response.headers[h] for h in COVER_HEADERS if h in response.headers}
+        return CachedResponse(response.status_code, response.content, headers)
+
+    params = {"size": size, **({"v": v} if v else {})}
+    cached = await response_cache.get_or_fetch(("cover", book_id, size, v), fetch, [book_tag(book_id)])
+    etag = cached.headers.get("ETag")
+    if cached.status_code == 200 and etag and etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={h: cached.headers[h] for h in ("ETag", "Cache-Control") if h in cached.headers})
+    if cached.status_code != 200:
+        raise HTTPException(cached.status_code, cached.content.decode("utf-8", "replace"))
+    return Response(content=cached.content, headers=cached.headers)
+
+# Оригінал книги: заголовки запиту, що йдуть у book_service, і відповіді, що йдуть клієнту
+FILE_REQUEST_HEADERS = ("Range", "If-Range", "If-None-Match")
+FILE_HEADERS = (
+    "Content-Type", "Content-Length", "Content-Range", "Accept-Ranges",
+    "ETag", "Last-Modified", "Cache-Control", "Content-Disposition",
+)
+
+class UpstreamStreamingResponse(StreamingResponse):
+    """
+    Тіло upstream-відповіді httpx (stream=True) потоком до клієнта. Upstream закривається
+    після відправки, помилки чи відключення клієнта — навіть якщо ітерація тіла так і не
+    почалась (тоді ні finally генератора, ні background StreamingResponse не виконуються).
+    """
+
+    def __init__(self, upstream: httpx.Response, pass_headers: tuple):
+        headers = {h: upstream.headers[h] for h in pass_headers if h in upstream.headers}
+        super().__init__(upstream.aiter_raw(), status_code=upstream.status_code, headers=headers)
+        self.upstream = upstream
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.upstream.aclose()
+
+@router.api_route("/{book_id}/file", methods=["GET", "HEAD"])
+async def get_book_file(book_id: int, request: Request):
+    """
+    Оригінал книги (PDF/TXT) потоком з book_service: тіло не буферизується і не кешується,
+    Range/If-Range передаються як є, тож часткові відповіді 206 проходять без змін.
+    """
+    client = get_client("book")
+    upstream = await client.send(
+        client.build_request(
+            request.method,
+            f"{BOOK_SERVICE_URL}/{book_id}/file",
+            headers={h: request.headers[h] for h in FILE_REQUEST_HEADERS if h in request.headers},
+        ),
+        stream=True,
+    )
+    if upstream.status_code not in (200, 206, 304, 416):
+        detail = (await upstream.aread()).decode("utf-8", "replace")
+        await upstream.aclose()
+        raise HTTPException(upstream.status_code, detail)
+    return UpstreamStreamingResponse(upstream, FILE_HEADERS)
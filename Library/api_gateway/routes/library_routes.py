@@ -0,0 +1,111 @@
+# api_gateway/routes/library_routes.py
+
+import asyncio
+import hashlib
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import Response
+from api_gateway import config
+from api_gateway.cache import CachedResponse, response_cache
+from api_gateway.clients import get_client
+from api_gateway.dependencies import get_current_user
+from api_gateway.routes.book_routes import BOOK_SERVICE_URL, CATALOG_TAG, book_tag, fetch_cached
+
+router = APIRouter(tags=["Library"])
+
+# Поля книги, потрібні для полиці читача
+LIBRARY_BOOK_FIELDS = "id,title,author,year,pages,cover_url,cover_version"
+POPULAR_LIMIT_MAX = 100
+
+
+def percent_complete(current_page: int | None, pages: int | None) -> float | None:
+    if not pages or current_page is None:
+        return None
+    return round(min(max(current_page, 0), pages) / pages * 100, 1)
+
+
+async def fetch_books(book_ids: list[int]) -> dict[int, dict]:
+    """Метадані книг пакетами GET /books?ids=...; пакети запитуються паралельно."""
+    batches = [
+        book_ids[i:i + config.LIBRARY_BATCH_SIZE]
+        for i in range(0, len(book_ids), config.LIBRARY_BATCH_SIZE)
+    ]
+    client = get_client("book")
+    responses = await asyncio.gather(*(
+        client.get("/books", params={"ids": ",".join(map(str, batch)), "fields": LIBRARY_BOOK_FIELDS})
+        for batch in batches
+    ))
+    books = {}
+    for response in responses:
+        if response.status_code != 200:
+            raise HTTPException(response.status_code, response.text)
+        books.update((book["id"], book) for book in response.json())
+    return books
+
+
+async def book_pages(book_id: int) -> int | None:
+    """
+    Кількість сторінок книги (для статистики "дочитали" в reading_service) із закешованої
+    відповіді GET /books/{id}: оновлення прогресу не ходять щоразу в book_service.
+    Поки текст витягується, pages = 0 і відповідь не кешується — кількість невідома.
+    """
+    cached = await fetch_cached(f"{BOOK_SERVICE_URL}/{book_id}", [book_tag(book_id)], hedge=True)
+    if cached.status_code != 200:
+        return None
+    return json.loads(cached.content).get("pages") or None
+
+
+@router.get("/me/library")
+async def get_my_library(user=Depends(get_current_user)):
+    """
+    Полиця поточного користувача одним запитом: прогрес з reading_service разом
+    з метаданими книг з book_service і відсотком прочитаного (за Book.pages).
+    Книги, яких уже немає в каталозі, пропускаються.
+    """
+    user_id = str(user.get("id") or user.get("user_id"))
+    response = await get_client("reading").get(f"/reading/progress/{user_id}")
+    if response.status_code != 200:
+        raise HTTPException(response.status_code, response.text)
+    progress = response.json()
+    book_ids = list(dict.fromkeys(item["book_id"] for item in progress))
+    books = await fetch_books(book_ids) if book_ids else {}
+
+    shelf = []
+    for item in progress:
+        book = books.get(item["book_id"])
+        if book is None:
+            continue
+        shelf.append({
+            "book_id": item["book_id"],
+            "current_page": item["current_page"],
+            "percent_complete": percent_complete(item["current_page"], book.get("pages")),
+            "book": book,
+        })
+    return shelf
+
+
+@router.get("/books/popular")
+async def get_popular_books(by: str = "reading", limit: int = Query(10, ge=1, le=POPULAR_LIMIT_MAX)):
+    """
+    Популярні книги з метаданими. Рейтинг (reading — зараз читають, finished — дочитали,
+    24h / 7d — активність) береться з агрегатів reading_service і кешується як каталог.
+    """
+    async def fetch():
+        response = await get_client("reading").get("/reading/stats/popular", params={"by": by, "limit": limit})
+        if response.status_code != 200:
+            return CachedResponse(response.status_code, response.content)
+        items = response.json()["items"]
+        books = await fetch_books([item["book_id"] for item in items]) if items else {}
+        popular = [
+            {"book": books[item["book_id"]], "stats": item}
+            for item in items if item["book_id"] in books
+        ]
+        body = json.dumps(popular).encode()
+        # ETag зі вмісту: у кеш gateway потрапляють лише відповіді з валідатором
+        return CachedResponse(200, body, {"ETag": f'"{hashlib.sha256(body).hexdigest()[:32]}"'})
+
+    cached = await response_cache.get_or_fetch(("popular", by, limit), fetch, [CATALOG_TAG])
+    if cached.status_code != 200:
+        raise HTTPException(cached.status_code, cached.content.decode(errors="replace"))
+    return Response(cached.content, media_type="application/json", headers=cached.headers)
@@ -1,12 +1,17 @@
 # api_gateway/routes/reading_routes.py
 
+import httpx
 from fastapi import APIRouter, Body, Request, HTTPException, Depends
+from common.encoding import preferred_encoding
 from api_gateway.dependencies import get_current_user
-import httpx
+from api_gateway.clients import get_client
+from api_gateway.logs import log_event
+from api_gateway.prefetch import prefetcher
+from api_gateway.routes.library_routes import book_pages
 
 router = APIRouter(prefix="/reading", tags=["Reading"])
 
-READING_SERVICE_URL = "http://localhost:8003/reading"  # Замінити, якщо сервіс працює на іншому порту
+READING_SERVICE_URL = "/reading"  # Адреса сервісу задається через READING_SERVICE_URL у config
 
 @router.post("/start")
 async def start_reading(request: Request, user=Depends(get_current_user)):
@@ -20,12 +25,22 @@ async def start_reading(request: Request, user=Depends(get_current_user)):
         raise HTTPException(401, "User ID not found")
 
     data["user_id"] = user_id
-    print("Sending to reading service:", data)
-    
-    async with httpx.AsyncClient() as client:
-        response = await client.post(f"{READING_SERVICE_URL}/start", json=data)
+    # Кількість сторінок для статистики "дочитали" береться з каталогу, а не від клієнта
+    data.pop("total_pages", None)
+    if isinstance(data.get("book_id"), int):
+        try:
+            pages = await book_pages(data["book_id"])
+        except httpx.HTTPError:
+            pages = None  # без неї прогрес однаково зберігається
+        if pages:
+            data["total_pages"] = pages
+    response = await get_client("reading").post(f"{READING_SERVICE_URL}/start", json=data)
+    log_event("reading_start", response.status_code, user_id=user_id, book_id=data.get("book_id"), page=data.get("page"))
     if response.status_code != 200:
         raise HTTPException(response.status_code, response.text)
+    # Читач іде по книзі послідовно — гріємо кеш наступними сторінками
+    if isinstance(data.get("book_id"), int) and isinstance(data.get("page"), int):
+        prefetcher.signal(data["book_id"], data["page"], preferred_encoding(request.headers.get("accept-encoding")))
     return response.json()
 
 @router.post("/stop")
@@ -38,8 +53,7 @@ async def stop_reading(request: Request, user=Depends(get_current_user)):
     data["user_id"] = getattr(user, "id", user.get("id") if isinstance(user, dict) else None)
 
 
-    async with httpx.AsyncClient() as client:
-        response = await client.post(f"{READING_SERVICE_URL}/stop", json=data)
+    response = await get_client("reading").post(f"{READING_SERVICE_URL}/stop", json=data)
     if response.status_code != 200:
         raise HTTPException(response.status_code, response.text)
     return response.json()
@@ -52,8 +66,7 @@ async def get_user_progress(user_id: str, user=Depends(get_current_user)):
     """
     if user_id != str(user.get("id") or user.get("user_id")):
         raise HTTPException(403, "Access denied")
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{READING_SERVICE_URL}/progress/{user_id}")
+    response = await get_client("reading").get(f"{READING_SERVICE_URL}/progress/{user_id}")
     if response.status_code != 200:
         raise HTTPException(response.status_code, response.text)
     return response.json()
@@ -67,12 +80,24 @@ async def get_user_book_progress(user_id: str, book_id: int, user=Depends(get_cu
     """
     if user_id != str(user.get("id") or user.get("user_id")):
         raise HTTPException(403, "Access denied")
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{READING_SERVICE_URL}/progress/{user_id}")
+    response = await get_client("reading").get(f"{READING_SERVICE_URL}/progress/{user_id}/{book_id}")
+    # Формат відповіді як і раніше — список (порожній, якщо прогресу немає)
+    if response.status_code == 404:
+        return []
+    if response.status_code != 200:
+        raise HTTPException(response.status_code, response.text)
+    return [response.json()]
+
+@router.post("/progress/batch")
+async def get_user_progress_batch(data: dict = Body(...), user=Depends(get_current_user)):
+    """
+    Прогрес поточного користувача для кількох книг одним запитом.
+    Очікує JSON: {"book_ids": [int, ...]}
+    """
+    user_id = str(user.get("id") or user.get("user_id"))
+    book_ids = data.get("book_ids") or []
+    items = [{"user_id": user_id, "book_id": book_id} for book_id in book_ids]
+    response = await get_client("reading").post(f"{READING_SERVICE_URL}/progress/batch", json={"items": items})
     if response.status_code != 200:
         raise HTTPException(response.status_code, response.text)
-    # Фільтруємо по book_id, якщо потрібно
-    all_progress = response.json()
-    if isinstance(all_progress, list):
-        return [p for p in all_progress if p.get("book_id") == book_id]
-    return all_progress
+    return response.json()
@@ -0,0 +1,35 @@
+"""Трасування gateway; реалізація — common.tracing."""
+import httpx
+
+from common.tracing import (  # noqa: F401
+    CLIENT, INTERNAL, SERVER, Tracer, current_span, format_traceparent, parse_traceparent, run_in_context,
+)
+
+SERVICE = "api_gateway"
+tracer = Tracer(SERVICE)
+processor = tracer.processor
+start_span = tracer.start_span
+traced = tracer.traced
+instrument_app = tracer.instrument_app
+set_exporter = tracer.set_exporter
+
+
+class TracingTransport(httpx.AsyncBaseTransport):
+    """Обгортка транспорту httpx: клієнтський спан і заголовок traceparent на кожен upstream-виклик."""
+
+    def __init__(self, upstream: str, transport: httpx.AsyncBaseTransport):
+        self.upstream = upstream
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        attributes = {"http.method": request.method, "http.url": str(request.url), "peer.service": self.upstream}
+        with start_span(f"{request.method} {self.upstream}", CLIENT, **attributes) as span:
+            request.headers["traceparent"] = format_traceparent(span)
+            response = await self.transport.handle_async_request(request)
+            span.set_attribute("http.status_code", response.status_code)
+            if response.status_code >= 500:
+                span.set_error(f"HTTP {response.status_code}")
+            return response
+
+    async def aclose(self):
+        await self.transport.aclose()
@@ -0,0 +1,108 @@
+"""
+Холодний старт сервісів: час від запуску uvicorn-процесу до першої відповіді 200
+на /health/live і /health/ready. Схема створюється міграціями до вимірювання,
+тож у цифри потрапляє лише старт самого застосунку.
+
+Запуск з каталогу Library:
+
+    python -m benchmarks.coldstart --runs 5 --max-seconds 3
+
+Код виходу 1, якщо медіана часу до readiness хоча б одного сервісу перевищує
+--max-seconds.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from . import stand
+
+SERVICES = ("user", "book", "reading", "gateway")
+
+
+def measure(service: str, timeout: float) -> dict:
+    started = time.monotonic()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", stand.APPS[service],
+         "--host", "127.0.0.1", "--port", str(stand.PORTS[service]), "--log-level", "warning"],
+        cwd=stand.LIBRARY_DIR,
+        env=os.environ.copy(),
+    )
+    timings = {}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{stand.PORTS[service]}", timeout=5) as client:
+            for probe in ("live", "ready"):
+                while True:
+                    try:
+                        if client.get(f"/health/{probe}").status_code == 200:
+                            timings[probe] = time.monotonic() - started
+                            break
+                    except httpx.TransportError:
+                        pass
+                    if process.poll() is not None:
+                        raise RuntimeError(f"{service} exited with code {process.returncode}")
+                    if time.monotonic() - started > timeout:
+                        raise RuntimeError(f"{service} was not ready in {timeout}s")
+                    time.sleep(0.01)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return timings
+
+
+def main(argv) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.coldstart", description=__doc__.split("\n")[1])
+    parser.add_argument("--database-url", help="default: temporary SQLite file")
+    parser.add_argument("--runs", type=int, default=3, help="starts per service")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for one start")
+    parser.add_argument("--max-seconds", type=float, help="fail if median time to ready exceeds this")
+    parser.add_argument("--output", help="save results as JSON")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="library-coldstart-")
+    database_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'coldstart.db')}"
+    stand.configure_env(database_url, os.path.join(workdir, "uploaded_books"), 4, True)
+
+    from .seed import ensure_schema
+
+    ensure_schema()
+
+    results = {}
+    for service in SERVICES:
+        runs = [measure(service, args.timeout) for _ in range(args.runs)]
+        results[service] = {
+            probe: {
+                "median_s": round(statistics.median(r[probe] for r in runs), 3),
+                "max_s": round(max(r[probe] for r in runs), 3),
+            }
+            for probe in ("live", "ready")
+        }
+
+    print(f"{'service':<10}{'live p50':>10}{'live max':>10}{'ready p50':>11}{'ready max':>11}")
+    for service, timings in results.items():
+        live, ready = timings["live"], timings["ready"]
+        print(f"{service:<10}{live['median_s']:>9.3f}s{live['max_s']:>9.3f}s{ready['median_s']:>10.3f}s{ready['max_s']:>10.3f}s")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"runs": args.runs, "database": database_url.split("://", 1)[0], "services": results}, f, indent=2)
+
+    if args.max_seconds is not None:
+        slow = [s for s, t in results.items() if t["ready"]["median_s"] > args.max_seconds]
+        for service in slow:
+            print(f"SLOW START {service}: {results[service]['ready']['median_s']:.3f}s > {args.max_seconds}s")
+        if slow:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
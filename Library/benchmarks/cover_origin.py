@@ -0,0 +1,115 @@
+"""
+Локальний stand-in для хоста обкладинок (covers.openlibrary.org): book_service
+ходить на нього через COVER_ORIGIN_URL, тож стенд і тести не залежать від мережі.
+
+    python -m benchmarks.cover_origin --port 8010
+    COVER_ORIGIN_URL=http://127.0.0.1:8010 uvicorn book_service.main:app
+
+Без явно заданих images віддає згенерований JPEG на будь-який шлях *.jpg.
+"""
+import argparse
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+
+def make_jpeg(width: int = 600, height: int = 900, color=(120, 60, 30)) -> bytes:
+    from PIL import Image
+
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+class CoverOrigin:
+    """
+    HTTP-сервер у фоновому потоці. images: шлях -> байти, redirects: шлях -> Location;
+    невідомий шлях — 404. requests — список шляхів у порядку запитів.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, images: Optional[Dict[str, bytes]] = None):
+        self.images: Optional[Dict[str, bytes]] = images
+        self.redirects: Dict[str, str] = {}
+        self.requests: List[str] = []
+        self._default_image: Optional[bytes] = None
+        origin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                origin.requests.append(self.path)
+                location = origin.redirects.get(self.path)
+                if location is not None:
+                    self.send_response(302)
+                    self.send_header("Location", location)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = origin._image(self.path)
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    def _image(self, path: str) -> Optional[bytes]:
+        if self.images is not None:
+            return self.images.get(path)
+        if not path.endswith(".jpg"):
+            return None
+        if self._default_image is None:
+            self._default_image = make_jpeg()
+        return self._default_image
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "CoverOrigin":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="cover-origin", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "CoverOrigin":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in для хоста обкладинок")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8010)
+    args = parser.parse_args()
+    origin = CoverOrigin(args.host, args.port)
+    print(f"Cover origin on {origin.url}")
+    try:
+        origin._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        origin._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
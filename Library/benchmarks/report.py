@@ -0,0 +1,81 @@
+"""Зведення результатів, збереження у JSON і порівняння з базовою лінією."""
+import json
+import math
+from typing import Dict, List
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    # Nearest-rank: значення, нижче якого лежить p% вимірів
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+def build_results(recorder, meta: dict) -> dict:
+    routes = {
+        route: summarize(values, recorder.errors.get(route, 0), recorder.elapsed)
+        for route, values in sorted(recorder.latencies.items())
+    }
+    everything = [value for values in recorder.latencies.values() for value in values]
+    return {
+        "meta": meta,
+        "total": summarize(everything, sum(recorder.errors.values()), recorder.elapsed),
+        "routes": routes,
+    }
+
+
+def save(results: dict, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def format_table(results: dict) -> str:
+    header = f"{'route':<32} {'req':>8} {'err':>6} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    lines = [header, "-" * len(header)]
+    rows = list(results["routes"].items()) + [("TOTAL", results["total"])]
+    for route, s in rows:
+        lines.append(
+            f"{route:<32} {s['requests']:>8} {s['errors']:>6} {s['rps']:>9.1f} "
+            f"{s['p50_ms']:>9.2f} {s['p95_ms']:>9.2f} {s['p99_ms']:>9.2f}"
+        )
+    return "\n".join(lines)
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """
+    Регресії відносно baseline: p95 виріс або throughput впав більше ніж на
+    threshold відсотків, або з'явилися помилки. Порожній список — регресій немає.
+    """
+    regressions = []
+    base_routes: Dict[str, dict] = baseline.get("routes", {})
+    for route, current in results["routes"].items():
+        base = base_routes.get(route)
+        if base is None:
+            continue
+        if base["p95_ms"] and current["p95_ms"] > base["p95_ms"] * (1 + threshold / 100):
+            regressions.append(f"{route}: p95 {base['p95_ms']:.2f} -> {current['p95_ms']:.2f} ms")
+        if base["rps"] and current["rps"] < base["rps"] * (1 - threshold / 100):
+            regressions.append(f"{route}: rps {base['rps']:.1f} -> {current['rps']:.1f}")
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{route}: errors {base['errors']} -> {current['errors']}")
+    return regressions
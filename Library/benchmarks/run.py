@@ -0,0 +1,123 @@
+"""
+End-to-end бенчмарк шляху gateway -> user/book/reading сервіси.
+
+Запуск з каталогу Library:
+
+    python -m benchmarks.run --books 5000 --readers 200 --concurrency 50 --duration 30 \\
+        --output results.json --baseline benchmarks/baseline.json
+
+--mode inprocess (за замовчуванням) запускає всі застосунки в одному процесі,
+--mode processes — як окремі uvicorn-процеси. Без --database-url використовується
+тимчасова SQLite; для реалістичних цифр передайте URL локального Postgres.
+Код виходу 1, якщо відносно baseline є регресії понад --threshold відсотків.
+"""
+import argparse
+import asyncio
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from . import report, stand
+from .traffic import DEFAULT_MIX
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown scenario: {name}")
+        mix[name.strip()] = int(weight)
+    return mix
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=stand.LIBRARY_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def _run(args, book_ids):
+    from .traffic import run_load
+
+    stand_cls = stand.InProcessStand if args.mode == "inprocess" else stand.ProcessStand
+    async with stand_cls() as client:
+        return await run_load(
+            client,
+            readers=args.readers,
+            concurrency=args.concurrency,
+            duration=args.duration,
+            warmup=args.warmup,
+            mix=args.mix,
+            book_ids=book_ids,
+            pages=args.pages,
+            think_time=args.think_time,
+        )
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.split("\n")[1])
+    parser.add_argument("--mode", choices=("inprocess", "processes"), default="inprocess")
+    parser.add_argument("--database-url", help="default: temporary SQLite file")
+    parser.add_argument("--workdir", help="directory for SQLite and book content (default: temporary)")
+    parser.add_argument("--books", type=int, default=2000)
+    parser.add_argument("--books-with-content", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=40, help="pages per book with content")
+    parser.add_argument("--readers", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20, help="seconds measured")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds not measured")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between actions, seconds")
+    parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX), help="e.g. browse=35,open=20,page_turn=35,shelf=5,login=5")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--no-gateway-cache", action="store_true")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=20, help="allowed regression, percent")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="library-bench-")
+    database_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    stand.configure_env(database_url, os.path.join(workdir, "uploaded_books"), args.bcrypt_rounds, not args.no_gateway_cache)
+
+    from .seed import ensure_schema, seed_catalog, seed_readers
+
+    started = time.monotonic()
+    ensure_schema()
+    book_ids = seed_catalog(args.books, args.books_with_content, args.pages)
+    seed_readers(args.readers, book_ids)
+    print(f"Seeded {args.books} books, {args.readers} readers in {time.monotonic() - started:.1f}s ({workdir})", file=sys.stderr)
+
+    recorder = asyncio.run(_run(args, book_ids))
+    meta = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "database": database_url.split("://", 1)[0],
+        **{key: value for key, value in vars(args).items() if key not in ("database_url", "output", "baseline")},
+    }
+    results = report.build_results(recorder, meta)
+    report.save(results, args.output)
+    print(report.format_table(results))
+    print(f"Results saved to {args.output}")
+
+    if args.baseline:
+        regressions = report.compare(results, report.load(args.baseline), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline} (threshold {args.threshold}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,95 @@
+"""
+Синтетичні дані для бенчмарку: каталог книг, тексти для частини з них,
+читачі та їхній прогрес. Повторний запуск нічого не дублює.
+"""
+import random
+from typing import List
+
+BENCH_PASSWORD = "bench-password"
+_WORDS = (
+    "сад вишневий коло хати хрущі над вишнями гудуть плугатарі з плугами йдуть "
+    "співають ідучи дівчата а матері вечерять ждуть"
+).split()
+
+
+def reader_email(number: int) -> str:
+    return f"reader{number}@bench.example.com"
+
+
+def _page_text(rng: random.Random, words: int = 250) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def ensure_schema():
+    """Схема стенду — тими самими міграціями, що й у docker-compose."""
+    from book_service import migrations as book_migrations
+    from reading_service import migrations as reading_migrations
+    from user_service import migrations as user_migrations
+
+    book_migrations.upgrade()
+    reading_migrations.upgrade()
+    user_migrations.upgrade()
+
+
+def seed_catalog(books: int, books_with_content: int, pages: int) -> List[int]:
+    """Повертає id книг, для яких є текст."""
+    from book_service import bulk, content as book_content, models
+    from book_service.database import SessionLocal
+
+    rng = random.Random(42)
+    records = (
+        (number, {
+            "title": f"Bench Book {number:06d}",
+            "author": f"Author {number % 997}",
+            "description": _page_text(rng, 30),
+            "year": 1800 + number % 225,
+            "pages": pages if number <= books_with_content else 0,
+        }, None)
+        for number in range(1, books + 1)
+    )
+    with SessionLocal() as db:
+        report = bulk.import_records(db, records)
+        if report.failed:
+            raise RuntimeError(f"Catalog seeding failed: {report.errors[:5]}")
+        ids = [
+            book_id for (book_id,) in db.query(models.Book.id)
+            .filter(models.Book.title.startswith("Bench Book "))
+            .order_by(models.Book.id)
+            .limit(books_with_content)
+        ]
+    for book_id in ids:
+        if book_content.content_etag(book_id) is None:
+            book_content.write_content(book_id, (_page_text(rng) for _ in range(pages)))
+            book_content.build_compressed(book_id)
+    return ids
+
+
+def seed_readers(readers: int, book_ids: List[int]) -> List[str]:
+    """Створює читачів (один спільний bcrypt-хеш — сидінг не вимірюється) і їхній прогрес."""
+    from reading_service import crud as reading_crud
+    from reading_service.database import SessionLocal as ReadingSession
+    from user_service import crud as user_crud, models as user_models, schemas as user_schemas
+    from user_service.database import SessionLocal as UserSession
+    from user_service.hashing import hash_password
+
+    hashed = hash_password(BENCH_PASSWORD)
+    rng = random.Random(7)
+    user_ids = []
+    with UserSession() as db:
+        for number in range(readers):
+            user = user_crud.get_user_by_email(db, reader_email(number))
+            if user is None:
+                user = user_crud.create_user(db, user_schemas.UserCreate(
+                    name=f"Reader {number}", email=reader_email(number),
+                    password=BENCH_PASSWORD, role=user_models.RoleEnum.user.value,
+                ), hashed)
+            user_ids.append(str(user.id))
+    if book_ids:
+        entries = [
+            (user_id, book_id, rng.randint(1, 20))
+            for user_id in user_ids
+            for book_id in rng.sample(book_ids, min(3, len(book_ids)))
+        ]
+        with ReadingSession() as db:
+            reading_crud.upsert_progress_batch(db, entries)
+    return user_ids
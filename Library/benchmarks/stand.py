@@ -0,0 +1,127 @@
+"""
+Локальний стенд: gateway + user/book/reading сервіси у цьому процесі (через
+httpx.ASGITransport) або як окремі uvicorn-процеси. Налаштування сервісів
+читаються з env під час імпорту, тому configure_env() викликається до імпорту.
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from contextlib import AsyncExitStack
+
+import httpx
+
+LIBRARY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Порти для режиму processes — подалі від портів docker-compose
+PORTS = {"gateway": 18000, "user": 18001, "book": 18002, "reading": 18003}
+APPS = {
+    "user": "user_service.main:app",
+    "book": "book_service.main:app",
+    "reading": "reading_service.main:app",
+    "gateway": "api_gateway.main:app",
+}
+
+
+def configure_env(database_url: str, upload_dir: str, bcrypt_rounds: int, gateway_cache: bool):
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["UPLOAD_DIR"] = upload_dir
+    os.environ["BCRYPT_ROUNDS"] = str(bcrypt_rounds)
+    if not gateway_cache:
+        os.environ["GATEWAY_CACHE_TTL"] = "0"
+    for service in ("user", "book", "reading"):
+        os.environ[f"{service.upper()}_SERVICE_URL"] = f"http://127.0.0.1:{PORTS[service]}"
+    if LIBRARY_DIR not in sys.path:
+        sys.path.insert(0, LIBRARY_DIR)
+
+
+class InProcessStand:
+    """Усі чотири застосунки в одному event loop; мережевого стеку немає."""
+
+    def __init__(self):
+        self._stack = AsyncExitStack()
+
+    async def __aenter__(self) -> httpx.AsyncClient:
+        from api_gateway import clients
+        from api_gateway.main import app as gateway_app
+        from book_service.main import app as book_app
+        from reading_service.main import app as reading_app
+        from user_service.main import app as user_app
+
+        services = {"user": user_app, "book": book_app, "reading": reading_app}
+        for name, app in services.items():
+            await self._stack.enter_async_context(app.router.lifespan_context(app))
+            clients._clients[name] = clients._build_client(name, f"http://{name}", httpx.ASGITransport(app=app))
+        await self._stack.enter_async_context(gateway_app.router.lifespan_context(gateway_app))
+        return await self._stack.enter_async_context(
+            httpx.AsyncClient(transport=httpx.ASGITransport(app=gateway_app), base_url="http://gateway", timeout=60)
+        )
+
+    async def __aexit__(self, *exc):
+        await self._stack.aclose()
+
+
+class ProcessStand:
+    """Кожен сервіс — окремий uvicorn-процес, як у docker-compose."""
+
+    def __init__(self, startup_timeout: float = 60):
+        self.startup_timeout = startup_timeout
+        self._processes = []
+        self._client = None
+
+    def _start(self, service: str):
+        return subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", APPS[service],
+             "--host", "127.0.0.1", "--port", str(PORTS[service]), "--log-level", "warning"],
+            cwd=LIBRARY_DIR,
+            env=os.environ.copy(),
+        )
+
+    async def _wait_ready(self, service: str, process: subprocess.Popen):
+        deadline = time.monotonic() + self.startup_timeout
+        async with httpx.AsyncClient() as client:
+            while True:
+                try:
+                    response = await client.get(f"http://127.0.0.1:{PORTS[service]}/health/ready")
+                    if response.status_code == 200:
+                        return
+                except httpx.TransportError:
+                    pass
+                if process.poll() is not None:
+                    raise RuntimeError(f"{service} exited with code {process.returncode}")
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{service} did not start in {self.startup_timeout}s")
+                await asyncio.sleep(0.2)
+
+    async def __aenter__(self) -> httpx.AsyncClient:
+        try:
+            services = ("user", "book", "reading", "gateway")
+            for service in services:
+                self._processes.append(self._start(service))
+            for service, process in zip(services, self._processes):
+                await self._wait_ready(service, process)
+        except BaseException:
+            self._stop()
+            raise
+        self._client = httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{PORTS['gateway']}",
+            timeout=60,
+            limits=httpx.Limits(max_connections=1000, max_keepalive_connections=1000),
+        )
+        return self._client
+
+    def _stop(self):
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self._processes = []
+
+    async def __aexit__(self, *exc):
+        if self._client is not None:
+            await self._client.aclose()
+        self._stop()
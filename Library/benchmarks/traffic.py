@@ -0,0 +1,140 @@
+"""
+Генератор навантаження: віртуальні читачі логіняться і далі виконують суміш
+сценаріїв (перегляд каталогу, відкриття книги, гортання сторінок, полиця, логін)
+з вагами MIX. Латентність пишеться окремо для кожного маршруту.
+"""
+import asyncio
+import random
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+from .seed import BENCH_PASSWORD, reader_email
+
+DEFAULT_MIX = {"browse": 35, "open": 20, "page_turn": 35, "shelf": 5, "login": 5}
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.enabled = True
+
+    async def request(self, client: httpx.AsyncClient, route: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            response = None
+        elapsed = time.perf_counter() - started
+        if self.enabled:
+            self.latencies[route].append(elapsed)
+            if response is None or response.status_code >= 400:
+                self.errors[route] += 1
+        return response
+
+
+class Reader:
+    """Стан одного віртуального читача: токен, курсор каталогу, поточна книга і сторінка."""
+
+    def __init__(self, number: int, client: httpx.AsyncClient, recorder: Recorder, book_ids: List[int], pages: int, rng: random.Random):
+        self.number = number
+        self.client = client
+        self.recorder = recorder
+        self.book_ids = book_ids
+        self.pages = pages
+        self.rng = rng
+        self.headers: dict = {}
+        self.cursor: Optional[str] = None
+        self.book_id: Optional[int] = None
+        self.page = 1
+
+    async def login(self):
+        response = await self.recorder.request(
+            self.client, "POST /users/login", "POST", "/users/login",
+            json={"email": reader_email(self.number), "password": BENCH_PASSWORD},
+        )
+        if response is not None and response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def browse(self):
+        params = {"limit": 50, "fields": "id,title,author,cover_url"}
+        if self.cursor:
+            params["after"] = self.cursor
+        response = await self.recorder.request(self.client, "GET /books", "GET", "/books/", params=params)
+        # Гортаємо каталог далі або починаємо з початку
+        self.cursor = response.headers.get("X-Next-Cursor") if response is not None and self.rng.random() < 0.8 else None
+
+    async def open(self):
+        if not self.book_ids:
+            return
+        self.book_id = self.rng.choice(self.book_ids)
+        self.page = 1
+        await self.recorder.request(self.client, "GET /books/{id}", "GET", f"/books/{self.book_id}")
+        await self.recorder.request(
+            self.client, "GET /books/{id}/content", "GET", f"/books/{self.book_id}/content",
+            params={"start": 1, "count": 5}, headers={"Accept-Encoding": "gzip, br"},
+        )
+
+    async def page_turn(self):
+        if self.book_id is None:
+            await self.open()
+            return
+        self.page = self.page % self.pages + 1
+        await self.recorder.request(
+            self.client, "GET /books/{id}/pages/{page}", "GET", f"/books/{self.book_id}/pages/{self.page}",
+            headers={"Accept-Encoding": "gzip, br"},
+        )
+        if self.headers:
+            await self.recorder.request(
+                self.client, "POST /reading/start", "POST", "/reading/start",
+                json={"book_id": self.book_id, "page": self.page}, headers=self.headers,
+            )
+
+    async def shelf(self):
+        if self.headers:
+            await self.recorder.request(self.client, "GET /me/library", "GET", "/me/library", headers=self.headers)
+
+    async def run(self, mix: Dict[str, int], deadline: float, think_time: float):
+        await self.login()
+        scenarios = list(mix)
+        weights = [mix[name] for name in scenarios]
+        while time.monotonic() < deadline:
+            scenario = self.rng.choices(scenarios, weights)[0]
+            await getattr(self, scenario)()
+            if think_time:
+                await asyncio.sleep(self.rng.uniform(0, 2 * think_time))
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    readers: int,
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    mix: Dict[str, int],
+    book_ids: List[int],
+    pages: int,
+    think_time: float = 0.0,
+    seed: int = 1,
+) -> Recorder:
+    """Запускає concurrency віртуальних читачів; перші warmup секунд не записуються."""
+    recorder = Recorder()
+    rng = random.Random(seed)
+    recorder.enabled = warmup <= 0
+    deadline = time.monotonic() + warmup + duration
+    tasks = [
+        asyncio.create_task(
+            Reader(i % readers, client, recorder, book_ids, pages, random.Random(rng.random())).run(mix, deadline, think_time)
+        )
+        for i in range(concurrency)
+    ]
+    if warmup > 0:
+        await asyncio.sleep(warmup)
+        recorder.enabled = True
+    recorder.started_at = time.monotonic()
+    await asyncio.gather(*tasks)
+    recorder.elapsed = time.monotonic() - recorder.started_at
+    return recorder
@@ -0,0 +1,15 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import crud
+
+# Async-версії функцій читання з crud.py для режиму DB_ASYNC; запити ті самі
+
+async def list_books(db: AsyncSession, limit: int, **filters):
+    query, to_page = crud.list_books_query(limit, **filters)
+    return to_page((await db.execute(query)).all())
+
+async def get_books_by_ids(db: AsyncSession, ids: list[int], fields: list[str] | None = None):
+    query, to_list = crud.books_by_ids_query(ids, fields)
+    return to_list((await db.execute(query)).all())
+
+async def get_book(db: AsyncSession, book_id: int):
+    return (await db.scalars(crud.get_book_query(book_id))).first()
@@ -0,0 +1,345 @@
+"""
+Масовий імпорт каталогу з NDJSON або CSV.
+
+Книга ідентифікується ключем імпорту (books.import_key з власним унікальним
+індексом): хеш external_id рядка або, без нього, пари (title, author). Повторний
+імпорт того самого файлу нічого не змінює, а змінені поля оновлюються. Книга,
+створена через API з тими самими title і author, отримує ключ при першому імпорті.
+Рядки пишуться пакетами по BULK_BATCH_SIZE — один SELECT і один багаторядковий
+INSERT ... ON CONFLICT (import_key) DO UPDATE на пакет.
+Помилки окремих рядків збираються у звіт і не зупиняють імпорт.
+
+CLI (також приймає каталог з PDF/TXT файлами):
+    python -m book_service.bulk catalog.ndjson catalog.csv books_dir/ [--year 2000]
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from typing import IO, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import bindparam, or_, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from . import ingest, models, schemas, search
+from . import content as book_content
+
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+# Скільки помилок рядків повертати у звіті (решта лише рахуються)
+BULK_MAX_ERRORS = int(os.getenv("BULK_MAX_ERRORS", "1000"))
+
+BOOK_FILE_EXTENSIONS = (".pdf", ".txt")
+UPDATE_FIELDS = ("description", "year", "pages", "cover_url")
+
+_books = models.Book.__table__
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+        self.jobs: List[ingest.IngestJob] = []
+
+    def error(self, row: int, message: str):
+        self.failed += 1
+        if len(self.errors) < BULK_MAX_ERRORS:
+            self.errors.append({"row": row, "error": message})
+
+    def to_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "failed": self.failed,
+            "errors": self.errors,
+            "jobs": [job.id for job in self.jobs],
+        }
+
+
+def _clean(record: dict) -> dict:
+    # Порожні клітинки CSV означають "значення за замовчуванням"
+    return {key.strip(): value for key, value in record.items() if key and value not in ("", None)}
+
+
+def read_ndjson(stream: IO[str]) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """(номер рядка, запис, помилка розбору)."""
+    for number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield number, None, "Expected a JSON object"
+            continue
+        yield number, _clean(record), None
+
+
+def read_csv(stream: IO[str]) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    # Рядок 1 — заголовок, тож нумерація записів починається з 2
+    for number, record in enumerate(csv.DictReader(stream), start=2):
+        yield number, _clean(record), None
+
+
+def read_records(stream: IO[str], fmt: str):
+    if fmt == "csv":
+        return read_csv(stream)
+    if fmt == "ndjson":
+        return read_ndjson(stream)
+    raise ValueError(f"Unsupported format: {fmt}")
+
+
+def detect_format(name_or_type: str | None) -> str:
+    value = (name_or_type or "").lower()
+    if "csv" in value:
+        return "csv"
+    return "ndjson"
+
+
+def import_key(item: schemas.BookImport) -> str:
+    source = f"id\0{item.external_id}" if item.external_id else f"book\0{item.title}\0{item.author}"
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+def _existing_books(db: Session, items: dict) -> dict:
+    """Ключ імпорту -> рядок книги: з цим ключем або ще без ключа з тими самими (title, author)."""
+    pairs = [(item.title, item.author) for item in items.values()]
+    rows = db.execute(
+        select(_books.c.id, _books.c.title, _books.c.author, _books.c.import_key, *[_books.c[f] for f in UPDATE_FIELDS])
+        .where(or_(
+            _books.c.import_key.in_(list(items)),
+            _books.c.import_key.is_(None) & tuple_(_books.c.title, _books.c.author).in_(pairs),
+        ))
+        .order_by(_books.c.id)
+    ).all()
+    keyed = {row.import_key: row for row in rows if row.import_key is not None}
+    unkeyed = {}
+    for row in rows:
+        if row.import_key is None:
+            unkeyed.setdefault((row.title, row.author), row)  # серед кількох однакових — найстаріша
+    existing = {}
+    for key, item in items.items():
+        row = keyed.get(key) or unkeyed.get((item.title, item.author))
+        if row is not None:
+            existing[key] = row
+    return existing
+
+
+def _upsert_stmt(dialect_name: str):
+    dialect = postgresql if dialect_name == "postgresql" else sqlite
+    stmt = dialect.insert(_books)
+    # Книгу з тим самим ключем міг щойно створити паралельний імпорт —
+    # тоді рядок оновлює її замість дубліката чи помилки
+    return stmt.on_conflict_do_update(
+        index_elements=[_books.c.import_key],
+        set_={"version": _books.c.version + 1, **{f: stmt.excluded[f] for f in UPDATE_FIELDS}},
+    ).returning(_books.c.id, _books.c.title, _books.c.author, _books.c.description, sort_by_parameter_order=True)
+
+
+def _upsert(db: Session, items: List[Tuple[int, schemas.BookImport]]) -> List[Tuple[int, schemas.BookImport, int, str]]:
+    """Записує пакет і повертає (рядок, запис, id книги, статус) без коміту."""
+    by_key = {}
+    for number, item in items:
+        by_key[import_key(item)] = (number, item)  # останній рядок з тим самим ключем перемагає
+    existing = _existing_books(db, {key: item for key, (_, item) in by_key.items()})
+
+    to_claim, to_write, results = [], [], []
+    for key, (number, item) in by_key.items():
+        row = existing.get(key)
+        values = {**item.model_dump(exclude={"file", "external_id"}), "import_key": key}
+        if row is None:
+            to_write.append((number, item, values, "created"))
+            continue
+        if row.import_key is None:
+            to_claim.append({"b_id": row.id, "b_key": key})
+        # Оновлюємо лише поля, які є в рядку імпорту (pages, заповнені витяганням тексту, не затираємо)
+        values.update({f: getattr(row, f) for f in UPDATE_FIELDS if f not in item.model_fields_set})
+        if any(getattr(row, f) != values[f] for f in UPDATE_FIELDS):
+            to_write.append((number, item, values, "updated"))
+        else:
+            results.append((number, item, row.id, "unchanged"))
+
+    if to_claim:
+        # Книга, створена через API, отримує ключ — далі upsert оновлює саме її
+        db.execute(
+            update(_books)
+            .where(_books.c.id == bindparam("b_id"), _books.c.import_key.is_(None))
+            .values(import_key=bindparam("b_key")),
+            to_claim,
+        )
+    indexed = []
+    if to_write:
+        indexed = db.execute(
+            _upsert_stmt(db.get_bind().dialect.name), [values for _, _, values, _ in to_write],
+        ).all()
+        for (number, item, _, status), row in zip(to_write, indexed):
+            results.append((number, item, row.id, status))
+    search.index_books_metadata(db, indexed, commit=False)
+    return results
+
+
+def _needs_content(book_id: int, status: str) -> bool:
+    if status == "created":
+        return True
+    return not os.path.exists(book_content.content_path(book_id)) or book_content.is_writing(book_id)
+
+
+def _write_batch(db: Session, batch: List[Tuple[int, schemas.BookImport]], report: ImportReport):
+    try:
+        results = _upsert(db, batch)
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
+        # Пакет не пройшов — повторюємо по рядку, щоб знайти і пропустити зламані
+        results = []
+        for number, item in batch:
+            try:
+                results.extend(_upsert(db, [(number, item)]))
+                db.commit()
+            except SQLAlchemyError as e:
+                db.rollback()
+                report.error(number, str(getattr(e, "orig", e)).strip())
+
+    for number, item, book_id, status in results:
+        setattr(report, status, getattr(report, status) + 1)
+        if item.file and _needs_content(book_id, status):
+            # Витягання тексту паралельне: job-и виконуються пулом ingest
+            try:
+                with open(item.file, "rb") as src:
+                    report.jobs.append(ingest.submit_original(db, db.get(models.Book, book_id), src, item.file))
+            except OSError as e:
+                report.error(number, f"Failed to store {item.file}: {e}")
+
+
+def import_records(
+    db: Session,
+    records: Iterable[Tuple[int, Optional[dict], Optional[str]]],
+    allow_files: bool = False,
+    batch_size: int = BULK_BATCH_SIZE,
+    report: Optional[ImportReport] = None,
+) -> ImportReport:
+    report = report or ImportReport()
+    batch: List[Tuple[int, schemas.BookImport]] = []
+    for number, record, parse_error in records:
+        report.rows += 1
+        if parse_error:
+            report.error(number, parse_error)
+            continue
+        try:
+            item = schemas.BookImport.model_validate(record)
+        except ValidationError as e:
+            report.error(number, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+            continue
+        if item.file:
+            if not allow_files:
+                report.error(number, "file is only supported by the command-line import")
+                continue
+            if not item.file.lower().endswith(BOOK_FILE_EXTENSIONS) or not os.path.isfile(item.file):
+                report.error(number, f"File not found or unsupported: {item.file}")
+                continue
+        batch.append((number, item))
+        if len(batch) >= batch_size:
+            _write_batch(db, batch, report)
+            batch = []
+    if batch:
+        _write_batch(db, batch, report)
+    return report
+
+
+def import_stream(db: Session, stream: IO[bytes], fmt: str, **kwargs) -> ImportReport:
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        return import_records(db, read_records(text, fmt), **kwargs)
+    finally:
+        text.detach()
+
+
+def directory_records(path: str, default_year: Optional[int] = None):
+    """
+    Записи для PDF/TXT файлів у каталозі. Метадані беруться з назви файлу
+    "Автор - Назва (Рік).pdf"; без автора — "Unknown", без року — default_year.
+    """
+    number = 0
+    for root, _, files in os.walk(path):
+        for name in sorted(files):
+            if not name.lower().endswith(BOOK_FILE_EXTENSIONS):
+                continue
+            number += 1
+            stem = os.path.splitext(name)[0]
+            author, sep, title = stem.partition(" - ")
+            if not sep:
+                author, title = "Unknown", stem
+            year = default_year
+            title = title.strip()
+            if title.endswith(")") and "(" in title:
+                head, _, tail = title[:-1].rpartition("(")
+                if tail.isdigit():
+                    title, year = head.strip(), int(tail)
+            record = {"title": title, "author": author.strip(), "file": os.path.join(root, name)}
+            if year is not None:
+                record["year"] = year
+            yield number, record, None
+
+
+def _file_records(path: str, fmt: str):
+    # Відносні шляхи у колонці file рахуються від каталогу з файлом імпорту
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        for number, record, error in read_records(f, fmt):
+            if record and record.get("file") and not os.path.isabs(record["file"]):
+                record["file"] = os.path.join(base, record["file"])
+            yield number, record, error
+
+
+def _wait_for_jobs(jobs: List[ingest.IngestJob]):
+    pending = list(jobs)
+    while pending:
+        time.sleep(0.5)
+        pending = [job for job in pending if job.finished_at is None]
+        print(f"Extracting text: {len(jobs) - len(pending)}/{len(jobs)} files done", file=sys.stderr)
+
+
+def main(argv: List[str]):
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(prog="python -m book_service.bulk", description="Bulk catalog import")
+    parser.add_argument("sources", nargs="+", help="NDJSON/CSV files or directories with PDF/TXT books")
+    parser.add_argument("--year", type=int, help="year for files whose name has none")
+    parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    report = ImportReport()
+    with SessionLocal() as db:
+        for source in args.sources:
+            if os.path.isdir(source):
+                records = directory_records(source, args.year)
+            else:
+                records = _file_records(source, detect_format(source))
+            import_records(db, records, allow_files=True, batch_size=args.batch_size, report=report)
+    try:
+        _wait_for_jobs(report.jobs)
+    finally:
+        ingest.shutdown()
+    result = report.to_dict()
+    result["failed_jobs"] = [job.to_dict() for job in report.jobs if job.status == "failed"]
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 1 if report.failed or result["failed_jobs"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,309 @@
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import struct
+from typing import BinaryIO, Iterable, Iterator, List, TextIO
+
+from . import tracing
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploaded_books")
+CHUNK_SIZE = 1024 * 1024
+PAGE_SIZE = 1500  # символів на сторінку для TXT
+
+PAGE_BREAK = "---PAGE_BREAK---"
+CONTENT_FILE = "content.txt"
+INDEX_FILE = "pages.idx"
+ETAG_FILE = "content.etag"
+# Поки файл існує, контент ще дописується (йде витягання тексту)
+WRITING_MARKER = "writing"
+# Попередньо стиснута повна відповідь {"pages": [...]} для кожного кодування
+COMPRESSED_FILES = {"gzip": "content.json.gz", "br": "content.json.br"}
+
+# Запис індексу: (зсув у байтах, довжина у байтах) сторінки в content.txt
+_ENTRY = struct.Struct("<QQ")
+
+
+class ContentNotFound(Exception):
+    pass
+
+
+def content_dir(book_id: int) -> str:
+    return os.path.join(UPLOAD_DIR, f"book_{book_id}")
+
+
+def content_path(book_id: int) -> str:
+    return os.path.join(content_dir(book_id), CONTENT_FILE)
+
+
+def index_path(book_id: int) -> str:
+    return os.path.join(content_dir(book_id), INDEX_FILE)
+
+
+def compressed_path(book_id: int, encoding: str) -> str:
+    return os.path.join(content_dir(book_id), COMPRESSED_FILES[encoding])
+
+
+def _remove_derived(book_id: int):
+    for name in (ETAG_FILE, *COMPRESSED_FILES.values()):
+        try:
+            os.remove(os.path.join(content_dir(book_id), name))
+        except FileNotFoundError:
+            pass
+
+
+def remove_content(book_id: int):
+    """
+    Видаляє витягнутий текст книги: content.txt, pages.idx, ETag і стиснуті варіанти.
+    Файли, жорстко зв'язані з іншою книгою (link_content), у неї залишаються.
+    """
+    shutil.rmtree(content_dir(book_id), ignore_errors=True)
+
+
+def is_writing(book_id: int) -> bool:
+    return os.path.exists(os.path.join(content_dir(book_id), WRITING_MARKER))
+
+
+def save_stream(src: BinaryIO, path: str, chunk_size: int = CHUNK_SIZE) -> int:
+    """Копіює файл частинами по chunk_size байт. Повертає кількість записаних байт."""
+    written = 0
+    with open(path, "wb") as dst:
+        while chunk := src.read(chunk_size):
+            dst.write(chunk)
+            written += len(chunk)
+    return written
+
+
+def paginate_text(reader: TextIO, page_size: int = PAGE_SIZE) -> Iterator[str]:
+    """Віддає сторінки по page_size символів, читаючи текст послідовно, а не цілком."""
+    while page := reader.read(page_size):
+        yield page
+
+
+def _page_entry(offset: int, page: str):
+    """Зсув і довжина сторінки після strip() — так само, як у старій відповіді /content."""
+    stripped = page.strip()
+    if not stripped:
+        return None
+    lead = len(page) - len(page.lstrip())
+    start = offset + len(page[:lead].encode("utf-8"))
+    return start, len(stripped.encode("utf-8"))
+
+
+class ContentWriter:
+    """
+    Дописує сторінки у content.txt і pages.idx. Після flush() читачі бачать
+    усі записані сторінки: запис індексу потрапляє у файл лише після того,
+    як відповідний текст уже скинуто на диск, тож книгу можна читати під час запису.
+    """
+
+    def __init__(self, book_id: int):
+        os.makedirs(content_dir(book_id), exist_ok=True)
+        self.book_id = book_id
+        self._marker = os.path.join(content_dir(book_id), WRITING_MARKER)
+        open(self._marker, "w").close()
+        _remove_derived(book_id)
+        # Файли можуть бути жорсткими посиланнями на текст іншої книги (link_content),
+        # тому спершу відв'язуємо їх, а не перезаписуємо спільний inode
+        for path in (index_path(book_id), content_path(book_id)):
+            if os.path.exists(path):
+                os.remove(path)
+        # Індекс створюємо першим: поки його немає, контент вважається відсутнім
+        self._index = open(index_path(book_id), "wb")
+        self._content = open(content_path(book_id), "wb")
+        self._pending = bytearray()
+        self.offset = 0
+        self.written = 0
+        self.indexed = 0
+
+    def write_page(self, page: str) -> int | None:
+        """Повертає номер сторінки в індексі (з 1) або None для порожньої сторінки."""
+        entry = _page_entry(self.offset, page)
+        number = None
+        if entry is not None:
+            self._pending += _ENTRY.pack(*entry)
+            self.indexed += 1
+            number = self.indexed
+        data = (page + "\n" + PAGE_BREAK + "\n").encode("utf-8")
+        self._content.write(data)
+        self.offset += len(data)
+        self.written += 1
+        return number
+
+    def flush(self):
+        self._content.flush()
+        self._index.write(self._pending)
+        self._index.flush()
+        self._pending.clear()
+
+    def close(self, complete: bool = True):
+        try:
+            self.flush()
+        finally:
+            self._content.close()
+            self._index.close()
+        # Маркер лишається, якщо запис обірвався: неповний текст не вважається готовим
+        if complete:
+            os.remove(self._marker)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(complete=exc_type is None)
+
+
+@tracing.traced("content.link_content")
+def link_content(src_book_id: int, dst_book_id: int) -> int:
+    """
+    Ділить уже витягнутий текст іншої книги з тим самим оригіналом: файли
+    жорстко зв'язуються (або копіюються, якщо ФС не підтримує посилань).
+    Повертає кількість сторінок.
+    """
+    os.makedirs(content_dir(dst_book_id), exist_ok=True)
+    _remove_derived(dst_book_id)
+    for name in (CONTENT_FILE, INDEX_FILE, ETAG_FILE, *COMPRESSED_FILES.values()):
+        src = os.path.join(content_dir(src_book_id), name)
+        dst = os.path.join(content_dir(dst_book_id), name)
+        if not os.path.exists(src):
+            continue
+        if os.path.exists(dst):
+            os.remove(dst)
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copyfile(src, dst)
+    return page_count(dst_book_id)
+
+
+@tracing.traced("content.write_content")
+def write_content(book_id: int, pages: Iterable[str]) -> int:
+    """
+    Записує сторінки у content.txt (старий формат з ---PAGE_BREAK---)
+    і одночасно будує індекс зсувів pages.idx. Сторінки можуть надходити генератором.
+    Повертає кількість записаних сторінок (порожні теж рахуються, але не індексуються).
+    """
+    with ContentWriter(book_id) as writer:
+        for page in pages:
+            writer.write_page(page)
+    return writer.written
+
+
+@tracing.traced("content.build_index")
+def build_index(book_id: int) -> int:
+    """Будує pages.idx для вже збереженого content.txt (книги, завантажені до появи індексу)."""
+    path = content_path(book_id)
+    if not os.path.exists(path):
+        raise ContentNotFound(book_id)
+    separator = PAGE_BREAK.encode("utf-8")
+    count = 0
+    tmp_path = index_path(book_id) + ".tmp"
+    with open(path, "rb") as f, open(tmp_path, "wb") as index:
+        if os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                pos = 0
+                size = len(mm)
+                while pos <= size:
+                    end = mm.find(separator, pos)
+                    if end == -1:
+                        end = size
+                    entry = _page_entry(pos, mm[pos:end].decode("utf-8"))
+                    if entry is not None:
+                        index.write(_ENTRY.pack(*entry))
+                        count += 1
+                    pos = end + len(separator)
+    os.replace(tmp_path, index_path(book_id))
+    return count
+
+
+def _ensure_index(book_id: int) -> str:
+    if not os.path.exists(content_path(book_id)):
+        raise ContentNotFound(book_id)
+    path = index_path(book_id)
+    if not os.path.exists(path):
+        build_index(book_id)
+    return path
+
+
+def page_count(book_id: int) -> int:
+    return os.path.getsize(_ensure_index(book_id)) // _ENTRY.size
+
+
+@tracing.traced("content.read_pages")
+def read_pages(book_id: int, start: int = 1, count: int | None = None) -> List[str]:
+    """
+    Повертає сторінки [start, start + count) (нумерація з 1), не читаючи файл повністю:
+    зсуви беруться з pages.idx, текст — зі змапленого content.txt.
+    """
+    idx_path = _ensure_index(book_id)
+    total = os.path.getsize(idx_path) // _ENTRY.size
+    if start < 1 or start > total:
+        return []
+    if count is None:
+        count = total - start + 1
+    count = min(count, total - start + 1)
+    if count <= 0:
+        return []
+    with open(idx_path, "rb") as index:
+        index.seek((start - 1) * _ENTRY.size)
+        entries = list(_ENTRY.iter_unpack(index.read(count * _ENTRY.size)))
+    with open(content_path(book_id), "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return [mm[offset:offset + length].decode("utf-8") for offset, length in entries]
+
+
+
+def content_etag(book_id: int) -> str | None:
+    try:
+        with open(os.path.join(content_dir(book_id), ETAG_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+@tracing.traced("content.build_compressed")
+def build_compressed(book_id: int, batch_size: int = 200) -> str:
+    """
+    Будує стиснуті варіанти повної відповіді /content (gzip і, якщо доступний, Brotli)
+    та ETag — sha256 від нестиснутого JSON. Сторінки читаються пакетами, тож уся книга
+    в пам'яті не тримається. Повертає ETag.
+    """
+    from . import encoding
+
+    total = page_count(book_id)
+    digest = hashlib.sha256()
+    gz_tmp = compressed_path(book_id, "gzip") + ".tmp"
+    br_tmp = compressed_path(book_id, "br") + ".tmp"
+    br = encoding.brotli.Compressor(quality=encoding.PRECOMPRESS_BROTLI_QUALITY) if encoding.brotli else None
+    with open(gz_tmp, "wb") as raw_gz, open(br_tmp, "wb") if br else open(os.devnull, "wb") as br_file:
+        with gzip.GzipFile(fileobj=raw_gz, mode="wb", compresslevel=encoding.PRECOMPRESS_GZIP_LEVEL, mtime=0) as gz:
+
+            def emit(data: bytes):
+                digest.update(data)
+                gz.write(data)
+                if br:
+                    br_file.write(br.process(data))
+
+            emit(b'{"pages":[')
+            for start in range(1, total + 1, batch_size):
+                pages = read_pages(book_id, start, batch_size)
+                chunk = ",".join(json.dumps(p, ensure_ascii=False) for p in pages)
+                emit(((b"," if start > 1 else b"") + chunk.encode("utf-8")))
+            emit(b"]}")
+            if br:
+                br_file.write(br.finish())
+    os.replace(gz_tmp, compressed_path(book_id, "gzip"))
+    if br:
+        os.replace(br_tmp, compressed_path(book_id, "br"))
+    etag = digest.hexdigest()
+    with open(os.path.join(content_dir(book_id), ETAG_FILE), "w") as f:
+        f.write(etag)
+    return etag
+
+
+@tracing.traced("content.full_content_json")
+def full_content_json(book_id: int) -> bytes:
+    # Той самий формат, що й у build_compressed, щоб ETag відповідав байтам відповіді
+    return json.dumps({"pages": read_pages(book_id)}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
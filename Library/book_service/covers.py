@@ -0,0 +1,366 @@
+"""
+Обкладинки книг через book_service. Оригінал береться один раз — з cover_url
+(зовнішній хост) або, якщо його немає чи він недоступний, із зображення першої
+сторінки PDF книги — і відразу зменшується до всіх варіантів COVER_SIZES.
+Варіанти лежать у дисковому LRU-кеші з обмеженим сумарним розміром.
+
+COVER_ORIGIN_URL підміняє scheme://host у cover_url — так стенд і тести
+працюють з локальним stand-in замість covers.openlibrary.org.
+"""
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+import httpx
+
+from . import content as book_content
+from . import metrics, storage, tracing
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow необов'язковий: без нього обкладинки не генеруються (503)
+    Image = ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+COVER_DIR = os.getenv("COVER_DIR", os.path.join(book_content.UPLOAD_DIR, "covers"))
+COVER_CACHE_MAX_BYTES = int(os.getenv("COVER_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Назва варіанта -> ширина в пікселях; висота — за пропорціями оригіналу, без збільшення
+COVER_SIZES = {"s": 96, "m": 240, "l": 480}
+COVER_QUALITY = int(os.getenv("COVER_QUALITY", "82"))
+# Cache-Control для /books/{id}/cover; з ?v=<версія> відповідь незмінна і кешується на рік
+COVER_MAX_AGE = int(os.getenv("COVER_MAX_AGE", str(7 * 24 * 3600)))
+COVER_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+COVER_ORIGIN_URL = os.getenv("COVER_ORIGIN_URL", "")
+# Хости, з яких дозволено брати обкладинки ("*" — будь-які); захист від запитів у внутрішню мережу
+COVER_ALLOWED_HOSTS = {
+    host.strip().lower()
+    for host in os.getenv("COVER_ALLOWED_HOSTS", "covers.openlibrary.org").split(",")
+    if host.strip()
+}
+COVER_ORIGIN_TIMEOUT = float(os.getenv("COVER_ORIGIN_TIMEOUT", "5"))
+COVER_ORIGIN_MAX_BYTES = int(os.getenv("COVER_ORIGIN_MAX_BYTES", str(10 * 1024 * 1024)))
+COVER_ORIGIN_MAX_REDIRECTS = 3
+# Після невдалої спроби джерело не чіпаємо стільки секунд
+COVER_FAILURE_TTL = float(os.getenv("COVER_FAILURE_TTL", "300"))
+# Скільки невдалих обкладинок пам'ятати; найстаріші забуваються раніше за TTL
+COVER_FAILURES_MAX = int(os.getenv("COVER_FAILURES_MAX", "10000"))
+
+
+class CoverUnavailable(Exception):
+    """Обкладинку неможливо отримати: немає джерела або воно не віддає зображення."""
+
+
+class CoverDisabled(Exception):
+    """Pillow не встановлено — зменшувати зображення нічим."""
+
+
+class DiskLRU:
+    """
+    Файли варіантів у root/<ab>/<name>; порядок LRU — у пам'яті (на старті — за mtime),
+    mtime оновлюється при зверненні, щоб порядок пережив перезапуск.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._files: OrderedDict[str, int] = OrderedDict()
+        self._bytes = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, name[:2], name)
+
+    def _load(self):
+        found = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(".tmp"):
+                    continue
+                try:
+                    st = os.stat(os.path.join(dirpath, filename))
+                except FileNotFoundError:
+                    continue
+                found.append((st.st_mtime, filename, st.st_size))
+        for _, name, size in sorted(found):
+            self._files[name] = size
+            self._bytes += size
+        self._loaded = True
+
+    def __contains__(self, name: str) -> bool:
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            return name in self._files
+
+    def read(self, name: str) -> Optional[bytes]:
+        """
+        Вміст файлу або None. Читається одразу, а не віддається шляхом: файл,
+        витіснений після перевірки, не зламає вже розпочату відповідь.
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if name not in self._files:
+                self.misses += 1
+                return None
+            self._files.move_to_end(name)
+            self.hits += 1
+        try:
+            with open(self.path(name), "rb") as f:
+                os.utime(f.fileno())
+                return f.read()
+        except FileNotFoundError:
+            # Файл щойно витіснив інший запит або прибрав інший процес з тим самим каталогом
+            with self._lock:
+                self._bytes -= self._files.pop(name, 0)
+                self.hits -= 1
+                self.misses += 1
+            return None
+
+    def put(self, name: str, data: bytes):
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            self._bytes += len(data) - self._files.pop(name, 0)
+            self._files[name] = len(data)
+            victims = []
+            while self._bytes > self.max_bytes and len(self._files) > 1:
+                victim, size = self._files.popitem(last=False)
+                self._bytes -= size
+                victims.append(victim)
+        for victim in victims:
+            try:
+                os.remove(self.path(victim))
+            except FileNotFoundError:
+                pass
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+cache = DiskLRU(COVER_DIR, COVER_CACHE_MAX_BYTES)
+# Один генератор на обкладинку: одночасні запити різних розмірів чекають на нього.
+# version -> [lock, кількість запитів, що його тримають або чекають]
+_locks: Dict[str, list] = {}
+_locks_guard = threading.Lock()
+# version -> monotonic-час, до якого джерело не чіпаємо; порядок вставки = порядок спливання
+_failures: Dict[str, float] = {}
+_client: Optional[httpx.Client] = None
+
+
+def cover_version(book) -> Optional[str]:
+    """Версія обкладинки — хеш її джерела; змінюється разом з cover_url чи файлом книги."""
+    if book.cover_url:
+        source = f"url:{book.cover_url}"
+    elif book.blob_sha256:
+        source = f"pdf:{book.blob_sha256}"
+    else:
+        return None
+    return hashlib.sha256(source.encode()).hexdigest()[:20]
+
+
+def variant_name(version: str, size: str) -> str:
+    return f"{version}-{size}.jpg"
+
+
+def _get_client() -> httpx.Client:
+    global _client
+    if _client is None:
+        _client = httpx.Client(timeout=COVER_ORIGIN_TIMEOUT, headers={"User-Agent": "library-book-service/covers"})
+    return _client
+
+
+def _origin_url(url: str) -> str:
+    host = (urlsplit(url).hostname or "").lower()
+    if "*" not in COVER_ALLOWED_HOSTS and host not in COVER_ALLOWED_HOSTS:
+        raise CoverUnavailable(f"Cover host {host or '?'} is not allowed")
+    if not COVER_ORIGIN_URL:
+        return url
+    parts, origin = urlsplit(url), urlsplit(COVER_ORIGIN_URL)
+    return urlunsplit((origin.scheme, origin.netloc, parts.path, parts.query, ""))
+
+
+@tracing.traced("cover.fetch")
+def fetch_origin(url: str) -> bytes:
+    """Завантажує зображення з дозволеного хоста; редиректи перевіряються так само."""
+    for _ in range(COVER_ORIGIN_MAX_REDIRECTS + 1):
+        with _get_client().stream("GET", _origin_url(url)) as response:
+            if response.is_redirect:
+                url = urljoin(url, response.headers["Location"])
+                continue
+            if response.status_code != 200:
+                raise CoverUnavailable(f"Cover origin returned {response.status_code}")
+            data = bytearray()
+            for chunk in response.iter_bytes():
+                data += chunk
+                if len(data) > COVER_ORIGIN_MAX_BYTES:
+                    raise CoverUnavailable("Cover image is too large")
+            return bytes(data)
+    raise CoverUnavailable("Too many redirects")
+
+
+@tracing.traced("cover.pdf_image")
+def first_page_image(sha256: str) -> bytes:
+    """
+    Найбільше зображення першої сторінки PDF. Растеризатора сторінок у залежностях
+    немає, тож векторна сторінка без зображень обкладинки не дає.
+    """
+    from PyPDF2 import PdfReader
+
+    path = storage.blob_path(sha256)
+    try:
+        with open(path, "rb") as f:
+            if f.read(5) != b"%PDF-":
+                raise CoverUnavailable("Book file is not a PDF")
+        reader = PdfReader(path)
+        images = list(reader.pages[0].images) if reader.pages else []
+    except FileNotFoundError:
+        raise CoverUnavailable("Book file is missing")
+    except CoverUnavailable:
+        raise
+    except Exception as e:  # пошкоджений PDF або непідтримуваний фільтр зображення
+        raise CoverUnavailable(f"Cannot read PDF cover: {type(e).__name__}")
+    if not images:
+        raise CoverUnavailable("First PDF page has no image")
+    return max(images, key=lambda image: len(image.data)).data
+
+
+@tracing.traced("cover.resize")
+def render_variants(data: bytes) -> Dict[str, bytes]:
+    try:
+        image = Image.open(io.BytesIO(data))
+        # JPEG декодується одразу зі зменшенням — у рази швидше для великих оригіналів
+        largest = max(COVER_SIZES.values())
+        image.draft("RGB", (largest, largest * 4))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+    except Exception as e:
+        raise CoverUnavailable(f"Not an image: {type(e).__name__}")
+    variants = {}
+    for size, width in COVER_SIZES.items():
+        variant = image
+        if image.width > width:
+            variant = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        out = io.BytesIO()
+        variant.save(out, "JPEG", quality=COVER_QUALITY, optimize=True, progressive=True)
+        variants[size] = out.getvalue()
+    return variants
+
+
+def _source_images(book):
+    if book.cover_url:
+        yield lambda: fetch_origin(book.cover_url)
+    if book.blob_sha256:
+        yield lambda: first_page_image(book.blob_sha256)
+
+
+@contextmanager
+def _version_lock(version: str):
+    # Lock прибирається, лише коли його відпустив останній, хто чекав: інакше новий
+    # запит створив би другий lock і генерував паралельно
+    with _locks_guard:
+        entry = _locks.setdefault(version, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _locks_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del _locks[version]
+
+
+def _remember_failure(version: str):
+    now = time.monotonic()
+    with _locks_guard:
+        _failures.pop(version, None)
+        _failures[version] = now + COVER_FAILURE_TTL
+        while _failures and (next(iter(_failures.values())) <= now or len(_failures) > COVER_FAILURES_MAX):
+            del _failures[next(iter(_failures))]
+
+
+def _generate(book, version: str) -> Dict[str, bytes]:
+    if _failures.get(version, 0) > time.monotonic():
+        metrics.COVER_REQUESTS.labels("failed").inc()
+        raise CoverUnavailable("Cover source failed recently")
+    started = time.perf_counter()
+    error = CoverUnavailable("Book has no cover")
+    for load in _source_images(book):
+        try:
+            variants = render_variants(load())
+            break
+        except CoverUnavailable as e:
+            error = e
+        except httpx.HTTPError as e:
+            error = CoverUnavailable(f"Cover origin error: {type(e).__name__}")
+        logger.info("Cover source for book %s failed: %s", book.id, error)
+    else:
+        _remember_failure(version)
+        metrics.COVER_REQUESTS.labels("failed").inc()
+        raise error
+    for size, data in variants.items():
+        cache.put(variant_name(version, size), data)
+    with _locks_guard:
+        _failures.pop(version, None)
+    metrics.COVER_GENERATE_DURATION.observe(time.perf_counter() - started)
+    metrics.COVER_REQUESTS.labels("generated").inc()
+    return variants
+
+
+def get_variant(book, size: str) -> bytes:
+    """JPEG варіанта; за потреби спершу генерує всі варіанти обкладинки."""
+    version = cover_version(book)
+    if version is None:
+        raise CoverUnavailable("Book has no cover")
+    name = variant_name(version, size)
+    data = cache.read(name)
+    if data is not None:
+        metrics.COVER_REQUESTS.labels("hit").inc()
+        return data
+    if Image is None:
+        raise CoverDisabled("Pillow is not installed")
+    with _version_lock(version):
+        # Поки чекали, варіанти міг згенерувати інший запит
+        data = cache.read(name) if name in cache else None
+        if data is not None:
+            metrics.COVER_REQUESTS.labels("hit").inc()
+            return data
+        # Файл могли вже витіснити, тож відповідь береться зі щойно згенерованих байтів
+        return _generate(book, version)[size]
+
+
+def stats() -> dict:
+    return {"enabled": Image is not None, "sizes": COVER_SIZES, **cache.stats()}
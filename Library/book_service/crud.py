@@ -1,12 +1,145 @@
+import base64
+import json
+from sqlalchemy import and_, or_, select
 from sqlalchemy.orm import Session
-from . import models, schemas
+from . import covers, models, schemas, search, storage
+from . import content as book_content
 from .models import Book
 
+# Колонки, за якими дозволено сортувати каталог (кожна має складений індекс з id)
+SORT_COLUMNS = {
+    "id": Book.id,
+    "title": Book.title,
+    "author": Book.author,
+    "year": Book.year,
+}
+BOOK_FIELDS = ("id", "title", "author", "description", "year", "pages", "cover_url", "cover_version")
+# Поля, що обчислюються з колонок: поле -> колонки, які для нього вибираються
+DERIVED_FIELDS = {"cover_version": ("cover_url", "blob_sha256")}
+
 def get_books(db: Session):
     return db.query(models.Book).all()
 
+def encode_cursor(value, book_id: int) -> str:
+    raw = json.dumps([value, book_id], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, book_id = json.loads(raw)
+        return value, int(book_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+def _after_clause(column, descending: bool, value, book_id: int):
+    # Keyset-умова "рядки після курсора" для порядку (column, id);
+    # NULL ідуть останніми при зростанні і першими при спаданні
+    if column is Book.id:
+        return Book.id < book_id if descending else Book.id > book_id
+    if descending:
+        if value is None:
+            return or_(and_(column.is_(None), Book.id < book_id), column.isnot(None))
+        return or_(column < value, and_(column == value, Book.id < book_id))
+    if value is None:
+        return and_(column.is_(None), Book.id > book_id)
+    return or_(column > value, and_(column == value, Book.id > book_id), column.is_(None))
+
+def _book_fields(fields: list[str] | None) -> list[str]:
+    fields = list(fields or BOOK_FIELDS)
+    unknown = set(fields) - set(BOOK_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return fields
+
+def _field_columns(fields: list[str]) -> list:
+    names = [column for name in fields for column in DERIVED_FIELDS.get(name, (name,))]
+    return [getattr(Book, name) for name in dict.fromkeys(names)]
+
+def _row_dict(row, fields: list[str]) -> dict:
+    return {name: covers.cover_version(row) if name == "cover_version" else getattr(row, name) for name in fields}
+
+def list_books_query(
+    limit: int,
+    after: str | None = None,
+    sort: str = "id",
+    author: str | None = None,
+    year_from: int | None = None,
+    year_to: int | None = None,
+    title_prefix: str | None = None,
+    fields: list[str] | None = None,
+):
+    """
+    Запит сторінки каталогу з keyset-пагінацією. sort — назва колонки з SORT_COLUMNS,
+    з префіксом "-" для спадання. Повертає (select, функція, що перетворює рядки
+    на (список dict з полями fields, курсор наступної сторінки)).
+    """
+    descending = sort.startswith("-")
+    sort_name = sort.lstrip("-")
+    if sort_name not in SORT_COLUMNS:
+        raise ValueError(f"Unknown sort: {sort}")
+    column = SORT_COLUMNS[sort_name]
+    fields = _book_fields(fields)
+
+    # Вибираємо лише потрібні колонки + id та колонку сортування для курсора
+    query = select(*_field_columns(["id", sort_name, *fields]))
+    if author is not None:
+        query = query.filter(Book.author == author)
+    if year_from is not None:
+        query = query.filter(Book.year >= year_from)
+    if year_to is not None:
+        query = query.filter(Book.year <= year_to)
+    if title_prefix:
+        query = query.filter(Book.title.startswith(title_prefix, autoescape=True))
+    if after:
+        value, book_id = decode_cursor(after)
+        query = query.filter(_after_clause(column, descending, value, book_id))
+
+    if column is Book.id:
+        order = [Book.id.desc() if descending else Book.id.asc()]
+    elif descending:
+        order = [column.desc().nulls_first(), Book.id.desc()]
+    else:
+        order = [column.asc().nulls_last(), Book.id.asc()]
+    query = query.order_by(*order).limit(limit + 1)
+
+    def to_page(rows):
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(getattr(last, sort_name), last.id)
+        return [_row_dict(row, fields) for row in rows], next_cursor
+
+    return query, to_page
+
+def list_books(db: Session, limit: int, **filters):
+    query, to_page = list_books_query(limit, **filters)
+    return to_page(db.execute(query).all())
+
+def books_by_ids_query(ids: list[int], fields: list[str] | None = None):
+    """
+    Книги з переліку id одним запитом WHERE id IN (...). Повертає (select, функція,
+    що перетворює рядки на список dict у порядку ids; відсутніх id у списку немає).
+    """
+    fields = _book_fields(fields)
+    query = select(*_field_columns(["id", *fields])).filter(Book.id.in_(ids))
+
+    def to_list(rows):
+        by_id = {row.id: row for row in rows}
+        return [_row_dict(by_id[i], fields) for i in ids if i in by_id]
+
+    return query, to_list
+
+def get_books_by_ids(db: Session, ids: list[int], fields: list[str] | None = None):
+    query, to_list = books_by_ids_query(ids, fields)
+    return to_list(db.execute(query).all())
+
+def get_book_query(book_id: int):
+    return select(models.Book).filter(models.Book.id == book_id)
+
 def get_book(db: Session, book_id: int):
-    return db.query(models.Book).filter(models.Book.id == book_id).first()
+    return db.scalars(get_book_query(book_id)).first()
 
 def create_book(db: Session, book: schemas.BookCreate):
     db_book = Book(
@@ -20,13 +153,19 @@ def create_book(db: Session, book: schemas.BookCreate):
     db.add(db_book)
     db.commit()
     db.refresh(db_book)
+    search.index_book_metadata(db, db_book)
     return db_book
 
 def delete_book(db: Session, book_id: int):
     book = get_book(db, book_id)
     if book:
         db.delete(book)
+        search.remove_book(db, book_id, commit=False)
+        # Оригінал видалить storage gc, коли на нього не лишиться посилань
+        storage.release(db, book.blob_sha256)
         db.commit()
+        # Файли прибираємо лише після коміту: відкат не повинен лишити книгу без тексту
+        book_content.remove_content(book_id)
     return book
 
 def update_book(db: Session, book_id: int, book_data: schemas.BookCreate):
@@ -34,6 +173,8 @@ def update_book(db: Session, book_id: int, book_data: schemas.BookCreate):
     if book:
         for field, value in book_data.dict().items():
             setattr(book, field, value)
+        book.version = models.Book.version + 1
         db.commit()
         db.refresh(book)
+        search.index_book_metadata(db, book)
     return book
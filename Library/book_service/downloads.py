@@ -0,0 +1,146 @@
+"""
+Віддача оригіналів книг (GET /books/{id}/file) з Range/If-Range: PDF-переглядачі
+беруть лише потрібні діапазони байтів, а обірване завантаження продовжується.
+
+Тіло не копіюється через Python, якщо ASGI-сервер підтримує розширення
+http.response.zerocopysend (sendfile з дескриптора) або http.response.pathsend
+(лише для цілого файлу). Інакше файл читається блоками FILE_CHUNK_SIZE через
+os.pread у пулі потоків.
+"""
+import os
+import re
+from email.utils import formatdate
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
+
+FILE_CHUNK_SIZE = int(os.getenv("FILE_CHUNK_SIZE", str(256 * 1024)))
+
+MEDIA_TYPES = {"pdf": "application/pdf", "txt": "text/plain; charset=utf-8"}
+
+_RANGE_SPEC = re.compile(r"^\s*(\d*)\s*-\s*(\d*)\s*$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Діапазон [start, end) з заголовка Range. None — віддати файл цілком: заголовка
+    немає або він некоректний (RFC 9110 дозволяє такий Range ігнорувати). Кілька
+    діапазонів зводяться до одного, що їх охоплює, — без multipart/byteranges.
+    """
+    if not header:
+        return None
+    unit, _, specs = header.partition("=")
+    if unit.strip().lower() != "bytes" or not specs:
+        return None
+    spans = []
+    for spec in specs.split(","):
+        match = _RANGE_SPEC.match(spec)
+        if match is None:
+            return None
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = min(int(last) + 1, size) if last else size
+            if last and int(last) < start:
+                return None
+        elif last:
+            start, end = max(size - int(last), 0), size
+            if int(last) == 0:
+                continue
+        else:
+            return None
+        if start < size:
+            spans.append((start, end))
+    if not spans:
+        raise RangeNotSatisfiable()
+    return min(s for s, _ in spans), max(e for _, e in spans)
+
+
+def content_disposition(filename: str, disposition: str = "inline") -> str:
+    # ASCII-запасне ім'я для старих клієнтів і повне — у filename* (RFC 6266)
+    stem, dot, ext = filename.rpartition(".")
+    fallback = (re.sub(r"[^A-Za-z0-9_-]+", "_", stem).strip("_") or "book") + dot + ext
+    return f"{disposition}; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
+
+
+class FileRangeResponse(Response):
+    """
+    Відповідь з файлом: 200 цілком, 206 з одним діапазоном або 416.
+    etag має бути сильним — If-Range порівнюється з ним побайтово.
+    """
+
+    def __init__(self, path: str, media_type: str, etag: str, headers: Optional[dict] = None):
+        stat = os.stat(path)  # FileNotFoundError — обробляє ендпоінт
+        self.path = path
+        self.size = stat.st_size
+        self.status_code = 200
+        self.media_type = media_type
+        self.background = None
+        self.init_headers({
+            **(headers or {}),
+            "ETag": etag,
+            "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+            "Accept-Ranges": "bytes",
+            "Content-Length": str(self.size),
+        })
+
+    def _range(self, scope) -> Optional[Tuple[int, int]]:
+        request_headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        if_range = request_headers.get("if-range")
+        if if_range is not None and if_range.strip() not in (self.headers["etag"], self.headers["last-modified"]):
+            # Файл змінився з часу першої частини — віддаємо його заново цілком
+            return None
+        return parse_range(request_headers.get("range"), self.size)
+
+    async def __call__(self, scope, receive, send):
+        try:
+            span = self._range(scope)
+        except RangeNotSatisfiable:
+            headers = {"ETag": self.headers["etag"], "Accept-Ranges": "bytes", "Content-Range": f"bytes */{self.size}"}
+            await Response(status_code=416, headers=headers)(scope, receive, send)
+            return
+        start, end = span or (0, self.size)
+        if span is not None:
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {start}-{end - 1}/{self.size}"
+            self.headers["content-length"] = str(end - start)
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            # Blob прибрав GC між stat і відкриттям
+            await Response("Файл не знайдено", status_code=404)(scope, receive, send)
+            return
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            if scope["method"] == "HEAD" or end == start:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+            else:
+                await self._send_body(scope, send, fd, start, end)
+        finally:
+            os.close(fd)
+
+    async def _send_body(self, scope, send, fd: int, start: int, end: int):
+        extensions = scope.get("extensions") or {}
+        if "http.response.zerocopysend" in extensions:
+            await send({
+                "type": "http.response.zerocopysend",
+                "file": fd,
+                "offset": start,
+                "count": end - start,
+                "more_body": False,
+            })
+        elif "http.response.pathsend" in extensions and (start, end) == (0, self.size):
+            await send({"type": "http.response.pathsend", "path": os.path.abspath(self.path)})
+        else:
+            while start < end:
+                chunk = await run_in_threadpool(os.pread, fd, min(FILE_CHUNK_SIZE, end - start), start)
+                if not chunk:
+                    raise RuntimeError(f"{self.path} was truncated while sending")
+                start += len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": start < end})
@@ -0,0 +1,81 @@
+import gzip
+import os
+from typing import Callable, Dict, Optional, Union
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+# Розбір Accept-Encoding і If-None-Match спільний з gateway
+from common.encoding import choose_encoding, etag_matches
+
+try:
+    import brotli
+except ImportError:  # Brotli необов'язковий: без нього віддаємо лише gzip
+    brotli = None
+
+# Відповіді, менші за цей розмір, не стискаємо
+MIN_COMPRESS_SIZE = int(os.getenv("MIN_COMPRESS_SIZE", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# Для попередньо стиснутих blob'ів час не критичний — стискаємо максимально
+PRECOMPRESS_GZIP_LEVEL = 9
+PRECOMPRESS_BROTLI_QUALITY = 11
+
+
+def available_encodings() -> list:
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def make_etag(value: str, encoding: Optional[str] = None) -> str:
+    # Сильний ETag має відрізнятися для кожного Content-Encoding
+    return f'"{value}-{encoding}"' if encoding else f'"{value}"'
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept-Encoding"})
+
+
+def encoded_response(
+    request: Request,
+    body: Union[bytes, Callable[[], bytes]],
+    etag_value: Optional[str] = None,
+    precompressed: Optional[Dict[str, str]] = None,
+    media_type: str = "application/json",
+) -> Response:
+    """
+    Відповідь з ETag і стисненням за Accept-Encoding. Якщо для кодування є готовий
+    файл у precompressed, він віддається як є; інакше тіло стискається на льоту.
+    body може бути функцією — тоді воно будується лише коли справді потрібне.
+    """
+    accept = request.headers.get("accept-encoding")
+    if_none_match = request.headers.get("if-none-match")
+    headers = {"Vary": "Accept-Encoding"}
+
+    if precompressed:
+        encoding = choose_encoding(accept, [e for e in available_encodings() if e in precompressed])
+        if encoding is not None:
+            etag = make_etag(etag_value, encoding) if etag_value else None
+            if etag and etag_matches(if_none_match, etag):
+                return not_modified(etag)
+            if etag:
+                headers["ETag"] = etag
+            headers["Content-Encoding"] = encoding
+            return FileResponse(precompressed[encoding], media_type=media_type, headers=headers)
+
+    data = body() if callable(body) else body
+    encoding = choose_encoding(accept, available_encodings()) if len(data) >= MIN_COMPRESS_SIZE else None
+    etag = make_etag(etag_value, encoding) if etag_value else None
+    if etag and etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    if etag:
+        headers["ETag"] = etag
+    if encoding:
+        data = compress(data, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=data, media_type=media_type, headers=headers)
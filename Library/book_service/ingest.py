@@ -0,0 +1,295 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import BinaryIO, Dict, List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from . import metrics, models, search, storage, tracing
+from . import content as book_content
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Кількість процесів для витягання тексту з PDF та розмір пакета сторінок для одного завдання
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+INGEST_BATCH_PAGES = int(os.getenv("INGEST_BATCH_PAGES", "16"))
+# Скільки job виконуються одночасно (потоки-координатори); решта чекає в черзі
+INGEST_DRIVERS = int(os.getenv("INGEST_DRIVERS", "4"))
+# Скільки завершених job тримати в пам'яті; стан усіх job зберігається в ingest_jobs
+INGEST_JOBS_KEEP = int(os.getenv("INGEST_JOBS_KEEP", "1000"))
+# Незавершена job без heartbeat довше за цей час вважається перерваною (процес перезапущено)
+INGEST_STALE_SECONDS = float(os.getenv("INGEST_STALE_SECONDS", "600"))
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+# Потоки, які координують job: роздають пакети сторінок процесам і пишуть результат по порядку
+_drivers: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+class IngestJob:
+    def __init__(self, book_id: int, file_path: str, kind: str, source_book_id: Optional[int] = None):
+        self.id = uuid.uuid4().hex
+        self.book_id = book_id
+        self.file_path = file_path
+        self.kind = kind
+        # Для kind == "copy": книга з тим самим оригіналом, чий текст перевикористовується
+        self.source_book_id = source_book_id
+        self.status = "pending"
+        self.total_pages: Optional[int] = None
+        self.extracted_pages = 0
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "book_id": self.book_id,
+            "kind": self.kind,
+            "status": self.status,
+            "total_pages": self.total_pages,
+            "extracted_pages": self.extracted_pages,
+            "progress": (self.extracted_pages / self.total_pages) if self.total_pages else None,
+            "readable": self.extracted_pages > 0,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    @classmethod
+    def from_record(cls, record: models.IngestJobRecord) -> "IngestJob":
+        job = cls.__new__(cls)
+        for field in ("id", "book_id", "kind", "status", "total_pages", "extracted_pages",
+                      "error", "created_at", "started_at", "finished_at"):
+            setattr(job, field, getattr(record, field))
+        job.file_path, job.source_book_id = None, None
+        if job.status in ("pending", "running") and record.updated_at < time.time() - INGEST_STALE_SECONDS:
+            # Процес, що вів job, зупинився; книгу треба завантажити повторно
+            job.status, job.error = "failed", "Ingest was interrupted"
+        return job
+
+    def save(self):
+        """Записує стан job в ingest_jobs; викликається на кожній зміні стану і після кожного пакета."""
+        with SessionLocal() as db:
+            db.merge(models.IngestJobRecord(
+                id=self.id,
+                book_id=self.book_id,
+                kind=self.kind,
+                status=self.status,
+                total_pages=self.total_pages,
+                extracted_pages=self.extracted_pages,
+                error=self.error,
+                created_at=self.created_at,
+                started_at=self.started_at,
+                finished_at=self.finished_at,
+                updated_at=time.time(),
+            ))
+            db.commit()
+
+
+_jobs: Dict[str, IngestJob] = {}
+_jobs_lock = threading.Lock()
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=INGEST_WORKERS)
+        return _process_pool
+
+
+def _get_drivers() -> ThreadPoolExecutor:
+    global _drivers
+    with _pool_lock:
+        if _drivers is None:
+            _drivers = ThreadPoolExecutor(max_workers=INGEST_DRIVERS, thread_name_prefix="ingest")
+        return _drivers
+
+
+# Кеш розібраного PDF у процесі-воркері, щоб не парсити файл заново для кожного пакета
+_worker_reader = None
+_worker_reader_path: Optional[str] = None
+
+
+def _extract_pdf_pages(file_path: str, start: int, stop: int) -> List[str]:
+    # Виконується в окремому процесі
+    global _worker_reader, _worker_reader_path
+    from PyPDF2 import PdfReader
+
+    if _worker_reader_path != file_path:
+        _worker_reader = PdfReader(file_path)
+        _worker_reader_path = file_path
+    reader = _worker_reader
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _pdf_page_count(file_path: str) -> int:
+    from PyPDF2 import PdfReader
+
+    return len(PdfReader(file_path).pages)
+
+
+def _set_book_pages(book_id: int, pages: int):
+    # Лише після успішного витягання (або 0 після невдалого): pages > 0 означає повний текст.
+    # Один UPDATE без читання рядка: паралельний PUT книги не перетирається і не заважає
+    with SessionLocal() as db:
+        db.execute(
+            update(models.Book).where(models.Book.id == book_id)
+            .values(pages=pages, version=models.Book.version + 1)
+        )
+        db.commit()
+
+
+def _ingest_pdf(job: IngestJob):
+    job.total_pages = _pdf_page_count(job.file_path)
+    pool = _get_process_pool()
+    batches = deque(
+        (start, min(start + INGEST_BATCH_PAGES, job.total_pages))
+        for start in range(0, job.total_pages, INGEST_BATCH_PAGES)
+    )
+    # Обмежене вікно завдань у роботі: результати пишемо строго по порядку,
+    # тож не тримаємо в пам'яті більше ніж кілька пакетів наперед
+    in_flight = deque()
+    with book_content.ContentWriter(job.book_id) as writer, SessionLocal() as db:
+        while batches or in_flight:
+            while batches and len(in_flight) < INGEST_WORKERS * 2:
+                start, stop = batches.popleft()
+                in_flight.append(pool.submit(_extract_pdf_pages, job.file_path, start, stop))
+            indexed = []
+            with tracing.start_span("ingest.pdf_batch"):
+                extracted = in_flight.popleft().result()
+            for page in extracted:
+                number = writer.write_page(page)
+                if number is not None:
+                    indexed.append((number, page.strip()))
+            writer.flush()
+            search.index_pages(db, job.book_id, indexed)
+            job.extracted_pages = writer.written
+            job.save()
+
+
+def _ingest_txt(job: IngestJob):
+    with open(job.file_path, encoding="utf-8") as f, \
+            book_content.ContentWriter(job.book_id) as writer, SessionLocal() as db:
+        indexed = []
+        for page in book_content.paginate_text(f):
+            number = writer.write_page(page)
+            if number is not None:
+                indexed.append((number, page.strip()))
+            if writer.written % INGEST_BATCH_PAGES == 0:
+                writer.flush()
+                search.index_pages(db, job.book_id, indexed)
+                indexed = []
+                job.extracted_pages = writer.written
+                job.save()
+        writer.flush()
+        search.index_pages(db, job.book_id, indexed)
+    job.total_pages = job.extracted_pages = writer.written
+
+
+def _copy_content(job: IngestJob):
+    # Такий самий файл уже витягнутий для іншої книги — повторно не парсимо
+    pages = book_content.link_content(job.source_book_id, job.book_id)
+    job.total_pages = job.extracted_pages = pages
+    with SessionLocal() as db:
+        book = db.get(models.Book, job.book_id)
+        if book is not None:
+            search.reindex_book(db, book)
+
+
+def _run(job: IngestJob):
+    job.status = "running"
+    job.started_at = time.time()
+    try:
+        job.save()
+        with tracing.start_span("ingest", **{"book.id": job.book_id, "ingest.kind": job.kind}) as span:
+            if job.kind == "copy":
+                _copy_content(job)
+            elif job.kind == "pdf":
+                _ingest_pdf(job)
+            else:
+                _ingest_txt(job)
+            # Стиснуті варіанти повного контенту і ETag рахуємо один раз, а не на кожен запит
+            if book_content.content_etag(job.book_id) is None:
+                book_content.build_compressed(job.book_id)
+            span.set_attribute("ingest.pages", job.extracted_pages)
+        _set_book_pages(job.book_id, job.total_pages)
+        job.status = "done"
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e)
+        try:
+            _set_book_pages(job.book_id, 0)
+        except Exception:
+            logger.exception("Failed to reset pages of book %s", job.book_id)
+    finally:
+        job.finished_at = time.time()
+        try:
+            job.save()
+        except Exception:
+            logger.exception("Failed to save ingest job %s", job.id)
+        metrics.INGEST_DURATION.labels(job.kind, job.status).observe(job.finished_at - job.started_at)
+        metrics.INGEST_PAGES.labels(job.kind).inc(job.extracted_pages)
+
+
+def _forget_old_jobs():
+    finished = [j for j in _jobs.values() if j.finished_at is not None]
+    if len(finished) <= INGEST_JOBS_KEEP:
+        return
+    finished.sort(key=lambda j: j.finished_at)
+    for job in finished[:len(finished) - INGEST_JOBS_KEEP]:
+        del _jobs[job.id]
+
+
+def submit(book_id: int, file_path: str, kind: Optional[str] = None, source_book_id: Optional[int] = None) -> IngestJob:
+    """Ставить файл книги у чергу на витягання тексту і одразу повертає job."""
+    kind = kind or storage.kind_for(file_path)
+    job = IngestJob(book_id, file_path, kind, source_book_id)
+    job.save()
+    with _jobs_lock:
+        _forget_old_jobs()
+        _jobs[job.id] = job
+    # Job продовжує трейс запиту, що його поставив (завантаження, масовий імпорт)
+    tracing.run_in_context(_get_drivers(), _run, job)
+    return job
+
+
+def submit_original(db: Session, book: models.Book, src: BinaryIO, filename: str) -> IngestJob:
+    """
+    Зберігає оригінал у контентно-адресованому сховищі і ставить job. Якщо такий
+    самий файл уже витягнутий для іншої книги, job лише перевикористовує її текст.
+    """
+    blob = storage.attach(db, book, src, filename)
+    source = storage.extracted_source(db, blob.sha256, book.id)
+    if source is not None:
+        return submit(book.id, storage.blob_path(blob.sha256), kind="copy", source_book_id=source.id)
+    return submit(book.id, storage.blob_path(blob.sha256), kind=blob.kind)
+
+
+def get_job(job_id: str) -> Optional[IngestJob]:
+    job = _jobs.get(job_id)
+    if job is not None:
+        return job
+    # Job іншого воркера або з часу до перезапуску
+    with SessionLocal() as db:
+        record = db.get(models.IngestJobRecord, job_id)
+    return IngestJob.from_record(record) if record is not None else None
+
+
+def shutdown():
+    # Пули створюються знову за першою job, тож застосунок можна перезапустити в тому ж процесі
+    global _drivers, _process_pool
+    with _pool_lock:
+        for pool in (_drivers, _process_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        _drivers = _process_pool = None
@@ -1,41 +1,52 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, Query, Request, Response
 from sqlalchemy.orm import Session
-from . import models, schemas, crud
-from .database import SessionLocal, engine, Base
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from . import models, schemas, crud, async_crud, bulk, covers, downloads, encoding, ingest, metrics, migrations, search, storage, tracing, content as book_content
+from .database import AsyncSessionLocal, DB_ASYNC, SessionLocal, engine, run_db
+import hashlib
+import json
 import os
-from typing import List
-from PyPDF2 import PdfReader
-
-app = FastAPI()
-
-# Create tables
-Base.metadata.create_all(bind=engine)
-
-def seed_books(db):
-    if not db.query(models.Book).first():
-        books = [
-            models.Book(
-                title="1984",
-                author="Джордж Оруэлл",
-                description="Антиутопия о тоталитарном будущем.",
-                year=1949,
-                pages=328,
-                cover_url="https://covers.openlibrary.org/b/id/7222246-L.jpg"
-            ),
-            models.Book(
-                title="Мастер и Маргарита",
-                author="Михаил Булгаков",
-                description="Мистический роман о добре и зле.",
-                year=1967,
-                pages=480,
-                cover_url="https://covers.openlibrary.org/b/id/8231856-L.jpg"
-            )
-        ]
-        db.add_all(books)
-        db.commit()
-
-with SessionLocal() as db:
-    seed_books(db)
+import tempfile
+from contextlib import asynccontextmanager
+
+BOOKS_PAGE_LIMIT = int(os.getenv("BOOKS_PAGE_LIMIT", "100"))
+BOOKS_PAGE_LIMIT_MAX = int(os.getenv("BOOKS_PAGE_LIMIT_MAX", "1000"))
+# Тіло масового імпорту до цього розміру тримається в пам'яті, більше — у тимчасовому файлі
+BULK_SPOOL_BYTES = 8 * 1024 * 1024
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    ingest.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+metrics.instrument_app(app)
+tracing.instrument_app(app)
+
+
+# Схема створюється міграціями (python -m book_service.migrations upgrade), а не при старті
+@app.get("/health/live")
+def liveness():
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+def readiness():
+    # Трафік можна пускати, коли база відповідає і схема на останній міграції
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            missing = migrations.pending(conn)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=503, detail=f"Database unavailable: {type(e).__name__}")
+    if missing:
+        raise HTTPException(status_code=503, detail=f"Pending migrations: {', '.join(missing)}")
+    return {"status": "ok"}
+
 
 def get_db():
     db = SessionLocal()
@@ -44,19 +55,124 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Гарячі ендпоінти читання у режимі DB_ASYNC працюють з AsyncSession
+read_db = get_async_db if DB_ASYNC else get_db
+
 @app.post("/books", response_model=schemas.Book)
 def create_book(book: schemas.BookCreate, db: Session = Depends(get_db)):
     return crud.create_book(db, book)
 
-@app.get("/books", response_model=list[schemas.Book])
-def read_books(db: Session = Depends(get_db)):
-    return crud.get_books(db)
+@app.get("/books")
+async def read_books(
+    request: Request,
+    limit: int = Query(BOOKS_PAGE_LIMIT, ge=1, le=BOOKS_PAGE_LIMIT_MAX),
+    after: str | None = None,
+    sort: str = "id",
+    author: str | None = None,
+    year_from: int | None = None,
+    year_to: int | None = None,
+    title_prefix: str | None = None,
+    fields: str | None = None,
+    ids: str | None = None,
+    db=Depends(read_db),
+):
+    """
+    Каталог сторінками. Курсор наступної сторінки повертається у заголовку
+    X-Next-Cursor і передається назад як ?after=...; fields=id,title,cover_url
+    обмежує набір полів у відповіді.
+
+    ids=1,2,3 повертає саме ці книги одним запитом (у тому ж порядку, без
+    відсутніх) — замість окремого GET /books/{id} на кожну; пагінація і фільтри
+    при цьому не застосовуються.
+    """
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    if ids is not None:
+        try:
+            book_ids = list(dict.fromkeys(int(i) for i in ids.split(",") if i.strip()))
+        except ValueError:
+            raise HTTPException(400, "ids must be a comma-separated list of integers")
+        if len(book_ids) > BOOKS_PAGE_LIMIT_MAX:
+            raise HTTPException(400, f"Too many ids (max {BOOKS_PAGE_LIMIT_MAX})")
+        if not book_ids:
+            return []
+        try:
+            books = await run_db(db, crud.get_books_by_ids, async_crud.get_books_by_ids, book_ids, field_list)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        return _catalog_response(request, books)
+    try:
+        books, next_cursor = await run_db(
+            db,
+            crud.list_books,
+            async_crud.list_books,
+            limit=limit,
+            after=after,
+            sort=sort,
+            author=author,
+            year_from=year_from,
+            year_to=year_to,
+            title_prefix=title_prefix,
+            fields=field_list,
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return _catalog_response(request, books, next_cursor)
+
+def _catalog_response(request: Request, books: list, next_cursor: str | None = None) -> Response:
+    # ETag зі вмісту сторінки: gateway кешує лише відповіді з валідатором, клієнт отримує 304
+    body = _json_bytes(books)
+    response = encoding.encoded_response(request, body, f"catalog-{hashlib.sha256(body).hexdigest()[:32]}")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+def _run_bulk_import(stream, fmt: str) -> dict:
+    with SessionLocal() as db:
+        return bulk.import_stream(db, stream, fmt).to_dict()
+
+@app.post("/books/bulk")
+async def bulk_import(request: Request, format: str | None = Query(None, pattern="^(csv|ndjson)$")):
+    """
+    Масовий імпорт NDJSON (application/x-ndjson) або CSV (text/csv).
+    Upsert за (title, author); помилки рядків повертаються у звіті.
+    """
+    fmt = format or bulk.detect_format(request.headers.get("content-type"))
+    with tempfile.SpooledTemporaryFile(max_size=BULK_SPOOL_BYTES) as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        return await run_in_threadpool(_run_bulk_import, spool, fmt)
+
+@app.get("/books/search")
+def search_books(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    try:
+        results = search.search(db, q, limit=limit, offset=offset)
+    except search.SearchUnavailable as e:
+        raise HTTPException(501, str(e))
+    return {"query": q, "limit": limit, "offset": offset, "results": results}
 
 @app.get("/books/{book_id}", response_model=schemas.Book)
-def read_book(book_id: int, db: Session = Depends(get_db)):
-    db_book = crud.get_book(db, book_id)
+async def read_book(book_id: int, request: Request, response: Response, db=Depends(read_db)):
+    db_book = await run_db(db, crud.get_book, async_crud.get_book, book_id)
     if db_book is None:
         raise HTTPException(status_code=404, detail="Book not found")
+    # ETag з версії рядка: version збільшується при кожному оновленні книги
+    etag = encoding.make_etag(f"book-{db_book.id}-v{db_book.version}")
+    if encoding.etag_matches(request.headers.get("if-none-match"), etag):
+        return encoding.not_modified(etag)
+    response.headers["ETag"] = etag
+    if db_book.blob_sha256 and not db_book.pages:
+        # Текст ще витягується (або витягання не вдалося): pages і version ще зміняться
+        response.headers["Cache-Control"] = "no-store"
     return db_book
 
 @app.put("/books/{book_id}", response_model=schemas.Book)
@@ -78,7 +194,7 @@ def debug_books(db: Session = Depends(get_db)):
     books = db.query(models.Book).all()
     return [{"id": b.id, "title": b.title, "author": b.author, "year": b.year, "pages": b.pages} for b in books]
 
-@app.post("/books/upload", response_model=schemas.Book)
+@app.post("/books/upload", response_model=schemas.BookUpload)
 def upload_book(
     title: str = Form(...),
     author: str = Form(...),
@@ -89,59 +205,153 @@ def upload_book(
     file: UploadFile = File(...),
     db: Session = Depends(get_db)
 ):
-    # Зберігаємо файл
-    upload_dir = "uploaded_books"
-    os.makedirs(upload_dir, exist_ok=True)
-    file_path = os.path.join(upload_dir, file.filename)
-    with open(file_path, "wb") as f:
-        f.write(file.file.read())
-
-    # Визначаємо кількість сторінок та контент
-    pages = 0
-    content: List[str] = []
-    if file.filename.lower().endswith(".pdf"):
-        reader = PdfReader(file_path)
-        pages = len(reader.pages)
-        for page in reader.pages:
-            content.append(page.extract_text() or "")
-    elif file.filename.lower().endswith(".txt"):
-        with open(file_path, encoding="utf-8") as f:
-            text = f.read()
-        # Розбиваємо текст на сторінки по 1500 символів
-        content = [text[i:i+1500] for i in range(0, len(text), 1500)]
-        pages = len(content)
-    else:
+    filename = file.filename.lower()
+    if not filename.endswith((".pdf", ".txt")):
         raise HTTPException(400, "Підтримуються лише PDF та TXT")
 
-    # Створюємо книгу
+    # Створюємо книгу; кількість сторінок заповнить фонова job
     book = schemas.BookCreate(
         title=title,
         author=author,
         description=description,
         year=year,
-        pages=pages,
+        pages=0,
         cover_url=cover_url
     )
     db_book = crud.create_book(db, book)
-    # Зберігаємо шлях до файлу та контент у окремій папці (можна додати у БД, якщо потрібно)
-    content_dir = os.path.join(upload_dir, f"book_{db_book.id}")
-    os.makedirs(content_dir, exist_ok=True)
-    with open(os.path.join(content_dir, "content.txt"), "w", encoding="utf-8") as f:
-        for page in content:
-            f.write(page + "\n---PAGE_BREAK---\n")
-    db_book.file_url = file_path
-    db.commit()
-    db.refresh(db_book)
-    return db_book
+    # Оригінал зберігається під своїм SHA-256 потоком, не тримаючи файл у пам'яті;
+    # текст витягується у фоні, а для вже відомого файлу — перевикористовується
+    job = ingest.submit_original(db, db_book, file.file, file.filename)
+    return {**schemas.Book.model_validate(db_book).model_dump(), "job_id": job.id}
+
+@app.get("/books/jobs/{job_id}")
+def get_ingest_job(job_id: str):
+    job = ingest.get_job(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    return job.to_dict()
+
+def _json_bytes(data) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _no_store_if(writing: bool, response: Response) -> Response:
+    # Текст ще пишеться (або запис обірвався): тіло неповне — не кешувати ні в gateway, ні в клієнта
+    if writing:
+        response.headers["Cache-Control"] = "no-store"
+    return response
+
+def _full_content_response(request: Request, book_id: int) -> Response:
+    writing = book_content.is_writing(book_id)
+    if not os.path.exists(book_content.content_path(book_id)):
+        raise HTTPException(404, "Контент не знайдено")
+    etag = book_content.content_etag(book_id)
+    if etag is None and not writing:
+        # Книга збережена до появи стиснутих blob'ів — будуємо їх один раз
+        etag = book_content.build_compressed(book_id)
+    precompressed = None
+    if etag is not None:
+        precompressed = {
+            name: book_content.compressed_path(book_id, name)
+            for name in encoding.available_encodings()
+            if os.path.exists(book_content.compressed_path(book_id, name))
+        }
+    return _no_store_if(writing, encoding.encoded_response(
+        request, lambda: book_content.full_content_json(book_id), etag, precompressed
+    ))
 
 @app.get("/books/{book_id}/content")
-def get_book_content(book_id: int, db: Session = Depends(get_db)):
-    upload_dir = "uploaded_books"
-    content_dir = os.path.join(upload_dir, f"book_{book_id}")
-    content_file = os.path.join(content_dir, "content.txt")
-    if not os.path.exists(content_file):
+def get_book_content(
+    book_id: int,
+    request: Request,
+    start: int | None = Query(None, ge=1),
+    count: int | None = Query(None, ge=1, le=500),
+):
+    writing = book_content.is_writing(book_id)
+    try:
+        if start is None and count is None:
+            # Стара відповідь з усіма сторінками — для сумісності
+            return _full_content_response(request, book_id)
+        start = start or 1
+        total = book_content.page_count(book_id)
+        pages = book_content.read_pages(book_id, start, count or 1)
+    except book_content.ContentNotFound:
+        raise HTTPException(404, "Контент не знайдено")
+    etag = book_content.content_etag(book_id)
+    body = {"book_id": book_id, "start": start, "count": len(pages), "total_pages": total, "pages": pages}
+    return _no_store_if(
+        writing, encoding.encoded_response(request, _json_bytes(body), etag and f"{etag[:32]}-{start}-{len(pages)}")
+    )
+
+@app.get("/books/{book_id}/pages/{page}")
+def get_book_page(book_id: int, page: int, request: Request):
+    writing = book_content.is_writing(book_id)
+    try:
+        total = book_content.page_count(book_id)
+        pages = book_content.read_pages(book_id, page, 1)
+    except book_content.ContentNotFound:
         raise HTTPException(404, "Контент не знайдено")
-    with open(content_file, encoding="utf-8") as f:
-        raw = f.read()
-    pages = [p.strip() for p in raw.split("---PAGE_BREAK---") if p.strip()]
-    return {"pages": pages}
+    if not pages:
+        raise HTTPException(404, "Сторінку не знайдено")
+    etag = book_content.content_etag(book_id)
+    body = {"book_id": book_id, "page": page, "total_pages": total, "text": pages[0]}
+    return _no_store_if(writing, encoding.encoded_response(request, _json_bytes(body), etag and f"{etag[:32]}-p{page}"))
+
+@app.get("/books/{book_id}/cover")
+def get_book_cover(book_id: int, request: Request, size: str = "m", v: str | None = None, db: Session = Depends(get_db)):
+    """
+    Зменшена обкладинка (size=s|m|l) з дискового кешу; генерується при першому запиті.
+    X-Cover-Version — версія обкладинки: з ?v=<версія> відповідь незмінна і кешується на рік.
+    """
+    if size not in covers.COVER_SIZES:
+        raise HTTPException(400, f"Unknown cover size: {size} (expected one of {', '.join(covers.COVER_SIZES)})")
+    book = crud.get_book(db, book_id)
+    if book is None:
+        raise HTTPException(404, "Book not found")
+    version = covers.cover_version(book)
+    if version is None:
+        raise HTTPException(404, "Book has no cover")
+    max_age = f"max-age={covers.COVER_IMMUTABLE_MAX_AGE}, immutable" if v == version else f"max-age={covers.COVER_MAX_AGE}"
+    headers = {
+        "ETag": encoding.make_etag(f"cover-{version}-{size}"),
+        "Cache-Control": f"public, {max_age}",
+        "X-Cover-Version": version,
+    }
+    if encoding.etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    try:
+        data = covers.get_variant(book, size)
+    except covers.CoverDisabled as e:
+        raise HTTPException(503, str(e))
+    except covers.CoverUnavailable as e:
+        raise HTTPException(404, str(e))
+    return Response(data, media_type="image/jpeg", headers=headers)
+
+@app.api_route("/books/{book_id}/file", methods=["GET", "HEAD"])
+def get_book_file(book_id: int, request: Request, db: Session = Depends(get_db)):
+    """
+    Оригінал книги (PDF/TXT) як є. Range: bytes=... повертає 206 з частиною файлу,
+    If-Range з ETag — продовження завантаження, лише якщо файл не змінився.
+    """
+    book = crud.get_book(db, book_id)
+    if book is None:
+        raise HTTPException(404, "Book not found")
+    blob = db.get(models.Blob, book.blob_sha256) if book.blob_sha256 else None
+    if blob is None:
+        raise HTTPException(404, "Book has no file")
+    # Файл адресується своїм SHA-256 — це і є сильний ETag
+    headers = {
+        "ETag": encoding.make_etag(blob.sha256),
+        "Cache-Control": "public, no-cache",
+        "Content-Disposition": downloads.content_disposition(f"{book.title or book.id}.{blob.kind}"),
+    }
+    if encoding.etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers={h: headers[h] for h in ("ETag", "Cache-Control")})
+    media_type = downloads.MEDIA_TYPES.get(blob.kind, "application/octet-stream")
+    try:
+        return downloads.FileRangeResponse(storage.blob_path(blob.sha256), media_type, headers["ETag"], headers)
+    except FileNotFoundError:
+        raise HTTPException(404, "Файл не знайдено")
+
+@app.get("/covers/stats")
+def get_cover_stats():
+    return covers.stats()
@@ -0,0 +1,36 @@
+"""Метрики book_service; спільна частина (HTTP, пул БД, /metrics) — common.metrics."""
+from prometheus_client import Counter, Histogram
+
+from common.metrics import ServiceMetrics
+
+SERVICE = "book_service"
+service_metrics = ServiceMetrics(SERVICE)
+REGISTRY = service_metrics.registry
+instrument_app = service_metrics.instrument_app
+
+
+# Метрики book_service: завантаження оригіналів і витягання тексту
+UPLOAD_DURATION = Histogram(
+    "book_upload_duration_seconds",
+    "Time to receive, hash and store an uploaded original",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+    registry=REGISTRY,
+)
+UPLOAD_BYTES = Counter("book_upload_bytes_total", "Bytes of uploaded originals", registry=REGISTRY)
+INGEST_DURATION = Histogram(
+    "book_ingest_duration_seconds",
+    "Text extraction job duration",
+    ["kind", "status"],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+    registry=REGISTRY,
+)
+INGEST_PAGES = Counter("book_ingest_pages_total", "Pages written by extraction jobs", ["kind"], registry=REGISTRY)
+COVER_REQUESTS = Counter(
+    "book_cover_requests_total", "Cover variant lookups by result (hit, generated, failed)", ["result"], registry=REGISTRY,
+)
+COVER_GENERATE_DURATION = Histogram(
+    "book_cover_generate_duration_seconds",
+    "Time to fetch or extract a cover and render all its variants",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    registry=REGISTRY,
+)
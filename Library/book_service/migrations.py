@@ -0,0 +1,225 @@
+"""
+Версійовані міграції схеми book_service. Виконуються окремим кроком перед
+стартом сервісу, а не при імпорті застосунку:
+
+    python -m book_service.migrations upgrade [--wait 60]   # застосувати нові
+    python -m book_service.migrations status                # застосовані й очікувані
+
+Кожна міграція виконується один раз у власній транзакції й записується в
+schema_migrations. Застосовані міграції не змінюються: нова зміна схеми — нова
+функція в кінці MIGRATIONS. Кроки перевіряють, чи об'єкт уже існує, тож бази,
+створені раніше через create_all, підхоплюються без помилок.
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import (
+    BigInteger, Column, DateTime, Float, Index, Integer, MetaData, String, Table, Text, inspect, select, text,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.exc import OperationalError
+
+from .database import engine
+
+SERVICE = "book_service"
+# Спільний для всіх сервісів ключ advisory-lock: вони ділять базу і таблицю schema_migrations
+LOCK_KEY = 7340022
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("service", String(64), primary_key=True),
+    Column("version", String(128), primary_key=True),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+
+def _columns(conn, table: str) -> set:
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+
+def _create_index(conn, index: Index):
+    if index.name not in {i["name"] for i in inspect(conn).get_indexes(index.table.name)}:
+        index.create(conn)
+
+
+def _books(*columns) -> Table:
+    # Мінімальний опис наявної таблиці books — лише для DDL індексів і колонок
+    return Table("books", MetaData(), Column("id", Integer, primary_key=True), *columns)
+
+
+def _create_books(conn):
+    Table(
+        "books",
+        MetaData(),
+        Column("id", Integer, primary_key=True, index=True),
+        Column("title", String, index=True),
+        Column("author", String),
+        Column("description", Text),
+        Column("year", Integer),
+        Column("pages", Integer),
+        Column("cover_url", String, nullable=True),
+    ).create(conn, checkfirst=True)
+
+
+def _add_keyset_indexes(conn):
+    books = _books(Column("title", String), Column("author", String), Column("year", Integer))
+    _create_index(conn, Index("ix_books_title_id", books.c.title, books.c.id))
+    _create_index(conn, Index("ix_books_author_id", books.c.author, books.c.id))
+    _create_index(conn, Index("ix_books_year_id", books.c.year, books.c.id))
+    _create_index(conn, Index("ix_books_title_prefix", books.c.title, postgresql_ops={"title": "text_pattern_ops"}))
+
+
+def _create_book_search(conn):
+    Table(
+        "book_search",
+        MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("book_id", Integer, nullable=False),
+        Column("page", Integer, nullable=False),
+        Column("document", TSVECTOR().with_variant(Text(), "sqlite"), nullable=False),
+        Index("ix_book_search_document", "document", postgresql_using="gin"),
+        Index("ix_book_search_book_page", "book_id", "page"),
+    ).create(conn, checkfirst=True)
+
+
+def _add_book_version(conn):
+    if "version" not in _columns(conn, "books"):
+        conn.execute(text("ALTER TABLE books ADD COLUMN version INTEGER DEFAULT 1 NOT NULL"))
+
+
+def _create_blobs(conn):
+    Table(
+        "blobs",
+        MetaData(),
+        Column("sha256", String(64), primary_key=True),
+        Column("size", BigInteger, nullable=False),
+        Column("kind", String, nullable=False),
+        Column("refcount", Integer, nullable=False, server_default="0"),
+        Column("released_at", DateTime(timezone=True), nullable=True),
+    ).create(conn, checkfirst=True)
+    if "blob_sha256" not in _columns(conn, "books"):
+        conn.execute(text("ALTER TABLE books ADD COLUMN blob_sha256 VARCHAR(64)"))
+    books = _books(Column("blob_sha256", String(64)))
+    _create_index(conn, Index("ix_books_blob_sha256", books.c.blob_sha256))
+
+
+def _create_ingest_jobs(conn):
+    Table(
+        "ingest_jobs",
+        MetaData(),
+        Column("id", String(32), primary_key=True),
+        Column("book_id", Integer, nullable=False, index=True),
+        Column("kind", String, nullable=False),
+        Column("status", String, nullable=False),
+        Column("total_pages", Integer, nullable=True),
+        Column("extracted_pages", Integer, nullable=False, server_default="0"),
+        Column("error", Text, nullable=True),
+        Column("created_at", Float, nullable=False),
+        Column("started_at", Float, nullable=True),
+        Column("finished_at", Float, nullable=True),
+        Column("updated_at", Float, nullable=False),
+    ).create(conn, checkfirst=True)
+
+
+def _add_title_author_unique(conn):
+    # Замінена на 0008: унікальна пара (title, author) забороняла легітимні однакові книги,
+    # а дублікати перейменовувались. Версія лишається, щоб застосовані бази не розходились
+    pass
+
+
+def _add_import_key(conn):
+    conn.execute(text("DROP INDEX IF EXISTS uq_books_title_author"))
+    # Повертаємо назви дублікатів, до яких попередня версія 0007 дописала " (#id)",
+    # якщо найстаріша книга з тією ж парою (title, author) на місці
+    suffix = "' (#' || CAST(books.id AS VARCHAR) || ')'"
+    original_title = f"SUBSTR(books.title, 1, LENGTH(books.title) - LENGTH({suffix}))"
+    conn.execute(text(
+        f"UPDATE books SET title = {original_title}, version = version + 1 "
+        f"WHERE books.title LIKE ('%' || {suffix}) AND EXISTS (SELECT 1 FROM books original "
+        f"WHERE original.author = books.author AND original.id < books.id AND original.title = {original_title})"
+    ))
+    if "import_key" not in _columns(conn, "books"):
+        conn.execute(text("ALTER TABLE books ADD COLUMN import_key VARCHAR(64)"))
+    books = _books(Column("import_key", String(64)))
+    _create_index(conn, Index("uq_books_import_key", books.c.import_key, unique=True))
+
+
+MIGRATIONS = [
+    ("0001_books", _create_books),
+    ("0002_books_keyset_indexes", _add_keyset_indexes),
+    ("0003_book_search", _create_book_search),
+    ("0004_books_version", _add_book_version),
+    ("0005_blobs", _create_blobs),
+    ("0006_ingest_jobs", _create_ingest_jobs),
+    ("0007_books_title_author_unique", _add_title_author_unique),
+    ("0008_books_import_key", _add_import_key),
+]
+
+
+def applied_versions(conn) -> set:
+    if not inspect(conn).has_table("schema_migrations"):
+        return set()
+    query = select(schema_migrations.c.version).where(schema_migrations.c.service == SERVICE)
+    return set(conn.scalars(query))
+
+
+def pending(conn) -> list:
+    applied = applied_versions(conn)
+    return [version for version, _ in MIGRATIONS if version not in applied]
+
+
+def upgrade(bind=None) -> list:
+    """Застосовує неприйняті міграції по порядку; повертає їхні версії."""
+    bind = bind if bind is not None else engine
+    done = []
+    for version, migrate in MIGRATIONS:
+        with bind.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # Кілька реплік можуть запустити upgrade одночасно — виконуємо по черзі
+                conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": LOCK_KEY})
+            schema_migrations.create(conn, checkfirst=True)
+            if version in applied_versions(conn):
+                continue
+            migrate(conn)
+            conn.execute(schema_migrations.insert().values(
+                service=SERVICE, version=version, applied_at=datetime.now(timezone.utc),
+            ))
+        done.append(version)
+    return done
+
+
+def wait_for_database(timeout: float):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with engine.connect():
+                return
+        except OperationalError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(1)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog=f"python -m {SERVICE}.migrations", description=f"Міграції схеми {SERVICE}")
+    parser.add_argument("command", choices=("upgrade", "status"))
+    parser.add_argument("--wait", type=float, default=0, help="чекати доступності бази до N секунд")
+    args = parser.parse_args(argv)
+    if args.wait > 0:
+        wait_for_database(args.wait)
+    if args.command == "upgrade":
+        done = upgrade()
+        print(f"{SERVICE}: applied {len(done)} migration(s)" + (f": {', '.join(done)}" if done else ""))
+        return 0
+    with engine.connect() as conn:
+        applied = applied_versions(conn)
+    for version, _ in MIGRATIONS:
+        print(f"{'applied' if version in applied else 'pending':<8} {version}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
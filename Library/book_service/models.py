@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text
-from sqlalchemy.ext.declarative import declarative_base
-Base = declarative_base()
+from sqlalchemy import BigInteger, Column, DateTime, Float, Integer, String, Text, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from .database import Base
 
 class Book(Base):
     __tablename__ = "books"
@@ -12,3 +12,77 @@ class Book(Base):
     year = Column(Integer)
     pages = Column(Integer)
     cover_url = Column(String, nullable=True)  # Новое поле для обложки
+    # Версія рядка для ETag; кожен шлях оновлення книги збільшує її сам (version = version + 1),
+    # без optimistic locking — одночасні оновлення не падають з StaleDataError
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # SHA-256 оригінального файлу в контентно-адресованому сховищі (storage.py)
+    blob_sha256 = Column(String(64), nullable=True, index=True)
+    # Ключ масового імпорту (bulk.import_key); у книг, створених через API, — NULL
+    import_key = Column(String(64), nullable=True)
+
+    @property
+    def file_url(self):
+        # Оригінал віддає GET /books/{id}/file — той самий шлях і через gateway
+        return f"/books/{self.id}/file" if self.blob_sha256 else None
+
+    @property
+    def cover_version(self):
+        # ?v= для GET /books/{id}/cover: з поточною версією обкладинка кешується як незмінна
+        from .covers import cover_version
+        return cover_version(self)
+
+    # Індекси під keyset-пагінацію каталогу: (колонка сортування, id)
+    __table_args__ = (
+        Index("ix_books_title_id", "title", "id"),
+        Index("ix_books_author_id", "author", "id"),
+        Index("ix_books_year_id", "year", "id"),
+        # Пошук за префіксом назви (LIKE 'abc%') у Postgres з не-C локаллю
+        Index("ix_books_title_prefix", "title", postgresql_ops={"title": "text_pattern_ops"}),
+        # INSERT ... ON CONFLICT (import_key) масового імпорту; NULL-и не конфліктують
+        Index("uq_books_import_key", "import_key", unique=True),
+    )
+
+
+class BookSearchEntry(Base):
+    """Рядок повнотекстового індексу: page = 0 — метадані книги, page > 0 — сторінка контенту."""
+    __tablename__ = "book_search"
+
+    id = Column(Integer, primary_key=True)
+    book_id = Column(Integer, nullable=False)
+    page = Column(Integer, nullable=False)
+    document = Column(TSVECTOR().with_variant(Text(), "sqlite"), nullable=False)
+
+    __table_args__ = (
+        Index("ix_book_search_document", "document", postgresql_using="gin"),
+        Index("ix_book_search_book_page", "book_id", "page"),
+    )
+
+
+class Blob(Base):
+    """Оригінал книги у сховищі; refcount — кількість книг, що на нього посилаються."""
+    __tablename__ = "blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    kind = Column(String, nullable=False)  # pdf або txt
+    refcount = Column(Integer, nullable=False, default=0, server_default="0")
+    # Коли refcount впав до нуля; gc видаляє blob після пільгового періоду
+    released_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class IngestJobRecord(Base):
+    """Стан job витягання тексту — щоб його бачили всі воркери і після перезапуску."""
+    __tablename__ = "ingest_jobs"
+
+    id = Column(String(32), primary_key=True)
+    book_id = Column(Integer, nullable=False, index=True)
+    kind = Column(String, nullable=False)
+    status = Column(String, nullable=False)
+    total_pages = Column(Integer, nullable=True)
+    extracted_pages = Column(Integer, nullable=False, default=0, server_default="0")
+    error = Column(Text, nullable=True)
+    # Unix-час, як у відповіді GET /books/jobs/{id}; updated_at — heartbeat процесу, що веде job
+    created_at = Column(Float, nullable=False)
+    started_at = Column(Float, nullable=True)
+    finished_at = Column(Float, nullable=True)
+    updated_at = Column(Float, nullable=False)
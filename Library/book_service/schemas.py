@@ -13,6 +13,22 @@ class BookCreate(BookBase):
 
 class Book(BookBase):
     id: int
+    file_url: str | None = None
+    cover_version: str | None = None
 
     class Config:
         from_attributes = True
+
+class BookUpload(Book):
+    job_id: str
+
+class BookImport(BaseModel):
+    """Рядок масового імпорту; книга ідентифікується external_id, а без нього — парою (title, author)."""
+    external_id: str | None = None  # id книги в джерелі імпорту
+    title: str
+    author: str
+    description: str = ""
+    year: int
+    pages: int = 0
+    cover_url: str | None = None
+    file: str | None = None  # шлях до PDF/TXT — лише для CLI
@@ -0,0 +1,204 @@
+"""
+Повнотекстовий пошук по метаданих книг і тексту сторінок.
+
+Індекс — таблиця book_search з tsvector + GIN у Postgres: один рядок з метаданими
+(page = 0, вага title A, author B, description C) і по рядку на кожну сторінку
+контенту (вага D). Конфігурація "simple" не робить стемінгу, зате однаково
+працює з українським, російським і латинським текстом.
+
+Перебудувати індекс для вже завантажених книг: python -m book_service.search
+"""
+import os
+import re
+import sys
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import func, insert, literal
+from sqlalchemy.orm import Session
+
+from . import models
+from . import content as book_content
+
+SEARCH_CONFIG = os.getenv("SEARCH_CONFIG", "simple")
+SNIPPET_RADIUS = 80
+PAGE_HITS_PER_BOOK = 3
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class SearchUnavailable(Exception):
+    pass
+
+
+def is_supported(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def _vector(text, weight: str):
+    return func.setweight(func.to_tsvector(SEARCH_CONFIG, func.coalesce(text, "")), weight)
+
+
+def _metadata_vector(book):
+    return (
+        _vector(literal(book.title), "A")
+        .op("||")(_vector(literal(book.author), "B"))
+        .op("||")(_vector(literal(book.description), "C"))
+    )
+
+
+def index_book_metadata(db: Session, book: models.Book, commit: bool = True):
+    index_books_metadata(db, [book], commit=commit)
+
+
+def index_books_metadata(db: Session, books: Iterable, commit: bool = True):
+    """Переіндексовує метадані кількох книг: один DELETE і один багаторядковий INSERT."""
+    if not is_supported(db):
+        return
+    books = list(books)
+    if books:
+        db.query(models.BookSearchEntry).filter(
+            models.BookSearchEntry.page == 0,
+            models.BookSearchEntry.book_id.in_([book.id for book in books]),
+        ).delete(synchronize_session=False)
+        db.execute(insert(models.BookSearchEntry).values([
+            {"book_id": book.id, "page": 0, "document": _metadata_vector(book)} for book in books
+        ]))
+    if commit:
+        db.commit()
+
+
+def index_pages(db: Session, book_id: int, pages: Iterable[Tuple[int, str]], commit: bool = True):
+    """Додає в індекс сторінки (номер, текст) — викликається пакетами під час витягання тексту."""
+    if not is_supported(db):
+        return
+    rows = [
+        {"book_id": book_id, "page": number, "document": _vector(literal(text), "D")}
+        for number, text in pages
+    ]
+    if rows:
+        # Один багаторядковий INSERT на пакет сторінок
+        db.execute(insert(models.BookSearchEntry).values(rows))
+    if commit:
+        db.commit()
+
+
+def remove_book(db: Session, book_id: int, commit: bool = True):
+    if not is_supported(db):
+        return
+    db.query(models.BookSearchEntry).filter_by(book_id=book_id).delete()
+    if commit:
+        db.commit()
+
+
+def _snippet(text: str, terms: List[str]) -> str:
+    lowered = text.casefold()
+    pos = -1
+    for term in terms:
+        pos = lowered.find(term)
+        if pos != -1:
+            break
+    if pos == -1:
+        return text[:SNIPPET_RADIUS * 2].strip()
+    start = max(0, pos - SNIPPET_RADIUS)
+    end = min(len(text), pos + SNIPPET_RADIUS)
+    snippet = text[start:end].strip()
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(text) else "")
+
+
+def search(db: Session, q: str, limit: int = 20, offset: int = 0) -> List[dict]:
+    """
+    Книги за спаданням релевантності (сума ts_rank_cd по метаданих і сторінках),
+    для кожної — до PAGE_HITS_PER_BOOK найрелевантніших сторінок зі сніпетами.
+    """
+    if not is_supported(db):
+        raise SearchUnavailable("Full-text search requires PostgreSQL")
+    entry = models.BookSearchEntry
+    tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    rank = func.ts_rank_cd(entry.document, tsquery)
+    hits = (
+        db.query(entry.book_id, entry.page, rank.label("rank"))
+        .filter(entry.document.op("@@")(tsquery))
+        .subquery()
+    )
+    score = func.sum(hits.c.rank).label("score")
+    ranked = (
+        db.query(hits.c.book_id, score)
+        .group_by(hits.c.book_id)
+        .order_by(score.desc(), hits.c.book_id)
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+    if not ranked:
+        return []
+    book_ids = [row.book_id for row in ranked]
+
+    position = func.row_number().over(partition_by=hits.c.book_id, order_by=hits.c.rank.desc()).label("position")
+    page_hits = (
+        db.query(hits.c.book_id, hits.c.page, hits.c.rank, position)
+        .filter(hits.c.book_id.in_(book_ids), hits.c.page > 0)
+        .subquery()
+    )
+    pages_by_book = {}
+    for row in db.query(page_hits).filter(page_hits.c.position <= PAGE_HITS_PER_BOOK).all():
+        pages_by_book.setdefault(row.book_id, []).append(row)
+
+    books = {b.id: b for b in db.query(models.Book).filter(models.Book.id.in_(book_ids)).all()}
+    terms = [w.casefold() for w in _WORD_RE.findall(q)]
+    results = []
+    for row in ranked:
+        book = books.get(row.book_id)
+        if book is None:
+            continue
+        page_results = []
+        for hit in sorted(pages_by_book.get(row.book_id, []), key=lambda h: -h.rank):
+            try:
+                text = book_content.read_pages(row.book_id, hit.page, 1)
+            except book_content.ContentNotFound:
+                text = []
+            page_results.append({
+                "page": hit.page,
+                "rank": hit.rank,
+                "snippet": _snippet(text[0], terms) if text else "",
+            })
+        results.append({
+            "book": {
+                "id": book.id,
+                "title": book.title,
+                "author": book.author,
+                "year": book.year,
+                "cover_url": book.cover_url,
+            },
+            "score": row.score,
+            "pages": page_results,
+        })
+    return results
+
+
+def reindex_book(db: Session, book: models.Book, batch_size: int = 200):
+    remove_book(db, book.id, commit=False)
+    index_book_metadata(db, book, commit=False)
+    try:
+        total = book_content.page_count(book.id)
+    except book_content.ContentNotFound:
+        total = 0
+    for start in range(1, total + 1, batch_size):
+        pages = book_content.read_pages(book.id, start, batch_size)
+        index_pages(db, book.id, zip(range(start, start + len(pages)), pages), commit=False)
+    db.commit()
+
+
+def main(argv: List[str]):
+    from .database import SessionLocal
+
+    with SessionLocal() as db:
+        query = db.query(models.Book)
+        if argv:
+            query = query.filter(models.Book.id.in_([int(a) for a in argv]))
+        for book in query.order_by(models.Book.id).all():
+            reindex_book(db, book)
+            print(f"Reindexed book {book.id}: {book.title}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
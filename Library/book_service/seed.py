@@ -0,0 +1,49 @@
+"""
+Демо-каталог для порожньої бази. Запускається явно після міграцій, а не при
+старті сервісу:
+
+    python -m book_service.seed
+"""
+import sys
+
+from . import models
+from .database import SessionLocal
+
+SAMPLE_BOOKS = [
+    dict(
+        title="1984",
+        author="Джордж Оруэлл",
+        description="Антиутопия о тоталитарном будущем.",
+        year=1949,
+        pages=328,
+        cover_url="https://covers.openlibrary.org/b/id/7222246-L.jpg",
+    ),
+    dict(
+        title="Мастер и Маргарита",
+        author="Михаил Булгаков",
+        description="Мистический роман о добре и зле.",
+        year=1967,
+        pages=480,
+        cover_url="https://covers.openlibrary.org/b/id/8231856-L.jpg",
+    ),
+]
+
+
+def seed_books(db) -> int:
+    """Додає демо-книги, лише якщо каталог порожній; повертає кількість доданих."""
+    if db.query(models.Book).first():
+        return 0
+    db.add_all([models.Book(**fields) for fields in SAMPLE_BOOKS])
+    db.commit()
+    return len(SAMPLE_BOOKS)
+
+
+def main() -> int:
+    with SessionLocal() as db:
+        added = seed_books(db)
+    print(f"book_service: seeded {added} book(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""
+Контентно-адресоване сховище оригіналів книг.
+
+Файл зберігається один раз під своїм SHA-256 (blobs/ab/abcdef...), а таблиця blobs
+рахує, скільки книг на нього посилаються. Видалення книги лише зменшує лічильник;
+самі файли прибирає окремий збирач сміття:
+
+    python -m book_service.storage gc [--grace 3600]
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO, List, Optional, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import metrics, models, tracing
+from . import content as book_content
+
+BLOB_DIR = os.getenv("BLOB_DIR", os.path.join(book_content.UPLOAD_DIR, "blobs"))
+# Blob без посилань видаляється не раніше ніж через стільки секунд
+BLOB_GC_GRACE = int(os.getenv("BLOB_GC_GRACE", "3600"))
+_TMP_DIR = "tmp"
+
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(BLOB_DIR, sha256[:2], sha256)
+
+
+def kind_for(filename: str) -> str:
+    return "pdf" if filename.lower().endswith(".pdf") else "txt"
+
+
+@tracing.traced("storage.write_temp")
+def write_temp(src: BinaryIO, chunk_size: int = book_content.CHUNK_SIZE) -> Tuple[str, str, int]:
+    """
+    Потоком записує файл у тимчасовий каталог сховища, паралельно рахуючи SHA-256.
+    Повертає (sha256, шлях до тимчасового файлу, розмір).
+    """
+    tmp_dir = os.path.join(BLOB_DIR, _TMP_DIR)
+    os.makedirs(tmp_dir, exist_ok=True)
+    started = time.perf_counter()
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as dst:
+            while chunk := src.read(chunk_size):
+                digest.update(chunk)
+                dst.write(chunk)
+                size += len(chunk)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    metrics.UPLOAD_DURATION.observe(time.perf_counter() - started)
+    metrics.UPLOAD_BYTES.inc(size)
+    return digest.hexdigest(), tmp_path, size
+
+
+def _acquire_stmt(dialect_name: str, sha256: str, size: int, kind: str):
+    dialect = postgresql if dialect_name == "postgresql" else sqlite
+    stmt = dialect.insert(models.Blob).values(sha256=sha256, size=size, kind=kind, refcount=1)
+    return stmt.on_conflict_do_update(
+        index_elements=["sha256"],
+        set_={"refcount": models.Blob.refcount + 1, "released_at": None},
+    )
+
+
+def acquire(db: Session, sha256: str, size: int, kind: str):
+    """+1 посилання на blob (створює рядок, якщо його ще немає). Без коміту."""
+    db.execute(_acquire_stmt(db.get_bind().dialect.name, sha256, size, kind))
+
+
+def release(db: Session, sha256: Optional[str]):
+    """-1 посилання; коли лічильник доходить до нуля, blob стає кандидатом для gc. Без коміту."""
+    if not sha256:
+        return
+    db.execute(
+        update(models.Blob)
+        .where(models.Blob.sha256 == sha256)
+        .values(refcount=models.Blob.refcount - 1)
+    )
+    db.execute(
+        update(models.Blob)
+        .where(models.Blob.sha256 == sha256, models.Blob.refcount <= 0, models.Blob.released_at.is_(None))
+        .values(released_at=datetime.now(timezone.utc))
+    )
+
+
+def attach(db: Session, book: models.Book, src: BinaryIO, filename: str) -> models.Blob:
+    """
+    Зберігає оригінал книги у сховищі і записує посилання в book.blob_sha256
+    (попередній blob книги звільняється). Рядок blobs комітиться раніше, ніж файл
+    з'являється на місці: gc видаляє файл, тримаючи блокування рядка, тож не може
+    прибрати щойно доданий blob.
+    """
+    sha256, tmp_path, size = write_temp(src)
+    try:
+        previous = book.blob_sha256
+        acquire(db, sha256, size, kind_for(filename))
+        book.blob_sha256 = sha256
+        book.version = models.Book.version + 1
+        release(db, previous)
+        db.commit()
+        path = blob_path(sha256)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+    except BaseException:
+        db.rollback()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return db.get(models.Blob, sha256)
+
+
+def extracted_source(db: Session, sha256: str, exclude_book_id: int) -> Optional[models.Book]:
+    """
+    Інша книга з тим самим оригіналом, для якої текст уже повністю витягнутий:
+    її остання ingest job завершилась успішно (done), а не обірвалась на півдорозі.
+    """
+    candidates = db.scalars(
+        select(models.Book)
+        .where(models.Book.blob_sha256 == sha256, models.Book.id != exclude_book_id, models.Book.pages > 0)
+        .order_by(models.Book.id)
+    )
+    for book in candidates:
+        last_job = db.scalars(
+            select(models.IngestJobRecord.status)
+            .where(models.IngestJobRecord.book_id == book.id)
+            .order_by(models.IngestJobRecord.created_at.desc())
+            .limit(1)
+        ).first()
+        if last_job != "done":
+            continue
+        if os.path.exists(book_content.content_path(book.id)) and not book_content.is_writing(book.id):
+            return book
+    return None
+
+
+def collect_garbage(db: Session, grace: int = BLOB_GC_GRACE) -> List[str]:
+    """Видаляє blob-и без посилань, звільнені понад grace секунд тому, і старі тимчасові файли."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=grace)
+    removed = []
+    candidates = db.scalars(
+        select(models.Blob.sha256).where(models.Blob.refcount <= 0, models.Blob.released_at < cutoff)
+    ).all()
+    for sha256 in candidates:
+        # Рядок видаляється і файл прибирається в одній транзакції: паралельний
+        # acquire чекає на блокування і після коміту створить рядок заново
+        deleted = db.execute(
+            delete(models.Blob)
+            .where(models.Blob.sha256 == sha256, models.Blob.refcount <= 0)
+            .returning(models.Blob.sha256)
+        ).first()
+        if deleted is not None:
+            try:
+                os.remove(blob_path(sha256))
+            except FileNotFoundError:
+                pass
+            removed.append(sha256)
+        db.commit()
+
+    tmp_dir = os.path.join(BLOB_DIR, _TMP_DIR)
+    if os.path.isdir(tmp_dir):
+        for name in os.listdir(tmp_dir):
+            path = os.path.join(tmp_dir, name)
+            if os.path.getmtime(path) < time.time() - grace:
+                os.remove(path)
+    return removed
+
+
+def main(argv: List[str]):
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(prog="python -m book_service.storage")
+    commands = parser.add_subparsers(dest="command", required=True)
+    gc = commands.add_parser("gc", help="remove unreferenced blobs")
+    gc.add_argument("--grace", type=int, default=BLOB_GC_GRACE, help="seconds since release")
+    args = parser.parse_args(argv)
+
+    with SessionLocal() as db:
+        removed = collect_garbage(db, args.grace)
+    for sha256 in removed:
+        print(f"Removed blob {sha256}")
+    print(f"{len(removed)} blob(s) removed")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
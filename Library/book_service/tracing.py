@@ -0,0 +1,12 @@
+"""Трасування book_service; реалізація — common.tracing."""
+from common.tracing import (  # noqa: F401
+    CLIENT, INTERNAL, SERVER, Tracer, current_span, format_traceparent, parse_traceparent, run_in_context,
+)
+
+SERVICE = "book_service"
+tracer = Tracer(SERVICE)
+processor = tracer.processor
+start_span = tracer.start_span
+traced = tracer.traced
+instrument_app = tracer.instrument_app
+set_exporter = tracer.set_exporter
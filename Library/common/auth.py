@@ -0,0 +1,8 @@
+"""
+Налаштування JWT, спільні для user_service (видає токени) і api_gateway
+(перевіряє їх локально): секрет і алгоритм мусять збігатися.
+"""
+import os
+
+JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your_secret_key")
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
@@ -0,0 +1,87 @@
+"""
+Підключення сервісу до бази: пул з'єднань з налаштуваннями з env, метрики пулу,
+трасування SQL і необов'язковий async-режим (DB_ASYNC=1, SQLAlchemy asyncio).
+Кожен сервіс створює свій Database(url, metrics, tracer) у власному database.py.
+"""
+import os
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+# Налаштування пулу з'єднань (для обох режимів — sync і async)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1").lower() in ("1", "true", "yes")
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))  # 0 — без обмеження
+
+# DB_ASYNC=1 — гарячі ендпоінти працюють через SQLAlchemy asyncio + asyncpg
+DB_ASYNC = os.getenv("DB_ASYNC", "0").lower() in ("1", "true", "yes")
+
+
+def async_url(url: str) -> str:
+    return (
+        url.replace("postgresql://", "postgresql+asyncpg://", 1)
+        .replace("postgresql+psycopg2://", "postgresql+asyncpg://", 1)
+        .replace("sqlite://", "sqlite+aiosqlite://", 1)
+    )
+
+
+def engine_options(url: str, metrics, is_async: bool = False) -> dict:
+    if url.startswith("sqlite"):
+        return {}
+    options = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        # Пул, що міряє час очікування з'єднання (db_pool_checkout_wait_seconds у /metrics)
+        "poolclass": metrics.timed_pool(is_async),
+    }
+    if DB_STATEMENT_TIMEOUT_MS:
+        if is_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+
+class Database:
+    """
+    Sync-engine і фабрика сесій сервісу; з DB_ASYNC — ще й async-engine
+    (ASYNC_DATABASE_URL або DATABASE_URL з async-драйвером).
+    metrics — common.metrics.ServiceMetrics, tracer — common.tracing.Tracer.
+    """
+
+    def __init__(self, url: str, metrics, tracer):
+        self.url = url
+        self.engine = create_engine(url, **engine_options(url, metrics))
+        self.SessionLocal = sessionmaker(bind=self.engine, autoflush=False, autocommit=False)
+        metrics.instrument_engine(self.engine, "sync")
+        tracer.instrument_engine(self.engine)
+
+        self.async_url = os.getenv("ASYNC_DATABASE_URL") or async_url(url)
+        self.async_engine = None
+        self.AsyncSessionLocal = None
+        if DB_ASYNC:
+            from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+            self.async_engine = create_async_engine(
+                self.async_url, **engine_options(self.async_url, metrics, is_async=True)
+            )
+            self.AsyncSessionLocal = async_sessionmaker(bind=self.async_engine, autoflush=False, expire_on_commit=False)
+            metrics.instrument_engine(self.async_engine.sync_engine, "async")
+            tracer.instrument_engine(self.async_engine.sync_engine)
+
+
+async def run_db(db, sync_fn, async_fn, *args, **kwargs):
+    """
+    Виконує CRUD-функцію у поточному режимі: з AsyncSession — async-версію напряму,
+    з звичайною Session — sync-версію у пулі потоків, щоб не блокувати event loop.
+    """
+    if not isinstance(db, Session):
+        return await async_fn(db, *args, **kwargs)
+    return await run_in_threadpool(sync_fn, db, *args, **kwargs)
@@ -0,0 +1,46 @@
+"""
+Content-Encoding і ETag, спільні для book_service (стискає відповіді) і api_gateway
+(кешує їх окремо для кожного кодування): обидва однаково розбирають Accept-Encoding
+та If-None-Match.
+"""
+from typing import Iterable, Optional
+
+# Кодування, які gateway запитує в book_service, у порядку переваги
+CACHE_ENCODINGS = ("br", "gzip")
+
+
+def choose_encoding(accept_encoding: Optional[str], available: Iterable[str]) -> Optional[str]:
+    """Найкраще кодування з available, яке клієнт приймає (з урахуванням q=0). None — без стиснення."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def preferred_encoding(accept_encoding: Optional[str]) -> str:
+    """Зводить Accept-Encoding клієнта до одного з br/gzip/identity — це частина ключа кешу gateway."""
+    return choose_encoding(accept_encoding, CACHE_ENCODINGS) or "identity"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
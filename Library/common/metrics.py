@@ -0,0 +1,142 @@
+"""
+Спільні метрики Prometheus для всіх сервісів: латентність HTTP за шаблоном
+маршруту, запити в обробці, стан пулу з'єднань БД і /metrics.
+
+Кожен сервіс створює свій ServiceMetrics(назва) у власному metrics.py і додає
+там метрики, специфічні для сервісу, у його реєстр.
+"""
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, GC_COLLECTOR, PLATFORM_COLLECTOR, PROCESS_COLLECTOR,
+    CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+)
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: латентність за шаблоном маршруту (/books/{book_id}, а не /books/5)
+    і кількість запитів в обробці. Час рахується до кінця відповіді, включно зі стрімінгом.
+    """
+
+    def __init__(self, app, metrics: "ServiceMetrics"):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        service = self.metrics.service
+        in_flight = self.metrics.requests_in_flight.labels(service)
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            if scope["path"] != "/metrics":
+                self.metrics.request_latency.labels(service, scope["method"], path, str(status)).observe(
+                    time.perf_counter() - started
+                )
+
+
+class ServiceMetrics:
+    """
+    Метрики одного сервісу у власному реєстрі: кілька сервісів можуть працювати
+    в одному процесі (бенчмарк), і /metrics кожного показує лише своє.
+    """
+
+    def __init__(self, service: str):
+        self.service = service
+        self.registry = CollectorRegistry()
+        for collector in (PROCESS_COLLECTOR, PLATFORM_COLLECTOR, GC_COLLECTOR):
+            self.registry.register(collector)
+        self.request_latency = Histogram(
+            "http_request_duration_seconds",
+            "HTTP request latency by route template",
+            ["service", "method", "route", "status"],
+            registry=self.registry,
+        )
+        self.requests_in_flight = Gauge(
+            "http_requests_in_flight", "HTTP requests being processed", ["service"], registry=self.registry,
+        )
+        self._db_pool = None
+
+    def instrument_app(self, app):
+        app.add_middleware(MetricsMiddleware, metrics=self)
+        app.add_route("/metrics", self.metrics_endpoint, include_in_schema=False)
+
+    async def metrics_endpoint(self, request: Request) -> Response:
+        return Response(generate_latest(self.registry), media_type=CONTENT_TYPE_LATEST)
+
+    # --- пул з'єднань SQLAlchemy (лише для сервісів з базою) ---
+
+    def _pool_metrics(self) -> dict:
+        if self._db_pool is None:
+            labels = ["service", "engine"]
+            self._db_pool = {
+                "wait": Histogram(
+                    "db_pool_checkout_wait_seconds",
+                    "Time spent waiting for a connection from the SQLAlchemy pool",
+                    labels,
+                    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+                    registry=self.registry,
+                ),
+                "checkouts": Counter(
+                    "db_pool_checkouts_total", "Connections checked out of the pool", labels, registry=self.registry,
+                ),
+                "checked_out": Gauge(
+                    "db_pool_checked_out", "Connections currently checked out", labels, registry=self.registry,
+                ),
+                "size": Gauge("db_pool_size", "Connections held by the pool", labels, registry=self.registry),
+                "overflow": Gauge("db_pool_overflow", "Overflow connections in use", labels, registry=self.registry),
+            }
+        return self._db_pool
+
+    def timed_pool(self, is_async: bool = False):
+        """Клас пулу (QueuePool або AsyncAdaptedQueuePool), що міряє час очікування вільного з'єднання."""
+        from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+        observe = self._pool_metrics()["wait"].labels(self.service, "async" if is_async else "sync").observe
+        base = AsyncAdaptedQueuePool if is_async else QueuePool
+
+        class TimedQueuePool(base):
+            def _do_get(self):
+                started = time.perf_counter()
+                try:
+                    return super()._do_get()
+                finally:
+                    observe(time.perf_counter() - started)
+
+        return TimedQueuePool
+
+    def instrument_engine(self, engine, engine_name: str):
+        """Лічильники видачі з'єднань і gauges стану пулу для /metrics."""
+        from sqlalchemy import event
+
+        metrics = self._pool_metrics()
+        pool = engine.pool
+        metrics["checked_out"].labels(self.service, engine_name).set_function(
+            lambda: getattr(engine.pool, "checkedout", int)()
+        )
+        if hasattr(pool, "size") and hasattr(pool, "overflow"):
+            metrics["size"].labels(self.service, engine_name).set_function(lambda: engine.pool.size())
+            metrics["overflow"].labels(self.service, engine_name).set_function(lambda: max(engine.pool.overflow(), 0))
+        checkouts = metrics["checkouts"].labels(self.service, engine_name)
+
+        @event.listens_for(engine, "checkout")
+        def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+            checkouts.inc()
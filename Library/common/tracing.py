@@ -0,0 +1,403 @@
+"""
+Розподілене трасування з контекстом W3C traceparent — спільне для всіх сервісів.
+Кожен сервіс створює свій Tracer(назва) у власному tracing.py.
+
+Спани пишуться у форматі OTLP/JSON: у файл (працює офлайн, файл можна
+відтворити через otlpjsonfile receiver колектора) або на OTLP/HTTP endpoint.
+Рішення про вибірку приймає перший сервіс у ланцюжку (TRACE_SAMPLE_RATE),
+решта йдуть за прапорцем sampled із traceparent.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from functools import wraps
+from typing import List, NamedTuple, Optional
+
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+# file | otlp | none
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "file")
+# За замовчуванням traces/<сервіс>.jsonl
+TRACE_FILE = os.getenv("TRACE_FILE")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "10000"))
+TRACE_BATCH_SIZE = int(os.getenv("TRACE_BATCH_SIZE", "512"))
+TRACE_FLUSH_INTERVAL = float(os.getenv("TRACE_FLUSH_INTERVAL", "2"))
+# Довші SQL-запити обрізаються в атрибуті спану
+STATEMENT_MAX_LENGTH = 500
+
+logger = logging.getLogger(__name__)
+
+# Значення kind з OTLP
+INTERNAL, SERVER, CLIENT = 1, 2, 3
+
+
+class SpanContext(NamedTuple):
+    """Батьківський контекст, отриманий з заголовка traceparent."""
+    trace_id: str
+    span_id: str
+    sampled: bool
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "sampled",
+                 "start_ns", "end_ns", "attributes", "error", "processor")
+
+    def __init__(self, name: str, kind: int, trace_id: str, parent_id: Optional[str], sampled: bool,
+                 attributes=None, processor=None):
+        self.trace_id = trace_id
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.sampled = sampled
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+        # Експорт іде через процесор сервісу, що створив спан
+        self.processor = processor
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def set_error(self, message: str):
+        self.error = message
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            if self.sampled and self.processor is not None:
+                self.processor.put(self)
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+def _new_id(size: int) -> str:
+    value = 0
+    while not value:
+        value = random.getrandbits(size * 8)
+    return f"{value:0{size * 2}x}"
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[SpanContext]:
+    # version-trace_id-span_id-flags; некоректний заголовок ігнорується, трейс починається заново
+    if not header:
+        return None
+    parts = header.strip().lower().split("-")
+    if len(parts) < 4 or len(parts[0]) != 2 or parts[0] == "ff":
+        return None
+    version, trace_id, span_id, flags = parts[:4]
+    if version == "00" and len(parts) != 4:
+        return None
+    if len(trace_id) != 32 or len(span_id) != 16 or len(flags) != 2:
+        return None
+    try:
+        if int(trace_id, 16) == 0 or int(span_id, 16) == 0:
+            return None
+        sampled = bool(int(flags, 16) & 1)
+    except ValueError:
+        return None
+    return SpanContext(trace_id, span_id, sampled)
+
+
+def format_traceparent(span) -> str:
+    return f"00-{span.trace_id}-{span.span_id}-{'01' if span.sampled else '00'}"
+
+
+def run_in_context(executor, fn, *args):
+    """executor.submit, що переносить поточний трейс у потік виконавця."""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+def _attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        encoded = {"boolValue": value}
+    elif isinstance(value, int):
+        encoded = {"intValue": str(value)}
+    elif isinstance(value, float):
+        encoded = {"doubleValue": value}
+    else:
+        encoded = {"stringValue": str(value)}
+    return {"key": key, "value": encoded}
+
+
+def encode_otlp(spans: List[Span], service: str) -> dict:
+    """Тіло ExportTraceServiceRequest у JSON-кодуванні OTLP."""
+    encoded = []
+    for span in spans:
+        item = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": span.kind,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [_attribute(k, v) for k, v in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            item["parentSpanId"] = span.parent_id
+        encoded.append(item)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [_attribute("service.name", service)]},
+        "scopeSpans": [{"scope": {"name": "library.tracing"}, "spans": encoded}],
+    }]}
+
+
+class FileExporter:
+    """Один рядок OTLP/JSON на пакет спанів."""
+
+    def __init__(self, path: str, service: str):
+        self.path = path
+        self.service = service
+
+    def export(self, spans: List[Span]):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        line = json.dumps(encode_otlp(spans, self.service), ensure_ascii=False, separators=(",", ":"))
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class OtlpHttpExporter:
+    """POST на OTLP/HTTP endpoint колектора (application/json)."""
+
+    def __init__(self, endpoint: str, service: str, timeout: float = 5):
+        self.endpoint = endpoint
+        self.service = service
+        self.timeout = timeout
+
+    def export(self, spans: List[Span]):
+        body = json.dumps(encode_otlp(spans, self.service)).encode()
+        request = urllib.request.Request(
+            self.endpoint, data=body, method="POST", headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+_STOP = object()
+
+
+class BatchProcessor:
+    """
+    Обмежена черга і фоновий потік, що віддає спани експортеру пакетами.
+    Запити ніколи не чекають експорту: коли черга повна, спан відкидається.
+    """
+
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=TRACE_QUEUE_SIZE)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def put(self, span: Span):
+        if self.exporter is None:
+            return
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="trace-export", daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            stop = item is _STOP
+            batch = [] if stop else [item]
+            deadline = time.monotonic() + TRACE_FLUSH_INTERVAL
+            while not stop and len(batch) < TRACE_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+            if batch:
+                self._export(batch)
+
+    def _export(self, batch: List[Span]):
+        try:
+            self.exporter.export(batch)
+            self.exported += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.warning("Trace export failed: %s", e)
+
+    def shutdown(self, timeout: float = 5):
+        """Дописує все, що лишилось у черзі (викликається при завершенні процесу)."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "sample_rate": TRACE_SAMPLE_RATE,
+            "queued": self._queue.qsize(),
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+def _default_exporter(service: str):
+    if TRACE_EXPORTER == "file":
+        return FileExporter(TRACE_FILE or os.path.join("traces", f"{service}.jsonl"), service)
+    if TRACE_EXPORTER == "otlp":
+        return OtlpHttpExporter(TRACE_OTLP_ENDPOINT, service)
+    return None
+
+
+class TracingMiddleware:
+    """ASGI-middleware: серверний спан на запит, батько — з вхідного traceparent."""
+
+    def __init__(self, app, tracer: "Tracer"):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+        parent = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                parent = parse_traceparent(value.decode("latin-1"))
+                break
+        method = scope["method"]
+        with self.tracer.start_span(f"{method} {scope['path']}", SERVER, parent,
+                                    **{"http.method": method, "http.target": scope["path"]}) as span:
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.set_error(f"HTTP {message['status']}")
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                if getattr(route, "path", None):
+                    span.name = f"{method} {route.path}"
+                    span.set_attribute("http.route", route.path)
+
+
+class Tracer:
+    """
+    Трасування одного сервісу: власний процесор експорту, тож спани мають
+    service.name свого сервісу, навіть коли кілька сервісів працюють в одному процесі.
+    Експортер потрібен і при TRACE_SAMPLE_RATE=0: вибрані трейси приходять від gateway.
+    """
+
+    def __init__(self, service: str, exporter=None):
+        self.service = service
+        self.processor = BatchProcessor(exporter or _default_exporter(service))
+        atexit.register(self.processor.shutdown)
+
+    def set_exporter(self, exporter):
+        """Підміняє експортер (будь-який об'єкт з методом export(spans)); None вимикає експорт."""
+        self.processor.exporter = exporter
+
+    def _start(self, name: str, kind: int, parent, attributes) -> Span:
+        if parent is None:
+            sampled = TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE
+            return Span(name, kind, _new_id(16), None, sampled, attributes, self.processor)
+        return Span(name, kind, parent.trace_id, parent.span_id, parent.sampled, attributes, self.processor)
+
+    @contextmanager
+    def start_span(self, name: str, kind: int = INTERNAL, parent=None, **attributes):
+        """
+        Спан як дочірній до parent або до поточного. Без батька починається новий
+        трейс із вибіркою TRACE_SAMPLE_RATE. Виняток позначає спан як помилковий.
+        """
+        span = self._start(name, kind, parent or _current.get(), attributes)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_error(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            _current.reset(token)
+            span.end()
+
+    def traced(self, name: str):
+        """Декоратор для синхронних функцій: спан лише всередині вибраного трейсу."""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                parent = _current.get()
+                if parent is None or not parent.sampled:
+                    return fn(*args, **kwargs)
+                with self.start_span(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def instrument_app(self, app):
+        app.add_middleware(TracingMiddleware, tracer=self)
+
+    def instrument_engine(self, engine):
+        """Спан на кожен SQL-запит усередині вибраного трейсу."""
+        from sqlalchemy import event
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            parent = _current.get()
+            if context is None or parent is None or not parent.sampled:
+                return
+            context._trace_span = self._start("db.query", CLIENT, parent, {
+                "db.system": conn.dialect.name,
+                "db.statement": statement[:STATEMENT_MAX_LENGTH],
+            })
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            span = getattr(context, "_trace_span", None)
+            if span is not None:
+                span.set_attribute("db.rows", cursor.rowcount)
+                span.end()
+
+        @event.listens_for(engine, "handle_error")
+        def _error(exception_context):
+            span = getattr(exception_context.execution_context, "_trace_span", None)
+            if span is not None:
+                span.set_error(str(exception_context.original_exception))
+                span.end()
@@ -1,4 +1,4 @@
-import React, { useMemo } from 'react';
+import React, { useEffect, useMemo, useState } from 'react';
 import { Paper, Typography, Box } from '@mui/material';
 
 interface BookCoverProps {
@@ -24,6 +24,10 @@ const BookCover: React.FC<BookCoverProps> = ({
   height = 400,
   coverUrl,
 }) => {
+  /* обкладинка, що не завантажилась, замінюється згенерованою */
+  const [failed, setFailed] = useState(false);
+  useEffect(() => setFailed(false), [coverUrl]);
+
   /* ---------- фон ---------- */
   const coverGradient = useMemo(() => {
     /* детерміновано зсуваємо відтінок навколо синього */
@@ -41,7 +45,7 @@ const BookCover: React.FC<BookCoverProps> = ({
     backgroundSize: '12px 12px',
   }), []);
 
-  if (coverUrl) {
+  if (coverUrl && !failed) {
     return (
       <Paper
         elevation={6}
@@ -54,6 +58,8 @@ const BookCover: React.FC<BookCoverProps> = ({
         <img
           src={coverUrl}
           alt={title}
+          loading="lazy"
+          onError={() => setFailed(true)}
           style={{ width: '100%', height: '100%', objectFit: 'cover', display: 'block' }}
         />
       </Paper>
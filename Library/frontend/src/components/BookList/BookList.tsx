@@ -22,7 +22,7 @@ import {
   TextField
 } from '@mui/material';
 import { Book } from '../../types/book';
-import { getBooks } from '../../services/api';
+import { bookCoverUrl, getBooks } from '../../services/api';
 import { readingService } from '../../services/ReadingService';
 import BookCover from '../BookCover';
 import { addBookWithFile, deleteBook } from '../../services/BookService';
@@ -273,7 +273,7 @@ const BookList: React.FC = () => {
                             author={book.author} 
                             subtitle={book.genre} 
                             year={book.publicationYear || book.year} 
-                            coverUrl={(book as any).cover_url || book.coverImage} 
+                            coverUrl={bookCoverUrl(book.id, 'm', book.cover_version)} 
                             height={300} 
                           />
                         </Box>
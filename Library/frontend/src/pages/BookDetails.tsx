@@ -12,7 +12,7 @@ import {
 } from '@mui/material';
 import { ArrowBack } from '@mui/icons-material';
 import { Book } from '../types/book';
-import { getBookById } from '../services/api';
+import { bookCoverUrl, getBookById } from '../services/api';
 import { readingService } from '../services/ReadingService';
 import BookCover from '../components/BookCover';
 
@@ -104,7 +104,7 @@ const BookDetails: React.FC = () => {
                   author={book.author}
                   subtitle={book.genre}
                   year={book.publicationYear || book.year}
-                  coverUrl={(book as any).cover_url || book.coverImage}
+                  coverUrl={bookCoverUrl(book.id, 'l', book.cover_version)}
                   height={400}
                 />
                 <Box sx={{ mt: 3, width: '100%' }}>
@@ -59,6 +59,11 @@ export const getBooks = async (filters?: { author?: string; genre?: string; year
   }
 };
 
+// Зменшена обкладинка через book_service (кешується на диску і в браузері).
+// version — cover_version книги: з ним відповідь незмінна і браузер не перепитує її рік
+export const bookCoverUrl = (id: string | number, size: 's' | 'm' | 'l' = 'm', version?: string | null) =>
+  `${API_BASE_URL}/books/${id}/cover?size=${size}${version ? `&v=${encodeURIComponent(version)}` : ''}`;
+
 export const getBookById = async (id: string) => {
   try {
     const response = await api.get(`/books/${id}`);
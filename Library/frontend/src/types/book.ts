@@ -1,5 +1,6 @@
 export interface Book {
   cover_url?: string; // optional, matches backend and allows fallback
+  cover_version?: string | null; // версія обкладинки для ?v= (bookCoverUrl)
   id: string;
   title: string;
   author: string;
@@ -0,0 +1,27 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from reading_service import crud, schemas
+
+# Async-версії функцій з crud.py для режиму DB_ASYNC; запити ті самі
+
+async def upsert_reading_progress(db: AsyncSession, progress: schemas.ReadingStart):
+    # Upsert і статистики — одна транзакція з кількома залежними запитами; виконуємо sync-версію в greenlet
+    book_pages = {progress.book_id: progress.total_pages} if progress.total_pages else None
+    await db.run_sync(crud.upsert_progress_batch, [(progress.user_id, progress.book_id, progress.page)], book_pages)
+    return await get_progress(db, progress.user_id, progress.book_id)
+
+async def get_user_progress(db: AsyncSession, user_id: str):
+    return (await db.scalars(crud.user_progress_query(user_id))).all()
+
+async def get_progress(db: AsyncSession, user_id: str, book_id: int):
+    return (await db.scalars(crud.progress_query(user_id, book_id))).first()
+
+async def get_progress_batch(db: AsyncSession, keys: list[tuple[str, int]]):
+    if not keys:
+        return []
+    return (await db.scalars(crud.progress_batch_query(keys))).all()
+
+async def get_book_stats(db: AsyncSession, book_id: int):
+    return (await db.scalars(crud.book_stats_query(book_id))).first()
+
+async def get_popular_books(db: AsyncSession, by: str, limit: int):
+    return (await db.scalars(crud.popular_books_query(by, limit))).all()
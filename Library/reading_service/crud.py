@@ -1,24 +1,88 @@
+from collections import Counter
+
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
-from reading_service import models, schemas
+from reading_service import models, schemas, stats
 
 def upsert_reading_progress(db: Session, progress: schemas.ReadingStart):
-    db_progress = db.query(models.ReadingProgress).filter_by(
-        user_id=progress.user_id, book_id=progress.book_id
-    ).first()
-
-    if db_progress:
-        db_progress.current_page = progress.page
-    else:
-        db_progress = models.ReadingProgress(
-            user_id=progress.user_id,
-            book_id=progress.book_id,
-            current_page=progress.page
-        )
-        db.add(db_progress)
+    book_pages = {progress.book_id: progress.total_pages} if progress.total_pages else None
+    upsert_progress_batch(db, [(progress.user_id, progress.book_id, progress.page)], book_pages)
+    return get_progress(db, progress.user_id, progress.book_id)
 
-    db.commit()
-    db.refresh(db_progress)
-    return db_progress
+# Запити будуються окремо, щоб ними користувались і sync-, і async-CRUD (async_crud.py)
+def user_progress_query(user_id: str):
+    return select(models.ReadingProgress).filter_by(user_id=user_id)
+
+def progress_query(user_id: str, book_id: int):
+    # Точковий пошук по унікальному індексу (user_id, book_id)
+    return select(models.ReadingProgress).filter_by(user_id=user_id, book_id=book_id)
+
+def progress_batch_query(keys: list[tuple[str, int]]):
+    return select(models.ReadingProgress).filter(
+        tuple_(models.ReadingProgress.user_id, models.ReadingProgress.book_id).in_(keys)
+    )
+
+def progress_upsert_stmt(dialect_name: str, entries: list[tuple[str, int, int]]):
+    """
+    Один INSERT ... ON CONFLICT (user_id, book_id) DO UPDATE на весь пакет (user_id, book_id, page).
+    RETURNING віддає стару сторінку (previous_page; NULL — новий рядок) для статистик.
+    """
+    dialect = postgresql if dialect_name == "postgresql" else sqlite
+    table = models.ReadingProgress
+    stmt = dialect.insert(table).values([
+        {"user_id": user_id, "book_id": book_id, "current_page": page}
+        for user_id, book_id, page in entries
+    ])
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id", "book_id"],
+        set_={
+            "current_page": stmt.excluded.current_page,
+            "previous_page": func.coalesce(table.current_page, 0),
+        },
+    ).returning(table.user_id, table.book_id, table.previous_page, table.current_page)
 
 def get_user_progress(db: Session, user_id: str):
-    return db.query(models.ReadingProgress).filter_by(user_id=user_id).all()
+    return db.scalars(user_progress_query(user_id)).all()
+
+def get_progress(db: Session, user_id: str, book_id: int):
+    return db.scalars(progress_query(user_id, book_id)).first()
+
+def get_progress_batch(db: Session, keys: list[tuple[str, int]]):
+    if not keys:
+        return []
+    return db.scalars(progress_batch_query(keys)).all()
+
+def upsert_progress_batch(db: Session, entries: list[tuple[str, int, int]], book_pages: dict | None = None,
+                          activity: Counter | None = None):
+    """
+    Пакетний upsert прогресу разом зі статистиками книг в одній транзакції.
+    book_pages — відомі кількості сторінок книг, activity — скільки оновлень
+    прогресу злито в пакет по кожній книзі (за замовчуванням по одному на запис).
+    """
+    if not entries:
+        return
+    changes = db.execute(progress_upsert_stmt(db.get_bind().dialect.name, entries)).all()
+    if activity is None:
+        activity = Counter(book_id for _, book_id, _ in entries)
+    stats.apply_progress(db, changes, book_pages or {}, activity)
+    db.commit()
+
+def book_stats_query(book_id: int):
+    return select(models.BookReadingStats).filter_by(book_id=book_id)
+
+def popular_books_query(by: str, limit: int):
+    # (лічильник, book_id) у зворотному порядку індексу — O(limit) незалежно від кількості книг
+    column = stats.RANKINGS[by]
+    return (
+        select(models.BookReadingStats)
+        .where(column > 0)
+        .order_by(column.desc(), models.BookReadingStats.book_id.desc())
+        .limit(limit)
+    )
+
+def get_book_stats(db: Session, book_id: int):
+    return db.scalars(book_stats_query(book_id)).first()
+
+def get_popular_books(db: Session, by: str, limit: int):
+    return db.scalars(popular_books_query(by, limit)).all()
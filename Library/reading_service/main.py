@@ -1,8 +1,47 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from reading_service import metrics, migrations, tracing
 from reading_service.routes import reading_routes
-from reading_service.database import Base, engine
+from reading_service.database import engine
+from reading_service.progress_buffer import progress_buffer
+from reading_service.stats import stats_maintainer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await progress_buffer.start()
+    await stats_maintainer.start()
+    yield
+    await stats_maintainer.stop()
+    # Дописуємо все, що лишилось у буфері, до завершення процесу
+    await progress_buffer.stop()
 
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+metrics.instrument_app(app)
+tracing.instrument_app(app)
 app.include_router(reading_routes.router)
+
+
+# Схема створюється міграціями (python -m reading_service.migrations upgrade), а не при старті
+@app.get("/health/live")
+def liveness():
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+def readiness():
+    # Трафік можна пускати, коли база відповідає і схема на останній міграції
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            missing = migrations.pending(conn)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=503, detail=f"Database unavailable: {type(e).__name__}")
+    if missing:
+        raise HTTPException(status_code=503, detail=f"Pending migrations: {', '.join(missing)}")
+    return {"status": "ok"}
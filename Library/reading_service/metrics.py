@@ -0,0 +1,7 @@
+"""Метрики reading_service; спільна частина (HTTP, пул БД, /metrics) — common.metrics."""
+from common.metrics import ServiceMetrics
+
+SERVICE = "reading_service"
+service_metrics = ServiceMetrics(SERVICE)
+REGISTRY = service_metrics.registry
+instrument_app = service_metrics.instrument_app
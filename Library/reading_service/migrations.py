@@ -0,0 +1,172 @@
+"""
+Версійовані міграції схеми reading_service. Виконуються окремим кроком перед
+стартом сервісу, а не при імпорті застосунку:
+
+    python -m reading_service.migrations upgrade [--wait 60]   # застосувати нові
+    python -m reading_service.migrations status                # застосовані й очікувані
+
+Кожна міграція виконується один раз у власній транзакції й записується в
+schema_migrations. Застосовані міграції не змінюються: нова зміна схеми — нова
+функція в кінці MIGRATIONS. Кроки перевіряють, чи об'єкт уже існує, тож бази,
+створені раніше через create_all, підхоплюються без помилок.
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.exc import OperationalError
+
+from reading_service.database import engine
+
+SERVICE = "reading_service"
+# Спільний для всіх сервісів ключ advisory-lock: вони ділять базу і таблицю schema_migrations
+LOCK_KEY = 7340022
+UNIQUE_USER_BOOK = "uq_reading_progress_user_book"
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("service", String(64), primary_key=True),
+    Column("version", String(128), primary_key=True),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+
+def _create_reading_progress(conn):
+    Table(
+        "reading_progress",
+        MetaData(),
+        Column("id", Integer, primary_key=True, index=True),
+        Column("user_id", String, index=True),
+        Column("book_id", Integer, index=True),
+        Column("current_page", Integer),
+    ).create(conn, checkfirst=True)
+
+
+def _add_user_book_unique(conn):
+    inspector = inspect(conn)
+    names = {c["name"] for c in inspector.get_unique_constraints("reading_progress")}
+    names |= {i["name"] for i in inspector.get_indexes("reading_progress")}
+    if UNIQUE_USER_BOOK in names:
+        return
+    # Поки обмеження не було, одна пара могла отримати кілька рядків — лишаємо найновіший
+    conn.execute(text(
+        "DELETE FROM reading_progress WHERE id NOT IN "
+        "(SELECT MAX(id) FROM reading_progress GROUP BY user_id, book_id)"
+    ))
+    if conn.dialect.name == "sqlite":
+        # SQLite не вміє ALTER TABLE ... ADD CONSTRAINT; унікальний індекс дає те саме для ON CONFLICT
+        conn.execute(text(f"CREATE UNIQUE INDEX {UNIQUE_USER_BOOK} ON reading_progress (user_id, book_id)"))
+    else:
+        conn.execute(text(
+            f"ALTER TABLE reading_progress ADD CONSTRAINT {UNIQUE_USER_BOOK} UNIQUE (user_id, book_id)"
+        ))
+
+
+def _create_reading_stats(conn):
+    if "previous_page" not in {c["name"] for c in inspect(conn).get_columns("reading_progress")}:
+        conn.execute(text("ALTER TABLE reading_progress ADD COLUMN previous_page INTEGER"))
+    metadata = MetaData()
+    Table(
+        "book_reading_stats",
+        metadata,
+        Column("book_id", Integer, primary_key=True),
+        Column("pages", Integer, nullable=True),
+        Column("active_readers", Integer, nullable=False, server_default="0"),
+        Column("finished_readers", Integer, nullable=False, server_default="0"),
+        Column("activity_24h", Integer, nullable=False, server_default="0"),
+        Column("activity_7d", Integer, nullable=False, server_default="0"),
+        Index("ix_book_reading_stats_active", "active_readers", "book_id"),
+        Index("ix_book_reading_stats_finished", "finished_readers", "book_id"),
+        Index("ix_book_reading_stats_activity_24h", "activity_24h", "book_id"),
+        Index("ix_book_reading_stats_activity_7d", "activity_7d", "book_id"),
+    )
+    Table(
+        "book_activity",
+        metadata,
+        Column("book_id", Integer, primary_key=True),
+        Column("bucket", Integer, primary_key=True, index=True),
+        Column("updates", Integer, nullable=False),
+    )
+    Table(
+        "reading_stats_windows",
+        metadata,
+        Column("name", String, primary_key=True),
+        Column("expired_through", Integer, nullable=False),
+    )
+    metadata.create_all(conn, checkfirst=True)
+
+
+MIGRATIONS = [
+    ("0001_reading_progress", _create_reading_progress),
+    ("0002_reading_progress_user_book_unique", _add_user_book_unique),
+    ("0003_reading_stats", _create_reading_stats),
+]
+
+
+def applied_versions(conn) -> set:
+    if not inspect(conn).has_table("schema_migrations"):
+        return set()
+    query = select(schema_migrations.c.version).where(schema_migrations.c.service == SERVICE)
+    return set(conn.scalars(query))
+
+
+def pending(conn) -> list:
+    applied = applied_versions(conn)
+    return [version for version, _ in MIGRATIONS if version not in applied]
+
+
+def upgrade(bind=None) -> list:
+    """Застосовує неприйняті міграції по порядку; повертає їхні версії."""
+    bind = bind if bind is not None else engine
+    done = []
+    for version, migrate in MIGRATIONS:
+        with bind.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # Кілька реплік можуть запустити upgrade одночасно — виконуємо по черзі
+                conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": LOCK_KEY})
+            schema_migrations.create(conn, checkfirst=True)
+            if version in applied_versions(conn):
+                continue
+            migrate(conn)
+            conn.execute(schema_migrations.insert().values(
+                service=SERVICE, version=version, applied_at=datetime.now(timezone.utc),
+            ))
+        done.append(version)
+    return done
+
+
+def wait_for_database(timeout: float):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with engine.connect():
+                return
+        except OperationalError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(1)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog=f"python -m {SERVICE}.migrations", description=f"Міграції схеми {SERVICE}")
+    parser.add_argument("command", choices=("upgrade", "status"))
+    parser.add_argument("--wait", type=float, default=0, help="чекати доступності бази до N секунд")
+    args = parser.parse_args(argv)
+    if args.wait > 0:
+        wait_for_database(args.wait)
+    if args.command == "upgrade":
+        done = upgrade()
+        print(f"{SERVICE}: applied {len(done)} migration(s)" + (f": {', '.join(done)}" if done else ""))
+        return 0
+    with engine.connect() as conn:
+        applied = applied_versions(conn)
+    for version, _ in MIGRATIONS:
+        print(f"{'applied' if version in applied else 'pending':<8} {version}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
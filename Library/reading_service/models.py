@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, ForeignKey
+from sqlalchemy import Column, String, Integer, ForeignKey, Index, UniqueConstraint
 from reading_service.database import Base
 
 class ReadingProgress(Base):
@@ -8,3 +8,47 @@ class ReadingProgress(Base):
     user_id = Column(String, index=True)  # теперь строка (UUID)
     book_id = Column(Integer, index=True)
     current_page = Column(Integer)
+    # Сторінка до останнього оновлення (NULL — рядок щойно створено); з неї upsert рахує зміни статистик
+    previous_page = Column(Integer, nullable=True)
+
+    # Одна пара (user_id, book_id) — один рядок; на цьому тримається ON CONFLICT у пакетному upsert
+    __table_args__ = (
+        UniqueConstraint("user_id", "book_id", name="uq_reading_progress_user_book"),
+    )
+
+
+class BookReadingStats(Base):
+    """Лічильники по книзі, що оновлюються разом з прогресом (див. stats.py)."""
+    __tablename__ = "book_reading_stats"
+
+    book_id = Column(Integer, primary_key=True)
+    pages = Column(Integer, nullable=True)  # кількість сторінок книги, якщо gateway її передав
+    active_readers = Column(Integer, nullable=False, default=0, server_default="0")
+    finished_readers = Column(Integer, nullable=False, default=0, server_default="0")
+    activity_24h = Column(Integer, nullable=False, default=0, server_default="0")
+    activity_7d = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # Рейтинги — ORDER BY лічильник DESC LIMIT k по індексу
+    __table_args__ = (
+        Index("ix_book_reading_stats_active", "active_readers", "book_id"),
+        Index("ix_book_reading_stats_finished", "finished_readers", "book_id"),
+        Index("ix_book_reading_stats_activity_24h", "activity_24h", "book_id"),
+        Index("ix_book_reading_stats_activity_7d", "activity_7d", "book_id"),
+    )
+
+
+class BookActivity(Base):
+    """Кількість оновлень прогресу книги за годину; з них віднімаються години, що виходять з вікна."""
+    __tablename__ = "book_activity"
+
+    book_id = Column(Integer, primary_key=True)
+    bucket = Column(Integer, primary_key=True, index=True)  # номер години від epoch
+    updates = Column(Integer, nullable=False, default=0)
+
+
+class ReadingStatsWindow(Base):
+    __tablename__ = "reading_stats_windows"
+
+    name = Column(String, primary_key=True)  # "24h", "7d"
+    # Останній bucket, уже віднятий з лічильника вікна
+    expired_through = Column(Integer, nullable=False)
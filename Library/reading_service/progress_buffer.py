@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import os
+import threading
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from reading_service import crud
+from reading_service.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Прогрес пишеться в БД пакетами: раз на FLUSH_INTERVAL_MS або коли набралося FLUSH_MAX_ENTRIES ключів
+WRITE_BEHIND_ENABLED = os.getenv("PROGRESS_WRITE_BEHIND", "1").lower() in ("1", "true", "yes")
+FLUSH_INTERVAL_MS = int(os.getenv("PROGRESS_FLUSH_INTERVAL_MS", "250"))
+FLUSH_MAX_ENTRIES = int(os.getenv("PROGRESS_FLUSH_MAX_ENTRIES", "500"))
+
+Key = Tuple[str, int]
+
+
+class ProgressBuffer:
+    """
+    Write-behind буфер прогресу читання. Оновлення для однієї пари (user_id, book_id)
+    зливаються — зберігається лише остання сторінка, — а потім пишуться одним
+    INSERT ... ON CONFLICT DO UPDATE. Читання бачать ще не записані значення.
+    """
+
+    def __init__(self, session_factory, interval_ms: int, max_entries: int):
+        self._session_factory = session_factory
+        self._interval = interval_ms / 1000
+        self._max_entries = max_entries
+        self._pending: Dict[Key, int] = {}
+        # Пакет, який зараз пишеться в БД: до коміту він теж видимий для читань
+        self._flushing: Dict[Key, int] = {}
+        # Для статистик: кількість сторінок книг з запитів і скільки оновлень злито по кожній книзі
+        self._book_pages: Dict[int, int] = {}
+        self._activity: Counter = Counter()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.flushed_entries = 0
+        self.merged_updates = 0
+
+    def put(self, user_id: str, book_id: int, page: int, total_pages: Optional[int] = None):
+        with self._lock:
+            key = (user_id, book_id)
+            if key in self._pending:
+                self.merged_updates += 1
+            self._pending[key] = page
+            self._activity[book_id] += 1
+            if total_pages:
+                self._book_pages[book_id] = total_pages
+            full = len(self._pending) >= self._max_entries
+        if full and self._wakeup is not None:
+            self._wakeup.set()
+
+    def get(self, user_id: str, book_id: int) -> Optional[int]:
+        key = (user_id, book_id)
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key]
+            return self._flushing.get(key)
+
+    def pending_for_user(self, user_id: str) -> Dict[int, int]:
+        with self._lock:
+            merged = {book_id: page for (uid, book_id), page in self._flushing.items() if uid == user_id}
+            merged.update({book_id: page for (uid, book_id), page in self._pending.items() if uid == user_id})
+        return merged
+
+    def flush(self) -> int:
+        """Записує накопичені оновлення одним запитом. Блокуючий — викликати не з event loop."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._flushing, self._pending = self._pending, {}
+                batch = self._flushing
+                book_pages, self._book_pages = self._book_pages, {}
+                activity, self._activity = self._activity, Counter()
+            try:
+                with self._session_factory() as db:
+                    crud.upsert_progress_batch(db, [(u, b, p) for (u, b), p in batch.items()], book_pages, activity)
+            except Exception:
+                logger.exception("Failed to flush %d reading progress updates", len(batch))
+                with self._lock:
+                    # Повертаємо в буфер те, що не було перезаписане новішими оновленнями
+                    for key, page in batch.items():
+                        self._pending.setdefault(key, page)
+                    for book_id, pages in book_pages.items():
+                        self._book_pages.setdefault(book_id, pages)
+                    self._activity.update(activity)
+                    self._flushing = {}
+                raise
+            with self._lock:
+                self._flushing = {}
+            self.flushes += 1
+            self.flushed_entries += len(batch)
+            return len(batch)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await run_in_threadpool(self.flush)
+            except Exception:
+                # Помилку вже залоговано, оновлення залишились у буфері до наступної спроби
+                await asyncio.sleep(self._interval)
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await run_in_threadpool(self.flush)
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "flushes": self.flushes,
+            "flushed_entries": self.flushed_entries,
+            "merged_updates": self.merged_updates,
+        }
+
+
+progress_buffer = ProgressBuffer(SessionLocal, FLUSH_INTERVAL_MS, FLUSH_MAX_ENTRIES)
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
-from reading_service import crud, schemas
-from reading_service.database import SessionLocal
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from reading_service import async_crud, crud, schemas, stats
+from reading_service.database import AsyncSessionLocal, DB_ASYNC, SessionLocal, run_db
+from reading_service.progress_buffer import WRITE_BEHIND_ENABLED, progress_buffer
 
 router = APIRouter(prefix="/reading", tags=["Reading"])
 
+PROGRESS_BATCH_MAX = 1000
+POPULAR_LIMIT_MAX = 100
+
 def get_db():
     db = SessionLocal()
     try:
@@ -12,10 +15,89 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# У режимі DB_ASYNC обробники отримують AsyncSession, інакше — звичайну Session
+db_dependency = get_async_db if DB_ASYNC else get_db
+
 @router.post("/start")
-async def start_reading(progress: schemas.ReadingStart, db: Session = Depends(get_db)):
-    return crud.upsert_reading_progress(db, progress)
+async def start_reading(progress: schemas.ReadingStart, db=Depends(db_dependency)):
+    if WRITE_BEHIND_ENABLED:
+        # Запис у БД відбудеться пакетом у фоні; тут лише оновлюємо буфер
+        progress_buffer.put(progress.user_id, progress.book_id, progress.page, progress.total_pages)
+        return {"user_id": progress.user_id, "book_id": progress.book_id, "current_page": progress.page}
+    return await run_db(db, crud.upsert_reading_progress, async_crud.upsert_reading_progress, progress)
 
 @router.get("/progress/{user_id}")
-def get_progress(user_id: str, db: Session = Depends(get_db)):
-    return crud.get_user_progress(db, user_id)
+async def get_progress(user_id: str, db=Depends(db_dependency)):
+    rows = await run_db(db, crud.get_user_progress, async_crud.get_user_progress, user_id)
+    pending = progress_buffer.pending_for_user(user_id)
+    result = []
+    for row in rows:
+        result.append({
+            "id": row.id,
+            "user_id": row.user_id,
+            "book_id": row.book_id,
+            "current_page": pending.pop(row.book_id, row.current_page),
+        })
+    # Книги, прогрес яких ще не потрапив у БД
+    for book_id, page in pending.items():
+        result.append({"id": None, "user_id": user_id, "book_id": book_id, "current_page": page})
+    return result
+
+@router.get("/progress/{user_id}/{book_id}")
+async def get_book_progress(user_id: str, book_id: int, db=Depends(db_dependency)):
+    page = progress_buffer.get(user_id, book_id)
+    row = await run_db(db, crud.get_progress, async_crud.get_progress, user_id, book_id)
+    if row is None and page is None:
+        raise HTTPException(404, "Progress not found")
+    return {
+        "id": row.id if row else None,
+        "user_id": user_id,
+        "book_id": book_id,
+        "current_page": page if page is not None else row.current_page,
+    }
+
+@router.post("/progress/batch")
+async def get_progress_batch(request: schemas.ProgressBatchRequest, db=Depends(db_dependency)):
+    """Прогрес для багатьох пар (user_id, book_id) одним запитом; відсутні пари мають current_page = null."""
+    if len(request.items) > PROGRESS_BATCH_MAX:
+        raise HTTPException(400, f"Too many items (max {PROGRESS_BATCH_MAX})")
+    keys = list(dict.fromkeys((item.user_id, item.book_id) for item in request.items))
+    found = await run_db(db, crud.get_progress_batch, async_crud.get_progress_batch, keys)
+    rows = {(r.user_id, r.book_id): r for r in found}
+    items = []
+    for user_id, book_id in keys:
+        row = rows.get((user_id, book_id))
+        page = progress_buffer.get(user_id, book_id)
+        if page is None and row is not None:
+            page = row.current_page
+        items.append({
+            "id": row.id if row else None,
+            "user_id": user_id,
+            "book_id": book_id,
+            "current_page": page,
+        })
+    return {"items": items}
+
+@router.get("/buffer/stats")
+def get_buffer_stats():
+    return progress_buffer.stats()
+
+# Статистики читаються з агрегатів (stats.py); прогрес з write-behind буфера потрапляє в них після flush
+@router.get("/stats/popular")
+async def get_popular_books(by: str = "reading", limit: int = Query(10, ge=1, le=POPULAR_LIMIT_MAX), db=Depends(db_dependency)):
+    """Рейтинг книг: reading — зараз читають, finished — дочитали, 24h / 7d — активність за вікно."""
+    if by not in stats.RANKINGS:
+        raise HTTPException(400, f"Unknown ranking: {by} (expected one of {', '.join(stats.RANKINGS)})")
+    rows = await run_db(db, crud.get_popular_books, async_crud.get_popular_books, by, limit)
+    return {"by": by, "items": [stats.as_dict(row) for row in rows]}
+
+@router.get("/stats/books/{book_id}")
+async def get_book_stats(book_id: int, db=Depends(db_dependency)):
+    row = await run_db(db, crud.get_book_stats, async_crud.get_book_stats, book_id)
+    if row is None:
+        raise HTTPException(404, "No reading stats for this book")
+    return stats.as_dict(row)
@@ -4,7 +4,15 @@ class ReadingStart(BaseModel):
     user_id: str  # UUID как строка
     book_id: int
     page: int
+    total_pages: int | None = None  # кількість сторінок книги — для статистики "дочитали"
 
 class ReadingProgressOut(BaseModel):
     book_id: int
     page: int
+
+class ProgressKey(BaseModel):
+    user_id: str
+    book_id: int
+
+class ProgressBatchRequest(BaseModel):
+    items: list[ProgressKey]
@@ -0,0 +1,311 @@
+"""
+Статистики читання, що підтримуються інкрементально: кожен upsert прогресу в тій
+самій транзакції змінює лічильники своїх книг, тож статистика книги читається
+за O(1), а рейтинг — за O(k) по індексу, незалежно від розміру reading_progress.
+
+- active_readers / finished_readers — читачі книги; читач "дочитав", коли
+  current_page >= pages (кількість сторінок передає gateway у total_pages).
+- activity_24h / activity_7d — оновлення прогресу за ковзні вікна з точністю до
+  години: кожне оновлення додається в погодинний bucket і в обидва лічильники,
+  а StatsMaintainer віднімає bucket-и, що вийшли з вікна.
+
+Перерахунок з нуля (після backfill або ручних змін у базі):
+
+    python -m reading_service.stats rebuild
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from collections import Counter
+
+from sqlalchemy import bindparam, case, delete, func, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from starlette.concurrency import run_in_threadpool
+
+from reading_service import models
+from reading_service.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+BUCKET_SECONDS = 3600
+# Як часто віднімати з лічильників bucket-и, що вийшли з вікна
+EXPIRE_INTERVAL = float(os.getenv("READING_STATS_EXPIRE_INTERVAL", "60"))
+
+_stats = models.BookReadingStats.__table__
+_activity = models.BookActivity.__table__
+_windows = models.ReadingStatsWindow.__table__
+
+# Вікно -> (тривалість у bucket-ах, колонка лічильника)
+WINDOWS = {
+    "24h": (24, _stats.c.activity_24h),
+    "7d": (24 * 7, _stats.c.activity_7d),
+}
+# Рейтинги GET /reading/stats/popular?by=...
+RANKINGS = {
+    "reading": _stats.c.active_readers,
+    "finished": _stats.c.finished_readers,
+    "24h": _stats.c.activity_24h,
+    "7d": _stats.c.activity_7d,
+}
+
+
+def current_bucket(now: float | None = None) -> int:
+    return int((time.time() if now is None else now) // BUCKET_SECONDS)
+
+
+def is_finished(page: int | None, pages: int | None) -> bool:
+    return bool(pages) and page is not None and page >= pages
+
+
+def _insert(db):
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert
+
+
+def _recount(db, book_id: int, pages: int):
+    """Читачі книги заново — коли кількість її сторінок з'явилась або змінилась."""
+    progress = models.ReadingProgress.__table__
+    total, finished = db.execute(
+        select(func.count(), func.coalesce(func.sum(case((progress.c.current_page >= pages, 1), else_=0)), 0))
+        .where(progress.c.book_id == book_id)
+    ).one()
+    db.execute(
+        update(_stats).where(_stats.c.book_id == book_id)
+        .values(active_readers=total - finished, finished_readers=finished)
+    )
+
+
+def apply_progress(db, changes, book_pages: dict, activity: Counter, now: float | None = None):
+    """
+    Оновлює лічильники за результатом upsert прогресу; викликається в його транзакції.
+    changes — рядки (user_id, book_id, previous_page, current_page) з RETURNING
+    (previous_page = NULL — новий читач), book_pages — відомі кількості сторінок,
+    activity — кількість оновлень прогресу по книгах.
+    """
+    book_ids = sorted({change[1] for change in changes} | set(activity))
+    if not book_ids:
+        return
+    stored = dict(db.execute(select(_stats.c.book_id, _stats.c.pages).where(_stats.c.book_id.in_(book_ids))).all())
+    repaged = {book_id: pages for book_id, pages in book_pages.items() if pages and stored.get(book_id) != pages}
+
+    deltas = {book_id: [0, 0] for book_id in book_ids}  # [active, finished]
+    for _, book_id, previous, current in changes:
+        if book_id in repaged:
+            continue
+        pages = stored.get(book_id)
+        finished = is_finished(current, pages)
+        if previous is None:
+            deltas[book_id][1 if finished else 0] += 1
+        elif is_finished(previous, pages) != finished:
+            step = 1 if finished else -1
+            deltas[book_id][0] -= step
+            deltas[book_id][1] += step
+
+    rows = []
+    for book_id in book_ids:  # у порядку book_id, щоб паралельні транзакції не ловили deadlock
+        active, finished = deltas[book_id]
+        updates = activity.get(book_id, 0)
+        if book_id not in stored:
+            # Рядка ще немає (прогрес з'явився до статистик) — від'ємний старт не має сенсу
+            active, finished = max(active, 0), max(finished, 0)
+        rows.append({
+            "book_id": book_id,
+            "pages": repaged.get(book_id, stored.get(book_id)),
+            "active_readers": active,
+            "finished_readers": finished,
+            "activity_24h": updates,
+            "activity_7d": updates,
+        })
+    insert = _insert(db)
+    stmt = insert(_stats).values(rows)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["book_id"],
+        set_={
+            "pages": func.coalesce(stmt.excluded.pages, _stats.c.pages),
+            "active_readers": _stats.c.active_readers + stmt.excluded.active_readers,
+            "finished_readers": _stats.c.finished_readers + stmt.excluded.finished_readers,
+            "activity_24h": _stats.c.activity_24h + stmt.excluded.activity_24h,
+            "activity_7d": _stats.c.activity_7d + stmt.excluded.activity_7d,
+        },
+    ))
+    for book_id, pages in sorted(repaged.items()):
+        _recount(db, book_id, pages)
+
+    if activity:
+        bucket = current_bucket(now)
+        stmt = insert(_activity).values([
+            {"book_id": book_id, "bucket": bucket, "updates": updates}
+            for book_id, updates in sorted(activity.items())
+        ])
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["book_id", "bucket"],
+            set_={"updates": _activity.c.updates + stmt.excluded.updates},
+        ))
+
+
+def expire_windows(db, now: float | None = None) -> int:
+    """
+    Віднімає з лічильників вікон bucket-и, що з них вийшли, і видаляє bucket-и,
+    старші за найдовше вікно. Повертає кількість оновлених рядків статистик.
+    Репліки не віднімуть ті самі bucket-и двічі: межа вікна зсувається через compare-and-set.
+    """
+    bucket = current_bucket(now)
+    changed = 0
+    for name, (length, column) in WINDOWS.items():
+        through = bucket - length  # bucket-и <= through уже поза вікном
+        last = db.scalar(select(_windows.c.expired_through).where(_windows.c.name == name))
+        if last is None:
+            db.execute(_insert(db)(_windows).values(name=name, expired_through=through).on_conflict_do_nothing())
+            continue
+        if last >= through:
+            continue
+        claimed = db.execute(
+            update(_windows).where(_windows.c.name == name, _windows.c.expired_through == last)
+            .values(expired_through=through)
+        ).rowcount
+        if not claimed:
+            continue
+        expired = db.execute(
+            select(_activity.c.book_id, func.sum(_activity.c.updates))
+            .where(_activity.c.bucket > last, _activity.c.bucket <= through)
+            .group_by(_activity.c.book_id)
+            .order_by(_activity.c.book_id)
+        ).all()
+        if expired:
+            db.execute(
+                update(_stats).where(_stats.c.book_id == bindparam("expired_book"))
+                .values({column.key: column - bindparam("expired_updates")}),
+                [{"expired_book": book_id, "expired_updates": updates} for book_id, updates in expired],
+            )
+            changed += len(expired)
+    oldest = db.scalar(select(func.min(_windows.c.expired_through)))
+    if oldest is not None and len(WINDOWS) == db.scalar(select(func.count()).select_from(_windows)):
+        db.execute(delete(_activity).where(_activity.c.bucket <= oldest))
+    return changed
+
+
+def rebuild(db, now: float | None = None) -> int:
+    """
+    Перераховує всі лічильники з reading_progress і book_activity (повний прохід —
+    лише для backfill). Кількості сторінок, які вже відомі, зберігаються.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        # Паралельні upsert-и чекають кінця перерахунку, інакше їхні зміни порахуються двічі
+        db.execute(text("LOCK TABLE reading_progress, book_reading_stats, book_activity IN SHARE ROW EXCLUSIVE MODE"))
+    progress = models.ReadingProgress.__table__
+    bucket = current_bucket(now)
+    counts = {
+        book_id: {"active_readers": total - finished, "finished_readers": finished}
+        for book_id, total, finished in db.execute(
+            select(
+                progress.c.book_id,
+                func.count(),
+                func.coalesce(func.sum(case(
+                    ((_stats.c.pages > 0) & (progress.c.current_page >= _stats.c.pages), 1), else_=0,
+                )), 0),
+            )
+            .select_from(progress.outerjoin(_stats, _stats.c.book_id == progress.c.book_id))
+            .where(progress.c.book_id.is_not(None))
+            .group_by(progress.c.book_id)
+        )
+    }
+    for name, (length, column) in WINDOWS.items():
+        for book_id, updates in db.execute(
+            select(_activity.c.book_id, func.sum(_activity.c.updates))
+            .where(_activity.c.bucket > bucket - length)
+            .group_by(_activity.c.book_id)
+        ):
+            counts.setdefault(book_id, {})[column.key] = updates
+
+    db.execute(update(_stats).values(active_readers=0, finished_readers=0, activity_24h=0, activity_7d=0))
+    if counts:
+        stmt = _insert(db)(_stats).values([
+            {"book_id": book_id, "active_readers": 0, "finished_readers": 0,
+             "activity_24h": 0, "activity_7d": 0, **values}
+            for book_id, values in sorted(counts.items())
+        ])
+        db.execute(stmt.on_conflict_do_update(index_elements=["book_id"], set_={
+            key: stmt.excluded[key] for key in ("active_readers", "finished_readers", "activity_24h", "activity_7d")
+        }))
+    db.execute(delete(_windows))
+    db.execute(_windows.insert(), [
+        {"name": name, "expired_through": bucket - length} for name, (length, _) in WINDOWS.items()
+    ])
+    db.execute(delete(_activity).where(_activity.c.bucket <= bucket - max(length for length, _ in WINDOWS.values())))
+    return len(counts)
+
+
+def as_dict(row) -> dict:
+    readers = row.active_readers + row.finished_readers
+    return {
+        "book_id": row.book_id,
+        "pages": row.pages,
+        "active_readers": row.active_readers,
+        "finished_readers": row.finished_readers,
+        "completion_rate": round(row.finished_readers / readers, 4) if readers else 0.0,
+        "activity_24h": row.activity_24h,
+        "activity_7d": row.activity_7d,
+    }
+
+
+class StatsMaintainer:
+    """Фонове завдання, що раз на EXPIRE_INTERVAL зсуває ковзні вікна активності."""
+
+    def __init__(self, session_factory, interval: float):
+        self._session_factory = session_factory
+        self._interval = interval
+        self._task: asyncio.Task | None = None
+        self.runs = 0
+        self.errors = 0
+
+    def expire(self) -> int:
+        with self._session_factory() as db:
+            changed = expire_windows(db)
+            db.commit()
+        self.runs += 1
+        return changed
+
+    async def _run(self):
+        while True:
+            try:
+                await run_in_threadpool(self.expire)
+            except Exception:
+                self.errors += 1
+                logger.exception("Failed to expire reading activity windows")
+            await asyncio.sleep(self._interval)
+
+    async def start(self):
+        if self._interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+stats_maintainer = StatsMaintainer(SessionLocal, EXPIRE_INTERVAL)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m reading_service.stats", description="Статистики читання")
+    parser.add_argument("command", choices=("rebuild", "expire"))
+    args = parser.parse_args(argv)
+    with SessionLocal() as db:
+        if args.command == "rebuild":
+            print(f"reading_service: rebuilt stats for {rebuild(db)} book(s)")
+        else:
+            print(f"reading_service: expired activity for {expire_windows(db)} book(s)")
+        db.commit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
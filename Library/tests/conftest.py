@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# Сервіси імпортуються як пакети з каталогу Library; база і файли — тимчасові
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_workdir = tempfile.mkdtemp(prefix="library-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_workdir}/test.db")
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_workdir, "uploads"))
+os.environ.setdefault("TRACE_SAMPLE_RATE", "0")
@@ -0,0 +1,54 @@
+import time
+
+import pytest
+
+from book_service import bulk, crud, migrations, models, schemas
+from book_service.database import SessionLocal
+
+
+@pytest.fixture(scope="module", autouse=True)
+def schema():
+    migrations.upgrade()
+
+
+def records(*rows):
+    return [(number, row, None) for number, row in enumerate(rows, start=1)]
+
+
+def test_same_title_and_author_can_be_created_twice():
+    title = f"twice-{time.time()}"
+    with SessionLocal() as db:
+        book = schemas.BookCreate(title=title, author="Bulk", description="", year=2000, pages=0)
+        first, second = crud.create_book(db, book), crud.create_book(db, book)
+        assert first.id != second.id
+        assert (first.title, second.title) == (title, title)
+
+
+def test_import_is_idempotent_and_claims_api_book():
+    title = f"claimed-{time.time()}"
+    with SessionLocal() as db:
+        api_book = crud.create_book(
+            db, schemas.BookCreate(title=title, author="Bulk", description="", year=2000, pages=3),
+        )
+        row = {"title": title, "author": "Bulk", "year": 2001}
+        report = bulk.import_records(db, records(row))
+        assert (report.created, report.updated) == (0, 1)
+        db.refresh(api_book)
+        assert (api_book.year, api_book.pages) == (2001, 3)
+        assert api_book.import_key == bulk.import_key(schemas.BookImport(**row))
+
+        report = bulk.import_records(db, records(row))
+        assert (report.created, report.updated, report.unchanged) == (0, 0, 1)
+        assert db.query(models.Book).filter(models.Book.title == title).count() == 1
+
+
+def test_external_id_distinguishes_same_title():
+    title = f"editions-{time.time()}"
+    rows = [{"external_id": f"ed-{n}", "title": title, "author": "Bulk", "year": 2000 + n} for n in range(2)]
+    with SessionLocal() as db:
+        assert bulk.import_records(db, records(*rows)).created == 2
+        rows[1]["year"] = 2010
+        report = bulk.import_records(db, records(*rows))
+        assert (report.created, report.updated, report.unchanged) == (0, 1, 1)
+        years = db.query(models.Book.year).filter(models.Book.title == title).order_by(models.Book.id)
+        assert [year for year, in years] == [2000, 2010]
@@ -0,0 +1,39 @@
+import time
+
+import pytest
+
+from book_service import covers, crud, migrations, models, schemas
+from book_service.database import SessionLocal
+
+COVER_URL = "https://covers.openlibrary.org/b/id/1-L.jpg"
+
+
+@pytest.fixture(scope="module", autouse=True)
+def schema():
+    migrations.upgrade()
+
+
+def test_cover_version_in_book_and_catalog():
+    with SessionLocal() as db:
+        book = crud.create_book(db, schemas.BookCreate(
+            title=f"cover-{time.time()}", author="Catalog", description="", year=2000, pages=1, cover_url=COVER_URL,
+        ))
+        plain = crud.create_book(db, schemas.BookCreate(
+            title=f"plain-{time.time()}", author="Catalog", description="", year=2000, pages=1,
+        ))
+        version = covers.cover_version(book)
+        assert version
+        assert schemas.Book.model_validate(book).cover_version == version
+
+        # Похідне поле: для нього вибираються cover_url і blob_sha256, але у відповідь вони не потрапляють
+        rows = crud.get_books_by_ids(db, [book.id, plain.id], ["id", "cover_version"])
+        assert rows == [{"id": book.id, "cover_version": version}, {"id": plain.id, "cover_version": None}]
+        page, _ = crud.list_books(db, 1000, title_prefix=book.title)
+        assert page[0]["cover_version"] == version and page[0]["cover_url"] == COVER_URL
+
+
+def test_cover_version_follows_cover_source():
+    book = models.Book(cover_url=None, blob_sha256="a" * 64)
+    from_file = book.cover_version
+    book.cover_url = COVER_URL
+    assert from_file and book.cover_version not in (None, from_file)
@@ -0,0 +1,150 @@
+import io
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+PIL = pytest.importorskip("PIL")
+from PIL import Image  # noqa: E402
+
+from benchmarks.cover_origin import CoverOrigin, make_jpeg  # noqa: E402
+from book_service import covers  # noqa: E402
+
+COVER_URL = "https://covers.openlibrary.org/b/id/1-L.jpg"
+
+
+@pytest.fixture
+def origin(monkeypatch, tmp_path):
+    with CoverOrigin(images={"/b/id/1-L.jpg": make_jpeg(1000, 1500)}) as origin:
+        monkeypatch.setattr(covers, "COVER_ORIGIN_URL", origin.url)
+        monkeypatch.setattr(covers, "COVER_ALLOWED_HOSTS", {"covers.openlibrary.org"})
+        monkeypatch.setattr(covers, "cache", covers.DiskLRU(str(tmp_path / "covers"), 10 * 1024 * 1024))
+        monkeypatch.setattr(covers, "_failures", {})
+        yield origin
+
+
+def book(cover_url=COVER_URL, book_id=1):
+    return SimpleNamespace(id=book_id, cover_url=cover_url, blob_sha256=None)
+
+
+def size_of(data: bytes):
+    return Image.open(io.BytesIO(data)).size
+
+
+def test_miss_then_hit(origin):
+    first = covers.get_variant(book(), "m")
+    second = covers.get_variant(book(), "m")
+    assert first == second
+    assert origin.requests == ["/b/id/1-L.jpg"]
+    assert covers.cache.stats()["files"] == len(covers.COVER_SIZES)
+    # Інші розміри згенеровані разом з першим
+    covers.get_variant(book(), "s")
+    assert len(origin.requests) == 1
+
+
+def test_resize_variants(origin):
+    for size, width in covers.COVER_SIZES.items():
+        assert size_of(covers.get_variant(book(), size)) == (width, width * 3 // 2)
+
+
+def test_small_original_is_not_upscaled(origin):
+    origin.images["/b/id/2-L.jpg"] = make_jpeg(60, 80)
+    data = covers.get_variant(book("https://covers.openlibrary.org/b/id/2-L.jpg", 2), "l")
+    assert size_of(data) == (60, 80)
+
+
+def test_disallowed_host_is_not_fetched(origin):
+    with pytest.raises(covers.CoverUnavailable, match="not allowed"):
+        covers.get_variant(book("https://internal.example/b/id/1-L.jpg"), "m")
+    assert origin.requests == []
+
+
+def test_redirect_to_disallowed_host(origin):
+    origin.redirects["/b/id/3-L.jpg"] = "http://169.254.169.254/latest/meta-data"
+    with pytest.raises(covers.CoverUnavailable, match="not allowed"):
+        covers.get_variant(book("https://covers.openlibrary.org/b/id/3-L.jpg", 3), "m")
+    assert origin.requests == ["/b/id/3-L.jpg"]
+
+
+def test_redirect_within_allowed_host(origin):
+    origin.redirects["/b/id/4-L.jpg"] = "/b/id/1-L.jpg"
+    data = covers.get_variant(book("https://covers.openlibrary.org/b/id/4-L.jpg", 4), "s")
+    assert size_of(data)[0] == covers.COVER_SIZES["s"]
+    assert origin.requests == ["/b/id/4-L.jpg", "/b/id/1-L.jpg"]
+
+
+def test_failure_ttl(origin, monkeypatch):
+    monkeypatch.setattr(covers, "COVER_FAILURE_TTL", 0.2)
+    missing = book("https://covers.openlibrary.org/b/id/404-L.jpg", 5)
+    with pytest.raises(covers.CoverUnavailable, match="404"):
+        covers.get_variant(missing, "m")
+    with pytest.raises(covers.CoverUnavailable, match="failed recently"):
+        covers.get_variant(missing, "m")
+    assert len(origin.requests) == 1
+    time.sleep(0.25)
+    origin.images["/b/id/404-L.jpg"] = make_jpeg(300, 400)
+    assert covers.get_variant(missing, "m")
+    assert len(origin.requests) == 2
+    assert covers._failures == {}
+
+
+def test_failures_are_pruned(origin, monkeypatch):
+    monkeypatch.setattr(covers, "COVER_FAILURES_MAX", 2)
+    monkeypatch.setattr(covers, "COVER_FAILURE_TTL", 0.5)
+    versions = []
+    for n in range(3):
+        missing = book(f"https://covers.openlibrary.org/b/id/40{n}-L.jpg", 10 + n)
+        versions.append(covers.cover_version(missing))
+        with pytest.raises(covers.CoverUnavailable):
+            covers.get_variant(missing, "m")
+    assert list(covers._failures) == versions[1:]
+    # Записи, чий TTL сплив, прибираються при наступній невдачі
+    time.sleep(0.6)
+    last = book("https://covers.openlibrary.org/b/id/499-L.jpg", 20)
+    with pytest.raises(covers.CoverUnavailable):
+        covers.get_variant(last, "m")
+    assert list(covers._failures) == [covers.cover_version(last)]
+
+
+def test_lru_eviction(tmp_path):
+    cache = covers.DiskLRU(str(tmp_path), max_bytes=250)
+    for name in ("a1", "b2", "c3"):
+        cache.put(name, b"x" * 100)
+    assert "a1" not in cache and not os.path.exists(cache.path("a1"))
+    assert cache.read("b2") == b"x" * 100
+    cache.put("d4", b"y" * 100)
+    # b2 щойно читали, тож витісняється c3
+    assert "b2" in cache and "c3" not in cache
+    assert cache.stats()["evictions"] == 2
+    assert cache.stats()["bytes"] == 200
+
+
+def test_evicted_file_is_regenerated(origin):
+    covers.get_variant(book(), "m")
+    os.remove(covers.cache.path(covers.variant_name(covers.cover_version(book()), "m")))
+    assert size_of(covers.get_variant(book(), "m"))[0] == covers.COVER_SIZES["m"]
+    assert len(origin.requests) == 2
+
+
+def test_cache_smaller_than_variants(origin, monkeypatch, tmp_path):
+    monkeypatch.setattr(covers, "cache", covers.DiskLRU(str(tmp_path / "tiny"), max_bytes=1))
+    assert size_of(covers.get_variant(book(), "s"))[0] == covers.COVER_SIZES["s"]
+
+
+def test_concurrent_requests_generate_once(origin):
+    results, barrier = [], threading.Barrier(8)
+
+    def worker(size):
+        barrier.wait()
+        results.append(covers.get_variant(book(), size))
+
+    threads = [threading.Thread(target=worker, args=("sml"[n % 3],)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 8
+    assert origin.requests == ["/b/id/1-L.jpg"]
+    assert covers._locks == {}
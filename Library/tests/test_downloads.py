@@ -0,0 +1,128 @@
+import asyncio
+import io
+import time
+
+import httpx
+import pytest
+
+from api_gateway.routes import book_routes
+from benchmarks.stand import InProcessStand
+from book_service import downloads, ingest, migrations, models
+from book_service.database import SessionLocal
+
+DATA = bytes(range(256)) * 40
+
+
+@pytest.fixture(scope="module", autouse=True)
+def schema():
+    migrations.upgrade()
+
+
+@pytest.fixture(scope="module")
+def book_id(schema):
+    with SessionLocal() as db:
+        book = models.Book(title=f"file-{time.time()}", author="Range", description="", year=2000, pages=0)
+        db.add(book)
+        db.commit()
+        job = ingest.submit_original(db, book, io.BytesIO(DATA), "book.txt")
+        deadline = time.monotonic() + 10
+        while job.finished_at is None and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return book.id
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-9", (0, 10)),
+    ("bytes=100-", (100, 200)),
+    ("bytes=-50", (150, 200)),
+    ("bytes=150-999", (150, 200)),
+    ("bytes=0-9, 20-29", (0, 30)),
+    ("items=0-9", None),
+    ("bytes=9-0", None),
+])
+def test_parse_range(header, expected):
+    assert downloads.parse_range(header, 200) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=200-", "bytes=500-600", "bytes=-0"])
+def test_parse_range_not_satisfiable(header):
+    with pytest.raises(downloads.RangeNotSatisfiable):
+        downloads.parse_range(header, 200)
+
+
+def fetch(book_id, headers):
+    async def scenario():
+        async with InProcessStand() as gateway:
+            return await gateway.get(f"/books/{book_id}/file", headers=headers)
+
+    return asyncio.run(scenario())
+
+
+def test_single_range(book_id):
+    response = fetch(book_id, {"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == DATA[10:20]
+    assert response.headers["content-range"] == f"bytes 10-19/{len(DATA)}"
+
+
+def test_suffix_range(book_id):
+    response = fetch(book_id, {"Range": "bytes=-100"})
+    assert response.status_code == 206
+    assert response.content == DATA[-100:]
+
+
+def test_unsatisfiable_range(book_id):
+    response = fetch(book_id, {"Range": f"bytes={len(DATA)}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(DATA)}"
+
+
+def test_if_range(book_id):
+    etag = fetch(book_id, {}).headers["etag"]
+    assert fetch(book_id, {"Range": "bytes=0-9", "If-Range": etag}).status_code == 206
+    # Файл змінився з часу першої частини — віддається цілком
+    response = fetch(book_id, {"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert response.content == DATA
+
+
+class TrackedStream(httpx.AsyncByteStream):
+    def __init__(self):
+        self.started = False
+        self.closed = False
+
+    async def __aiter__(self):
+        self.started = True
+        yield b"chunk"
+
+    async def aclose(self):
+        self.closed = True
+
+
+def scope(spec_version):
+    return {"type": "http", "method": "GET", "headers": [], "asgi": {"spec_version": spec_version}}
+
+
+@pytest.mark.parametrize("spec_version", ["2.0", "2.4"])
+def test_upstream_closed_when_client_disconnects_before_body(spec_version):
+    stream = TrackedStream()
+    response = book_routes.UpstreamStreamingResponse(httpx.Response(200, stream=stream), book_routes.FILE_HEADERS)
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        # Клієнт пішов ще до заголовків відповіді
+        await asyncio.sleep(0.01)
+        raise OSError("connection reset")
+
+    async def scenario():
+        try:
+            await response(scope(spec_version), receive, send)
+        except Exception:
+            pass
+
+    asyncio.run(scenario())
+    assert not stream.started
+    assert stream.closed
@@ -0,0 +1,36 @@
+import pytest
+
+from common.encoding import choose_encoding, etag_matches, preferred_encoding
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, "identity"),
+    ("", "identity"),
+    ("gzip, deflate, br", "br"),
+    ("gzip", "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("br;q=0.5, gzip;q=0.8", "gzip"),
+    ("gzip; q=0", "identity"),
+    ("*", "br"),
+    ("deflate", "identity"),
+])
+def test_preferred_encoding(accept, expected):
+    assert preferred_encoding(accept) == expected
+
+
+def test_choose_encoding_respects_available():
+    assert choose_encoding("br, gzip", ["gzip"]) == "gzip"
+    assert choose_encoding("br", ["gzip"]) is None
+    assert choose_encoding("gzip;q=bogus", ["gzip"]) is None
+
+
+@pytest.mark.parametrize("if_none_match, matches", [
+    (None, False),
+    ("*", True),
+    ('"abc-gzip"', True),
+    ('W/"abc-gzip"', True),
+    ('"other", "abc-gzip"', True),
+    ('"abc"', False),
+])
+def test_etag_matches(if_none_match, matches):
+    assert etag_matches(if_none_match, '"abc-gzip"') is matches
@@ -0,0 +1,49 @@
+import time
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from jose import jwt
+
+from api_gateway import auth
+from api_gateway.main import app
+from user_service.auth import create_access_token
+
+CLAIMS = {"sub": "reader@example.com", "role": "user", "id": "42"}
+
+
+@pytest.fixture
+def token_cache(monkeypatch):
+    cache = auth.TokenCache(max_entries=100, default_ttl=300)
+    monkeypatch.setattr(auth, "token_cache", cache)
+    return cache
+
+
+def test_revoked_until_token_exp(token_cache):
+    token = create_access_token(CLAIMS)
+    exp = jwt.get_unverified_claims(token)["exp"]
+    # Токен ще не кешувався: строк відкликання береться з exp, а не з default_ttl
+    auth.revoke_jwt_token(token)
+    assert token_cache._revoked[token_cache.digest(token)] == exp > time.time() + 25 * 60
+    with pytest.raises(ValueError, match="revoked"):
+        auth.verify_jwt_token(token)
+
+
+def test_revoke_rejects_forged_token(token_cache):
+    forged = jwt.encode({**CLAIMS, "exp": int(time.time()) + 60}, "not-the-secret", algorithm="HS256")
+    with pytest.raises(ValueError):
+        auth.revoke_jwt_token(forged)
+    assert token_cache.stats()["revoked"] == 0
+
+
+def test_logout(token_cache):
+    client = TestClient(app)
+    token = create_access_token(CLAIMS)
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/users/me", headers=headers).status_code == 200
+    assert client.post("/users/logout", headers={"Authorization": "Bearer garbage"}).status_code == 401
+    assert client.post("/users/logout", headers=headers).status_code == 204
+    assert client.get("/users/me", headers=headers).status_code == 401
+    # Прострочений, але справжній токен теж можна відкликати
+    expired = create_access_token(CLAIMS, timedelta(minutes=-1))
+    assert client.post("/users/logout", headers={"Authorization": f"Bearer {expired}"}).status_code == 204
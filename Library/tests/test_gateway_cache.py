@@ -0,0 +1,109 @@
+import asyncio
+import io
+import time
+
+import pytest
+from sqlalchemy import update
+
+from benchmarks.stand import InProcessStand
+from book_service import content as book_content
+from book_service import ingest, migrations as book_migrations, models
+from book_service.database import SessionLocal
+from reading_service import migrations as reading_migrations
+from user_service import migrations as user_migrations
+
+TEXT = ("Lorem ipsum dolor sit amet. " * 60 + "\n") * 10
+
+
+@pytest.fixture(scope="module", autouse=True)
+def schema():
+    book_migrations.upgrade()
+    reading_migrations.upgrade()
+    user_migrations.upgrade()
+
+
+def new_book(**fields) -> int:
+    with SessionLocal() as db:
+        book = models.Book(author="Cache Test", description="", year=2000, **fields)
+        db.add(book)
+        db.commit()
+        return book.id
+
+
+def set_book(book_id: int, **fields):
+    # Пишемо в базу напряму, в обхід gateway, — його кеш про це не знає
+    with SessionLocal() as db:
+        db.execute(update(models.Book).where(models.Book.id == book_id).values(**fields))
+        db.commit()
+
+
+def run(scenario):
+    async def main():
+        async with InProcessStand() as gateway:
+            await scenario(gateway)
+
+    asyncio.run(main())
+
+
+def test_book_being_ingested_is_not_cached():
+    book_id = new_book(title=f"ingesting-{time.time()}", pages=0, blob_sha256="0" * 64)
+
+    async def scenario(gateway):
+        first = await gateway.get(f"/books/{book_id}")
+        assert first.json()["pages"] == 0
+        assert first.headers["cache-control"] == "no-store"
+
+        set_book(book_id, pages=7)
+        second = await gateway.get(f"/books/{book_id}")
+        assert second.json()["pages"] == 7
+        assert "cache-control" not in second.headers
+
+        # Готова книга вже кешується
+        set_book(book_id, title="renamed")
+        assert (await gateway.get(f"/books/{book_id}")).json()["title"] != "renamed"
+
+    run(scenario)
+
+
+def test_partial_content_is_not_cached():
+    book_id = new_book(title=f"partial-{time.time()}", pages=0)
+    writer = book_content.ContentWriter(book_id)
+    writer.write_page("first page")
+    writer.flush()
+
+    async def scenario(gateway):
+        partial = await gateway.get(f"/books/{book_id}/content")
+        assert partial.json()["pages"] == ["first page"]
+        assert partial.headers["cache-control"] == "no-store"
+        page = await gateway.get(f"/books/{book_id}/pages/1")
+        assert page.headers["cache-control"] == "no-store"
+
+        writer.write_page("second page")
+        writer.close()
+        full = await gateway.get(f"/books/{book_id}/content")
+        assert full.json()["pages"] == ["first page", "second page"]
+        assert "cache-control" not in full.headers
+
+    run(scenario)
+
+
+def test_finished_job_invalidates_book():
+    book_id = new_book(title=f"job-{time.time()}", pages=0)
+    with SessionLocal() as db:
+        job = ingest.submit_original(db, db.get(models.Book, book_id), io.BytesIO(TEXT.encode()), "book.txt")
+    deadline = time.monotonic() + 10
+    while job.finished_at is None and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert job.status == "done"
+
+    async def scenario(gateway):
+        cached = (await gateway.get(f"/books/{book_id}")).json()
+        assert cached["pages"] == job.total_pages
+        set_book(book_id, title="after ingest")
+        assert (await gateway.get(f"/books/{book_id}")).json()["title"] == cached["title"]
+
+        # Статус завершеної job скидає кеш книги
+        assert (await gateway.get(f"/books/jobs/{job.id}")).json()["status"] == "done"
+        assert (await gateway.get(f"/books/{book_id}")).json()["title"] == "after ingest"
+
+    run(scenario)
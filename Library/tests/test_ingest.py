@@ -0,0 +1,80 @@
+import io
+import time
+
+import pytest
+
+from book_service import content as book_content
+from book_service import ingest, migrations, models, storage
+from book_service.database import SessionLocal
+
+TEXT = ("Lorem ipsum dolor sit amet. " * 60 + "\n") * 40
+
+
+@pytest.fixture(scope="module", autouse=True)
+def schema():
+    migrations.upgrade()
+
+
+def new_book(db, title):
+    book = models.Book(title=title, author="Ingest Test", description="", year=2000, pages=0)
+    db.add(book)
+    db.commit()
+    return book
+
+
+def upload(db, book, data: bytes) -> ingest.IngestJob:
+    job = ingest.submit_original(db, book, io.BytesIO(data), "book.txt")
+    deadline = time.monotonic() + 10
+    while job.finished_at is None and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert job.finished_at is not None
+    return job
+
+
+def test_pages_are_set_after_successful_ingest():
+    with SessionLocal() as db:
+        book = new_book(db, f"ok-{time.time()}")
+        job = upload(db, book, TEXT.encode())
+        db.refresh(book)
+        assert job.status == "done"
+        assert book.pages == job.total_pages > 0
+        assert not book_content.is_writing(book.id)
+
+        copy = new_book(db, f"copy-{time.time()}")
+        assert upload(db, copy, TEXT.encode()).kind == "copy"
+        assert book_content.read_pages(copy.id, 1, 1) == book_content.read_pages(book.id, 1, 1)
+
+
+def test_failed_ingest_is_not_reused(monkeypatch):
+    data = (TEXT + "failing").encode()
+    paginate = book_content.paginate_text
+
+    def broken(reader, *args, **kwargs):
+        for number, page in enumerate(paginate(reader, *args, **kwargs)):
+            if number == ingest.INGEST_BATCH_PAGES + 1:
+                raise OSError("disk full")
+            yield page
+
+    with SessionLocal() as db:
+        book = new_book(db, f"broken-{time.time()}")
+        monkeypatch.setattr(book_content, "paginate_text", broken)
+        job = upload(db, book, data)
+        monkeypatch.undo()
+        db.refresh(book)
+        assert job.status == "failed"
+        assert job.extracted_pages > 0
+        assert book.pages == 0
+        # Обірваний текст лишається позначеним як незавершений
+        assert book_content.is_writing(book.id)
+        assert storage.extracted_source(db, book.blob_sha256, exclude_book_id=-1) is None
+        # Навіть зі старим pages > 0 джерелом є лише книга з успішною останньою job
+        book.pages = 5
+        db.commit()
+        assert storage.extracted_source(db, book.blob_sha256, exclude_book_id=-1) is None
+
+        # Той самий файл витягується заново, а не копіюється з обірваної книги
+        again = new_book(db, f"again-{time.time()}")
+        job = upload(db, again, data)
+        db.refresh(again)
+        assert (job.kind, job.status) == ("txt", "done")
+        assert again.pages == job.total_pages > 0
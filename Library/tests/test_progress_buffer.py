@@ -0,0 +1,89 @@
+import uuid
+
+import pytest
+
+from reading_service import crud, migrations
+from reading_service.database import SessionLocal
+from reading_service.progress_buffer import ProgressBuffer
+
+BOOK_ID = 7001
+
+
+@pytest.fixture(scope="module", autouse=True)
+def schema():
+    migrations.upgrade()
+
+
+@pytest.fixture
+def buffer():
+    return ProgressBuffer(SessionLocal, interval_ms=250, max_entries=100)
+
+
+@pytest.fixture
+def user():
+    return uuid.uuid4().hex
+
+
+def stored_page(user_id, book_id=BOOK_ID):
+    with SessionLocal() as db:
+        progress = crud.get_progress(db, user_id, book_id)
+        return progress.current_page if progress else None
+
+
+def test_updates_for_same_key_are_merged(buffer, user):
+    for page in (3, 4, 9):
+        buffer.put(user, BOOK_ID, page, total_pages=100)
+    buffer.put(user, BOOK_ID + 1, 2)
+    assert buffer.stats()["merged_updates"] == 2
+    assert buffer.get(user, BOOK_ID) == 9
+    assert buffer.pending_for_user(user) == {BOOK_ID: 9, BOOK_ID + 1: 2}
+
+    assert buffer.flush() == 2
+    assert stored_page(user) == 9
+    assert stored_page(user, BOOK_ID + 1) == 2
+    assert buffer.stats()["pending"] == 0
+    with SessionLocal() as db:
+        assert crud.get_book_stats(db, BOOK_ID).pages == 100
+
+
+def test_failed_flush_requeues_entries(buffer, user, monkeypatch):
+    buffer.put(user, BOOK_ID, 5, total_pages=100)
+
+    def failing(*args, **kwargs):
+        raise RuntimeError("database is down")
+
+    monkeypatch.setattr(crud, "upsert_progress_batch", failing)
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+    assert buffer.get(user, BOOK_ID) == 5
+    assert buffer.stats() == {"pending": 1, "flushes": 0, "flushed_entries": 0, "merged_updates": 0}
+    assert stored_page(user) is None
+
+    monkeypatch.undo()
+    assert buffer.flush() == 1
+    assert stored_page(user) == 5
+
+
+def test_requeue_does_not_overwrite_newer_update(buffer, user, monkeypatch):
+    buffer.put(user, BOOK_ID, 10)
+    buffer.put(user, BOOK_ID + 1, 1)
+    seen_during_flush = []
+
+    def failing(db, entries, *args):
+        # Поки пакет пишеться, приходить новіше оновлення тієї ж пари
+        seen_during_flush.append(buffer.get(user, BOOK_ID))
+        buffer.put(user, BOOK_ID, 11)
+        raise RuntimeError("database is down")
+
+    monkeypatch.setattr(crud, "upsert_progress_batch", failing)
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+    # Під час запису непідтверджене значення видно читанням
+    assert seen_during_flush == [10]
+    # Старіше значення з невдалого пакета не перезаписує нове; інші ключі повернулись
+    assert buffer.pending_for_user(user) == {BOOK_ID: 11, BOOK_ID + 1: 1}
+
+    monkeypatch.undo()
+    assert buffer.flush() == 2
+    assert stored_page(user) == 11
+    assert stored_page(user, BOOK_ID + 1) == 1
@@ -0,0 +1,84 @@
+import asyncio
+import time
+import uuid
+
+import pytest
+from sqlalchemy import update
+
+from benchmarks.stand import InProcessStand
+from book_service import migrations as book_migrations, models as book_models
+from book_service.database import SessionLocal as BookSession
+from reading_service import crud, migrations as reading_migrations
+from reading_service.database import SessionLocal as ReadingSession
+from reading_service.progress_buffer import progress_buffer
+from user_service import migrations as user_migrations
+from user_service.auth import create_access_token
+
+
+@pytest.fixture(scope="module", autouse=True)
+def schema():
+    book_migrations.upgrade()
+    reading_migrations.upgrade()
+    user_migrations.upgrade()
+
+
+def new_book(**fields) -> int:
+    with BookSession() as db:
+        book = book_models.Book(title=f"stats-{time.time()}", author="Stats", description="", year=2000, **fields)
+        db.add(book)
+        db.commit()
+        return book.id
+
+
+def book_stats(book_id):
+    progress_buffer.flush()
+    with ReadingSession() as db:
+        return crud.get_book_stats(db, book_id)
+
+
+def reader_headers():
+    token = create_access_token({"sub": "reader@example.com", "role": "user", "id": uuid.uuid4().hex})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def run(scenario):
+    async def main():
+        async with InProcessStand() as gateway:
+            await scenario(gateway)
+
+    asyncio.run(main())
+
+
+def test_total_pages_come_from_cached_catalog():
+    book_id = new_book(pages=10)
+
+    async def scenario(gateway):
+        headers = reader_headers()
+        # Кількість сторінок від клієнта ігнорується — береться з каталогу
+        start = {"book_id": book_id, "page": 4, "total_pages": 1000}
+        assert (await gateway.post("/reading/start", json=start, headers=headers)).status_code == 200
+        stats = book_stats(book_id)
+        assert (stats.pages, stats.active_readers, stats.finished_readers) == (10, 1, 0)
+
+        # Друге оновлення бере pages із кешу gateway, а не з book_service
+        with BookSession() as db:
+            db.execute(update(book_models.Book).where(book_models.Book.id == book_id).values(pages=20))
+            db.commit()
+        start = {"book_id": book_id, "page": 10}
+        assert (await gateway.post("/reading/start", json=start, headers=headers)).status_code == 200
+        stats = book_stats(book_id)
+        assert (stats.pages, stats.active_readers, stats.finished_readers) == (10, 0, 1)
+
+    run(scenario)
+
+
+def test_unknown_pages_while_ingesting():
+    book_id = new_book(pages=0, blob_sha256="0" * 64)
+
+    async def scenario(gateway):
+        start = {"book_id": book_id, "page": 3, "total_pages": 3}
+        assert (await gateway.post("/reading/start", json=start, headers=reader_headers())).status_code == 200
+        stats = book_stats(book_id)
+        assert (stats.pages, stats.active_readers, stats.finished_readers) == (None, 1, 0)
+
+    run(scenario)
@@ -0,0 +1,143 @@
+import asyncio
+import itertools
+import time
+
+import httpx
+import pytest
+
+from api_gateway import resilience
+
+_names = itertools.count()
+
+
+def upstream(handler, **overrides):
+    """Клієнт з ResilientTransport над httpx.MockTransport; breaker — свій для кожного тесту."""
+    policy = {
+        "connect_timeout": 1, "read_timeout": 1, "retries": 0, "retry_backoff": 0,
+        "hedge_after": 0, "breaker_failures": 0, "breaker_reset": 30, **overrides,
+    }
+    transport = resilience.ResilientTransport(f"test-{next(_names)}", httpx.MockTransport(handler), policy)
+    return httpx.AsyncClient(transport=transport, base_url="http://upstream")
+
+
+class Upstream:
+    """Обробник запитів: відповіді (статус або виняток) по черзі, останній повторюється."""
+
+    def __init__(self, *outcomes, delays=()):
+        self.outcomes = list(outcomes)
+        self.delays = list(delays)
+        self.calls = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        number = len(self.calls)
+        self.calls.append(request.method)
+        if number < len(self.delays):
+            await asyncio.sleep(self.delays[number])
+        outcome = self.outcomes[min(number, len(self.outcomes) - 1)]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome, text=f"attempt {number}")
+
+
+def test_breaker_opens_half_opens_and_closes():
+    async def scenario():
+        handler = Upstream(503, 503, 200)
+        async with upstream(handler, breaker_failures=2, breaker_reset=0.1) as client:
+            breaker = client._transport.breaker
+            assert (await client.get("/")).status_code == 503
+            assert (await client.get("/")).status_code == 503
+            assert breaker.state == breaker.OPEN
+            with pytest.raises(resilience.CircuitOpenError):
+                await client.get("/")
+            assert len(handler.calls) == 2
+
+            await asyncio.sleep(0.15)
+            # Пробний запит у half_open успішний — ланцюг закривається
+            assert (await client.get("/")).status_code == 200
+            assert breaker.state == breaker.CLOSED
+            assert (breaker.opened, breaker.rejected) == (1, 1)
+
+    asyncio.run(scenario())
+
+
+def test_failed_probe_reopens_breaker():
+    async def scenario():
+        handler = Upstream(httpx.ConnectError("refused"))
+        async with upstream(handler, breaker_failures=1, breaker_reset=0.1) as client:
+            breaker = client._transport.breaker
+            with pytest.raises(httpx.ConnectError):
+                await client.get("/")
+            await asyncio.sleep(0.15)
+            with pytest.raises(httpx.ConnectError):
+                await client.get("/")
+            assert breaker.state == breaker.OPEN
+            # Відкрився заново: reset_timeout рахується від невдалої проби
+            assert time.monotonic() - breaker.opened_at < 0.1
+            with pytest.raises(resilience.CircuitOpenError):
+                await client.get("/")
+            assert len(handler.calls) == 2
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("outcome", [503, httpx.ConnectError("refused")])
+def test_retries_only_idempotent_methods(outcome):
+    async def scenario():
+        handler = Upstream(outcome)
+        async with upstream(handler, retries=2) as client:
+            for method in ("GET", "POST"):
+                try:
+                    response = await client.request(method, "/")
+                except httpx.ConnectError:
+                    pass
+                else:
+                    assert response.status_code == 503
+        assert handler.calls == ["GET", "GET", "GET", "POST"]
+
+    asyncio.run(scenario())
+
+
+def test_retry_returns_first_success():
+    async def scenario():
+        handler = Upstream(502, 200)
+        async with upstream(handler, retries=3) as client:
+            response = await client.get("/")
+        assert (response.status_code, response.text) == (200, "attempt 1")
+        assert len(handler.calls) == 2
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("hedge_outcome", [503, httpx.ConnectError("refused")])
+def test_failed_hedge_does_not_win(hedge_outcome):
+    async def scenario():
+        # Основна спроба повільна, але вдала; hedge одразу падає
+        handler = Upstream(200, hedge_outcome, delays=(0.2, 0))
+        async with upstream(handler, hedge_after=0.05) as client:
+            response = await client.get("/", extensions={"hedge": True})
+        assert (response.status_code, response.text) == (200, "attempt 0")
+        assert len(handler.calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_faster_hedge_wins():
+    async def scenario():
+        handler = Upstream(200, delays=(0.5, 0))
+        async with upstream(handler, hedge_after=0.05) as client:
+            started = time.monotonic()
+            response = await client.get("/", extensions={"hedge": True})
+        assert response.text == "attempt 1"
+        assert time.monotonic() - started < 0.4
+
+    asyncio.run(scenario())
+
+
+def test_post_is_not_hedged():
+    async def scenario():
+        handler = Upstream(200, delays=(0.1,))
+        async with upstream(handler, hedge_after=0.02) as client:
+            await client.post("/", extensions={"hedge": True})
+        assert handler.calls == ["POST"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,25 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models, schemas
+
+# Async-версії функцій з crud.py для режиму DB_ASYNC
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate, hashed_password: str):
+    db_user = models.User(
+        name=user.name,
+        email=user.email,
+        hashed_password=hashed_password,
+        role=user.role
+    )
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    return (await db.scalars(select(models.User).filter(models.User.email == email))).first()
+
+async def update_password_hash(db: AsyncSession, user: models.User, hashed_password: str):
+    user.hashed_password = hashed_password
+    await db.commit()
+    return user
@@ -1,30 +1,32 @@
-from ast import expr
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from . import schemas, models
-from sqlalchemy.orm import Session
+from common.auth import JWT_ALGORITHM, JWT_SECRET_KEY
+from . import crud, async_crud, database
+from .hashing import hasher
 
-SECRET_KEY = "your_secret_key"  # замени на env в будущем
-ALGORITHM = "HS256"
-
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def authenticate_user(db: Session, email: str, password: str):
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if not user or not verify_password(password, user.hashed_password):
+async def authenticate_user(db, email: str, password: str):
+    """
+    Єдиний шлях логіну для sync- і async-сесій. bcrypt виконується в пулі hasher;
+    якщо BCRYPT_ROUNDS змінились, хеш перераховується і зберігається одразу.
+    """
+    user = await database.run_db(db, crud.get_user_by_email, async_crud.get_user_by_email, email)
+    if not user:
+        return None
+    ok, new_hash = await hasher.verify_and_update(password, user.hashed_password)
+    if not ok:
         return None
+    if new_hash:
+        await database.run_db(db, crud.update_password_hash, async_crud.update_password_hash, user, new_hash)
     return user
 
 def create_access_token(data: dict, expires_delta: timedelta = timedelta(minutes=30)):
     to_encode = data.copy()
     expire = datetime.utcnow() + expires_delta
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+
+def verify_token(token: str) -> dict:
+    try:
+        return jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+    except JWTError:
+        raise ValueError("Could not validate token")
@@ -1,12 +1,12 @@
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from . import models, schemas, auth
+from . import models, schemas
 
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_pw = auth.hash_password(user.password)
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: str):
     db_user = models.User(
         name=user.name,
         email=user.email,
-        hashed_password=hashed_pw,
+        hashed_password=hashed_password,
         role=user.role  # беремо з вхідних даних
     )
     db.add(db_user)
@@ -15,8 +15,11 @@ def create_user(db: Session, user: schemas.UserCreate):
     return db_user
 
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if user and auth.verify_password(password, user.hashed_password):
-        return user
-    return None
+def get_user_by_email(db: Session, email: str):
+    return db.scalars(select(models.User).filter(models.User.email == email)).first()
+
+
+def update_password_hash(db: Session, user: models.User, hashed_password: str):
+    user.hashed_password = hashed_password
+    db.commit()
+    return user
@@ -0,0 +1,145 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+from . import metrics, tracing
+
+# Вартість bcrypt. Якщо змінити, старі хеші перехешуються при наступному успішному логіні
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Скільки хешувань виконується одночасно (процеси пулу) і скільки запитів може чекати в черзі
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+HASH_MAX_QUEUE = int(os.getenv("HASH_MAX_QUEUE", "64"))
+# Максимальний час очікування в черзі (секунди), після якого запит отримує 503
+HASH_QUEUE_TIMEOUT = float(os.getenv("HASH_QUEUE_TIMEOUT", "2"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(plain_password, hashed_password) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def verify_and_update(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """(чи правильний пароль, новий хеш якщо вартість змінилась — інакше None)."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+class HashingOverloaded(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: int = 1):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class HashExecutor:
+    """
+    Виконує bcrypt у пулі процесів, щоб не блокувати event loop і GIL.
+    Одночасно працює не більше workers завдань; ще max_queue можуть чекати.
+    Понад це — одразу 429, а якщо очікування в черзі перевищило queue_timeout — 503.
+    """
+
+    def __init__(self, workers: int, max_queue: int, queue_timeout: float):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._admitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._recent_waits = deque(maxlen=1000)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def _record_wait(self, wait: float):
+        self.wait_count += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self._recent_waits.append(wait)
+        metrics.HASH_QUEUE_WAIT.observe(wait)
+
+    async def run(self, fn, *args):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        if self._admitted >= self.workers + self.max_queue:
+            self.rejected += 1
+            metrics.HASH_REJECTED.labels("429").inc()
+            raise HashingOverloaded(429, "Too many authentication requests, retry later")
+        self._admitted += 1
+        queued_at = time.monotonic()
+        try:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                metrics.HASH_REJECTED.labels("503").inc()
+                self._record_wait(time.monotonic() - queued_at)
+                raise HashingOverloaded(503, "Authentication service is busy, retry later")
+            wait = time.monotonic() - queued_at
+            self._record_wait(wait)
+            try:
+                with tracing.start_span(f"bcrypt.{fn.__name__}", **{"bcrypt.queue_wait_ms": round(wait * 1000, 3)}):
+                    result = await asyncio.get_running_loop().run_in_executor(self._get_pool(), fn, *args)
+            finally:
+                self._slots.release()
+            self.completed += 1
+            return result
+        finally:
+            self._admitted -= 1
+
+    async def hash_password(self, password: str) -> str:
+        return await self.run(hash_password, password)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return await self.run(verify_and_update, plain_password, hashed_password)
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def stats(self) -> dict:
+        waits = sorted(self._recent_waits)
+
+        def percentile(p):
+            return round(waits[min(len(waits) - 1, int(len(waits) * p))] * 1000, 2) if waits else 0.0
+
+        running = min(self._admitted, self.workers)
+        return {
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "running": running,
+            "queued": self._admitted - running,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "queue_wait_ms_avg": round(self.wait_total / self.wait_count * 1000, 2) if self.wait_count else 0.0,
+            "queue_wait_ms_p50": percentile(0.5),
+            "queue_wait_ms_p95": percentile(0.95),
+            "queue_wait_ms_max": round(self.wait_max * 1000, 2),
+        }
+
+
+hasher = HashExecutor(HASH_WORKERS, HASH_MAX_QUEUE, HASH_QUEUE_TIMEOUT)
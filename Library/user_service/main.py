@@ -1,13 +1,56 @@
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy.orm import Session
-from . import database, models, schemas, crud, auth
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from . import database, models, schemas, crud, async_crud, auth, metrics, migrations, tracing
+from .hashing import HashingOverloaded, hasher
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.security import OAuth2PasswordBearer
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
-database.Base.metadata.create_all(bind=database.engine)
-app = FastAPI()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    hasher.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+metrics.instrument_app(app)
+tracing.instrument_app(app)
+
+
+@app.exception_handler(HashingOverloaded)
+async def hashing_overloaded_handler(request: Request, exc: HashingOverloaded):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+# Схема створюється міграціями (python -m user_service.migrations upgrade), а не при старті
+@app.get("/health/live")
+def liveness():
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+def readiness():
+    # Трафік можна пускати, коли база відповідає і схема на останній міграції
+    try:
+        with database.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            missing = migrations.pending(conn)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=503, detail=f"Database unavailable: {type(e).__name__}")
+    if missing:
+        raise HTTPException(status_code=503, detail=f"Pending migrations: {', '.join(missing)}")
+    return {"status": "ok"}
 
 def get_db():
     db = database.SessionLocal()
@@ -16,12 +59,19 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with database.AsyncSessionLocal() as db:
+        yield db
+
+db_dependency = get_async_db if database.DB_ASYNC else get_db
+
 @app.post("/users/register")
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register(user: schemas.UserCreate, db=Depends(db_dependency)):
     # Приводимо роль до нижнього регістру для гнучкості
     if hasattr(user, 'role') and isinstance(user.role, str):
         user.role = user.role.lower()
-    db_user = crud.create_user(db, user)
+    hashed_password = await hasher.hash_password(user.password)
+    db_user = await database.run_db(db, crud.create_user, async_crud.create_user, user, hashed_password)
     access_token = auth.create_access_token(data={
         "sub": db_user.email,
         "role": db_user.role.value,
@@ -30,8 +80,8 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/users/login")
-def login(user: schemas.UserLogin, db: Session = Depends(get_db)):
-    db_user = auth.authenticate_user(db, user.email, user.password)
+async def login(user: schemas.UserLogin, db=Depends(db_dependency)):
+    db_user = await auth.authenticate_user(db, user.email, user.password)
     if not db_user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     access_token = auth.create_access_token(data={
@@ -41,6 +91,10 @@ def login(user: schemas.UserLogin, db: Session = Depends(get_db)):
     })
     return {"access_token": access_token, "token_type": "bearer"}
 
+@app.get("/hash/stats")
+def hash_stats():
+    return hasher.stats()
+
 @app.get("/users/me")
 def read_users_me(credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer())):
     token = credentials.credentials
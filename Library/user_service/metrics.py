@@ -0,0 +1,19 @@
+"""Метрики user_service; спільна частина (HTTP, пул БД, /metrics) — common.metrics."""
+from prometheus_client import Counter, Histogram
+
+from common.metrics import ServiceMetrics
+
+SERVICE = "user_service"
+service_metrics = ServiceMetrics(SERVICE)
+REGISTRY = service_metrics.registry
+instrument_app = service_metrics.instrument_app
+
+
+# Метрики user_service: черга bcrypt
+HASH_QUEUE_WAIT = Histogram(
+    "password_hash_queue_wait_seconds",
+    "Time a password hash/verify request waited for a worker",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5),
+    registry=REGISTRY,
+)
+HASH_REJECTED = Counter("password_hash_rejected_total", "Hash requests rejected by admission control", ["status"], registry=REGISTRY)
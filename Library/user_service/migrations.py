@@ -0,0 +1,120 @@
+"""
+Версійовані міграції схеми user_service. Виконуються окремим кроком перед
+стартом сервісу, а не при імпорті застосунку:
+
+    python -m user_service.migrations upgrade [--wait 60]   # застосувати нові
+    python -m user_service.migrations status                # застосовані й очікувані
+
+Кожна міграція виконується один раз у власній транзакції й записується в
+schema_migrations. Застосовані міграції не змінюються: нова зміна схеми — нова
+функція в кінці MIGRATIONS. Кроки перевіряють, чи об'єкт уже існує, тож бази,
+створені раніше через create_all, підхоплюються без помилок.
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import (
+    TIMESTAMP, Column, DateTime, Enum, MetaData, String, Table, func, inspect, select, text,
+)
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.exc import OperationalError
+
+from .database import engine
+
+SERVICE = "user_service"
+# Спільний для всіх сервісів ключ advisory-lock: вони ділять базу і таблицю schema_migrations
+LOCK_KEY = 7340022
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("service", String(64), primary_key=True),
+    Column("version", String(128), primary_key=True),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+
+def _create_users(conn):
+    Table(
+        "users",
+        MetaData(),
+        Column("id", UUID(as_uuid=True), primary_key=True),
+        Column("name", String, nullable=False),
+        Column("email", String, unique=True, nullable=False),
+        Column("hashed_password", String, nullable=False),
+        Column("role", Enum("user", "admin", name="roleenum")),
+        Column("created_at", TIMESTAMP(timezone=True), server_default=func.now()),
+    ).create(conn, checkfirst=True)
+
+
+MIGRATIONS = [
+    ("0001_users", _create_users),
+]
+
+
+def applied_versions(conn) -> set:
+    if not inspect(conn).has_table("schema_migrations"):
+        return set()
+    query = select(schema_migrations.c.version).where(schema_migrations.c.service == SERVICE)
+    return set(conn.scalars(query))
+
+
+def pending(conn) -> list:
+    applied = applied_versions(conn)
+    return [version for version, _ in MIGRATIONS if version not in applied]
+
+
+def upgrade(bind=None) -> list:
+    """Застосовує неприйняті міграції по порядку; повертає їхні версії."""
+    bind = bind if bind is not None else engine
+    done = []
+    for version, migrate in MIGRATIONS:
+        with bind.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # Кілька реплік можуть запустити upgrade одночасно — виконуємо по черзі
+                conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": LOCK_KEY})
+            schema_migrations.create(conn, checkfirst=True)
+            if version in applied_versions(conn):
+                continue
+            migrate(conn)
+            conn.execute(schema_migrations.insert().values(
+                service=SERVICE, version=version, applied_at=datetime.now(timezone.utc),
+            ))
+        done.append(version)
+    return done
+
+
+def wait_for_database(timeout: float):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with engine.connect():
+                return
+        except OperationalError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(1)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog=f"python -m {SERVICE}.migrations", description=f"Міграції схеми {SERVICE}")
+    parser.add_argument("command", choices=("upgrade", "status"))
+    parser.add_argument("--wait", type=float, default=0, help="чекати доступності бази до N секунд")
+    args = parser.parse_args(argv)
+    if args.wait > 0:
+        wait_for_database(args.wait)
+    if args.command == "upgrade":
+        done = upgrade()
+        print(f"{SERVICE}: applied {len(done)} migration(s)" + (f": {', '.join(done)}" if done else ""))
+        return 0
+    with engine.connect() as conn:
+        applied = applied_versions(conn)
+    for version, _ in MIGRATIONS:
+        print(f"{'applied' if version in applied else 'pending':<8} {version}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())